@@ -0,0 +1,71 @@
+""" Measures the latency of reading cached pages, through get and model_to_dict and through get_or_none and get_many.
+
+A cache of synthetic pages is built, then random pages are read by their url and by a
+redirect to them, one at a time and in batches, the way retrieve and retrieve_many did
+before get_or_none and get_many, and the way they do now.
+
+Usage:
+    python benchmarks/bench_cache_hit.py --pages 5000 --lookups 2000 --batch 100
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.utils.config import default_config
+from wikicrawler.core.utils.model_to_dict import model_to_dict
+
+
+WIKI = "https://en.wikipedia.org/wiki/"
+
+
+def page(i, rng):
+    links = [{f"link {j}": f"{WIKI}Page_{j}" for j in rng.integers(0, 10_000, 10)} for _ in range(20)]
+    return {'url': f"{WIKI}Page_{i}", 'title': f"Page {i}", 'paragraphs': ["Lorem ipsum dolor sit amet. " * 20] * 20,
+            'paragraph_links': links, 'toc_links': {f"Section {j}": f"{WIKI}Page_{i}#Section_{j}" for j in range(8)},
+            'see_also': {f"Page {j}": f"{WIKI}Page_{j}" for j in range(5)}, 'references': [], 'media': None}
+
+
+def timed(lookup, urls):
+    start = time.perf_counter()
+    for url in urls:
+        lookup(url)
+    return (time.perf_counter() - start) / len(urls) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=5000, help="Pages in the cache.")
+    parser.add_argument('--lookups', type=int, default=2000, help="Pages read per measurement.")
+    parser.add_argument('--batch', type=int, default=100, help="Pages read per batch.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as root:
+        config = dict(default_config(root), link_graph=False)
+        with WikiCacher(config) as cacher:
+            cacher.cache_many([page(i, rng) for i in range(args.pages)])
+            cacher.alias_many({f"{WIKI}Alias_{i}": f"{WIKI}Page_{i}" for i in range(args.pages)})
+            cacher.commit()
+
+            def before(url):
+                return model_to_dict(cacher.get(url)) if url in cacher else None
+
+            ids = rng.integers(0, args.pages, args.lookups)
+            for name, prefix in (('url', 'Page_'), ('redirect', 'Alias_')):
+                urls = [f"{WIKI}{prefix}{i}" for i in ids]
+                print(f"{name:>8} hit: {timed(before, urls):7.1f}us before, {timed(cacher.get_or_none, urls):7.1f}us after")
+
+            urls = [f"{WIKI}Page_{i}" for i in ids]
+            batches = [urls[i:i + args.batch] for i in range(0, len(urls), args.batch)]
+            print(f"{'batch':>8} hit: {timed(lambda batch: {url: before(url) for url in batch}, batches) / args.batch:7.1f}us "
+                  f"before, {timed(cacher.get_many, batches) / args.batch:7.1f}us after, a page in batches of {args.batch}")
+
+            urls = [f"{WIKI}Missing_{i}" for i in ids]
+            print(f"{'miss':>8}:     {timed(before, urls):7.1f}us before, {timed(cacher.get_or_none, urls):7.1f}us after")
+
+
+if __name__ == '__main__':
+    main()
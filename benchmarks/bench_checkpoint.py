@@ -0,0 +1,67 @@
+""" Measures the overhead of checkpointing a crawl against how often it is checkpointed.
+
+The crawler fetches a synthetic wiki from memory, each page linking to the next few, so
+checkpoints are compared against the cost of extracting and caching pages alone, the
+worst case for their overhead. Each run crawls the same pages into a fresh cache.
+
+Usage:
+    python benchmarks/bench_checkpoint.py --pages 500 --every 0 1 10 50
+    python benchmarks/bench_checkpoint.py --overhead 0.05
+"""
+import argparse
+import tempfile
+
+from wikicrawler.core.crawler import WikiCrawler
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.utils.config import default_config
+
+
+WIKI = "https://en.wikipedia.org/wiki/"
+
+
+class Crawler(WikiCrawler):
+    fanout = 4
+
+    def fetch_html(self, url):
+        n = int(url.rsplit('_', 1)[-1])
+        links = ' '.join(f'<a href="/wiki/Page_{n * self.fanout + i}">Page {n * self.fanout + i}</a>'
+                         for i in range(1, self.fanout + 1))
+        return url, (f'<html><body><h1 id="firstHeading">Page {n}</h1><div id="mw-content-text">'
+                     f'<div class="mw-parser-output"><p>Page {n} is a page of the benchmark. It links to {links}.</p>'
+                     f'</div></div></body></html>')
+
+
+def crawl(pages, every, overhead):
+    with tempfile.TemporaryDirectory() as root:
+        config = dict(default_config(root), latex=False, crawl_checkpoint_every=every or None,
+                      crawl_checkpoint_overhead=overhead)
+        with WikiCacher(config) as cacher:
+            crawler = Crawler(config, cacher=cacher)
+            try:
+                crawl = crawler.traverse(WIKI + 'Page_0', workers=1, max_depth=None, max_pages=pages)
+                for _ in crawl:
+                    pass
+
+                return crawl.stats()
+            finally:
+                crawler.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=500, help="Pages to crawl per run.")
+    parser.add_argument('--every', type=int, nargs='+', default=[0, 1, 10, 50],
+                        help="Pages between checkpoints per run, 0 to only checkpoint when the crawl stops.")
+    parser.add_argument('--overhead', type=float, default=None,
+                        help="The crawl_checkpoint_overhead bound, none by default.")
+    args = parser.parse_args()
+
+    for every in args.every:
+        stats = crawl(args.pages, every, args.overhead)
+        share = stats['checkpoint_seconds'] / stats['seconds'] if stats['seconds'] else 0.0
+        print(f"every {every:>4}: {stats['pages_per_second']:7.1f} pages/s, {stats['checkpoints']:>4} checkpoints "
+              f"taking {stats['checkpoint_seconds']:6.3f}s, {share:6.1%} of the crawl")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+""" Measures crawl throughput against the number of worker processes of a MultiCrawl.
+
+A local stand-in for the api serves a synthetic wiki, each page linking to the next few,
+with a fixed latency per request like a remote server. Throughput should grow with the
+processes until the rate limit, or the cores parsing the pages, are the bottleneck.
+
+Usage:
+    python benchmarks/bench_crawl.py --pages 200 --processes 1 2 4 --latency 0.05
+    python benchmarks/bench_crawl.py --rate 20
+"""
+import argparse
+import json
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from wikicrawler.core.crawler import WikiCrawler
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.utils.config import default_config
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.05
+    links = 4
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+        time.sleep(self.latency)
+
+        pages = []
+        for title in params['titles'].split('|'):
+            n = int(title.split()[-1])
+            links = ' '.join(f"[[Page {n * self.links + i}]]" for i in range(1, self.links + 1))
+            text = f"'''{title}''' is a page of the benchmark. It links to {links}.\n\n== History ==\nIt was made."
+            pages.append({'title': title, 'revisions': [{'slots': {'main': {'content': text}}}]})
+
+        body = json.dumps({'batchcomplete': True, 'query': {'pages': pages}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def crawl(api_url, pages, processes, rate):
+    with tempfile.TemporaryDirectory() as root:
+        config = default_config(root)
+        config.update(api_url=api_url, backend='query', latex=False,
+                      rate_limit={'anonymous': {'rate': rate, 'burst': 1}})
+        with WikiCacher(config) as cacher:
+            crawler = WikiCrawler(config, cacher=cacher)
+            try:
+                crawl = crawler.traverse("https://en.wikipedia.org/wiki/Page_0", processes=processes,
+                                         max_depth=None, max_pages=pages)
+                for _ in crawl:
+                    pass
+                stats = crawl.stats()
+                crawl.close()
+
+                return stats
+            finally:
+                crawler.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200, help="Pages to crawl per run.")
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4], help="Worker processes per run.")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds the stand-in takes per request.")
+    parser.add_argument('--rate', type=float, default=1000, help="Requests per second of each worker.")
+    args = parser.parse_args()
+
+    StandIn.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    api_url = f"http://127.0.0.1:{server.server_port}/w/api.php"
+    try:
+        for processes in args.processes:
+            stats = crawl(api_url, args.pages, processes, args.rate)
+            print(f"{processes:>3} processes: {stats['pages']} pages in {stats['seconds']:6.2f}s, "
+                  f"{stats['pages_per_second']:7.1f} pages/s")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+""" Compares the single pass extractor with the soup based extraction of WikiGrabber.
+
+Reports the mean parse time and the peak traced memory per page for each path, and
+checks that both produce the same page dictionary.
+
+Usage:
+    python benchmarks/bench_extractor.py pages/         # a directory of saved .html pages
+    python benchmarks/bench_extractor.py arbiter.db     # the raw html stored by store_raw_html
+"""
+import argparse
+import gc
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.grabber import WikiGrabber
+from wikicrawler.core.utils.config import default_config
+
+
+def load_pages(source, limit=None):
+    """ Loads (url, html) pairs from a directory of .html files or a cache database. """
+    source = Path(source)
+    pages = []
+
+    if source.is_dir():
+        for path in sorted(source.glob('*.html'))[:limit]:
+            pages.append(("https://en.wikipedia.org/wiki/" + path.stem, path.read_text(encoding='utf-8')))
+    else:
+        with WikiCacher(str(source)) as cacher:
+            for url in cacher.raw_urls()[:limit]:
+                pages.append((url, cacher.get_raw(url)))
+
+    return pages
+
+
+def measure(extract, pages, repeat):
+    """ Returns the mean seconds per page and the mean peak traced bytes per page. """
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for url, html in pages:
+            extract(url, html)
+    elapsed = (time.perf_counter() - start) / (repeat * len(pages))
+
+    peaks = []
+    for url, html in pages:
+        gc.collect()
+        tracemalloc.start()
+        extract(url, html)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return elapsed, sum(peaks) / len(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help="A directory of .html pages or a cache database with raw html.")
+    parser.add_argument('--limit', type=int, default=None, help="Benchmark at most this many pages.")
+    parser.add_argument('--repeat', type=int, default=3, help="Timing passes over the pages.")
+    parser.add_argument('--tokenizer', default='html.parser', choices=['html.parser', 'lxml'])
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    pages = load_pages(args.source, args.limit)
+    if not pages:
+        print(f"No pages found in {args.source}.")
+        sys.exit(1)
+
+    config = default_config(tempfile.mkdtemp())
+    config['latex'] = False
+
+    grabbers = {}
+    for extractor in ('soup', 'single_pass'):
+        grabbers[extractor] = WikiGrabber(dict(config, extractor=extractor, extractor_tokenizer=args.tokenizer))
+
+    mismatches = [url for url, html in pages
+                  if grabbers['soup'].extract_html(url, html) != grabbers['single_pass'].extract_html(url, html)]
+
+    print(f"{len(pages)} pages, {sum(len(html) for _, html in pages) / len(pages) / 1024:.1f} KiB mean html")
+    results = {}
+    for extractor, grabber in grabbers.items():
+        results[extractor] = measure(grabber.extract_html, pages, args.repeat)
+        elapsed, peak = results[extractor]
+        print(f"{extractor:>12}: {elapsed * 1000:8.2f} ms/page {peak / 1024 ** 2:8.2f} MiB peak/page")
+
+    print(f"     speedup: {results['soup'][0] / results['single_pass'][0]:.2f}x, "
+          f"peak memory: {results['single_pass'][1] / results['soup'][1]:.1%} of soup")
+    print(f"  mismatches: {len(mismatches)}" + (f" {mismatches[:5]}" if mismatches else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+""" Measures building, compacting and querying the link graph of a large synthetic cache.
+
+Pages link to a few neighbours and to pages drawn from a power law, like articles linking to
+popular ones. The graph is built through LinkGraph.add as the cache would, then neighbours
+are looked up for random pages.
+
+Usage:
+    python benchmarks/bench_graph.py --pages 200000 --links 25
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from wikicrawler.core.db.graph import LinkGraph
+
+
+WIKI = "https://en.wikipedia.org/wiki/"
+
+
+def synthetic_links(pages, links, seed=0):
+    """ Yields (page, links) of a synthetic wiki of urls. """
+    rng = np.random.default_rng(seed)
+    urls = [f"{WIKI}Page_{i}" for i in range(pages)]
+    for i in range(pages):
+        targets = (rng.zipf(1.5, links) - 1) % pages
+        targets[:3] = (i + np.arange(1, 4)) % pages
+        yield urls[i], [urls[j] for j in targets]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200_000, help="Pages in the graph.")
+    parser.add_argument('--links', type=int, default=25, help="Links per page.")
+    parser.add_argument('--lookups', type=int, default=10_000, help="Neighbour lookups to time.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        graph = LinkGraph(root + '/links.graph')
+
+        start = time.perf_counter()
+        for url, links in synthetic_links(args.pages, args.links):
+            graph.add(url, links, canonical=True)
+        graph.flush()
+        added = time.perf_counter() - start
+
+        start = time.perf_counter()
+        graph.compact()
+        graph.flush()
+        compacted = time.perf_counter() - start
+
+        stats = graph.stats()
+        print(f"{stats['nodes']} pages, {stats['edges']} links: added in {added:.2f}s "
+              f"({added / args.pages * 1e6:.1f}us a page), compacted in {compacted:.2f}s, "
+              f"{stats['bytes'] / 2 ** 20:.1f} MiB of arrays")
+
+        ids = np.random.default_rng(1).integers(0, args.pages, args.lookups)
+        for name, lookup in (('out', graph.out_ids), ('in', graph.in_ids)):
+            start = time.perf_counter()
+            for i in ids:
+                lookup(int(i))
+            print(f"{name}-neighbours: {(time.perf_counter() - start) / args.lookups * 1e6:.1f}us a lookup")
+
+        start = time.perf_counter()
+        graph.close()
+        graph = LinkGraph(root + '/links.graph')
+        print(f"reopened in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+""" Measures dump ingestion throughput and peak memory against the size of the dump.
+
+A synthetic multistream dump of article-like wikitext is written for each size, then
+ingested into a fresh cache. Memory should stay flat as the dump grows, since at most
+a window of streams is in flight at once.
+
+Usage:
+    python benchmarks/bench_ingest.py --pages 2000 20000 --processes 2
+    python benchmarks/bench_ingest.py --dump enwiki-...-pages-articles-multistream.xml.bz2 --limit 100
+"""
+import argparse
+import bz2
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+from xml.sax.saxutils import escape
+
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.dump import DumpIngester, index_path
+from wikicrawler.core.utils.config import default_config
+
+
+ARTICLE = """{{Infobox thing
+| name = %(title)s
+| image = %(title)s.jpg
+}}
+'''%(title)s''' is a [[Thing]] related to [[%(next)s]] and [[Topic %(n)d|topic %(n)d]].<ref>{{cite web |url=https://example.org/%(n)d |title=Source %(n)d}}</ref>
+It has been studied since the [[19th century]] by [[Scientist|scientists]] in [[Europe]].
+
+== History ==
+%(history)s
+
+== See also ==
+* [[%(next)s]]
+* [[List of things]]
+
+[[Category:Things]]
+"""
+
+
+def write_dump(path, pages, per_stream=100):
+    """ Writes a multistream dump of synthetic articles and its index. """
+    history = ' '.join(["The [[history]] of the thing is long and the [[Sources|sources]] disagree."] * 20)
+
+    index = bz2.open(index_path(path), 'wt', encoding='utf-8')
+    with open(path, 'wb') as f, index:
+        f.write(bz2.compress(b'<mediawiki><siteinfo></siteinfo>'))
+        for start in range(0, pages, per_stream):
+            offset = f.tell()
+            xml = []
+            for n in range(start, min(pages, start + per_stream)):
+                title = f"Thing {n}"
+                text = ARTICLE % {'title': title, 'next': f"Thing {n + 1}", 'n': n, 'history': history}
+                xml.append(f"<page><title>{title}</title><ns>0</ns><id>{n}</id><revision>"
+                           f"<text xml:space=\"preserve\">{escape(text)}</text></revision></page>")
+                index.write(f"{offset}:{n}:{title}\n")
+            f.write(bz2.compress(''.join(xml).encode()))
+        f.write(bz2.compress(b'</mediawiki>'))
+
+
+def peak_rss():
+    """ The peak resident memory of this process and of its largest worker, in MiB. """
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024)
+
+
+def ingest(dump, processes, limit=None):
+    with tempfile.TemporaryDirectory() as root:
+        with WikiCacher(default_config(root)) as cacher:
+            return DumpIngester(cacher, dump, processes=processes).ingest(limit=limit)
+
+
+def measure(dump, processes, limit=None):
+    # A fresh process per run, so the peak memory of one run does not carry over to the next.
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    run = context.Process(target=_measure, args=(dump, processes, limit, results))
+    run.start()
+    result = results.get()
+    run.join()
+
+    return result
+
+
+def _measure(dump, processes, limit, results):
+    stats = ingest(dump, processes, limit)
+    results.put((stats, peak_rss(), os.path.getsize(dump)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dump', help="Ingest a real dump instead of synthetic ones.")
+    parser.add_argument('--limit', type=int, default=None, help="Ingest at most this many streams of the dump.")
+    parser.add_argument('--pages', type=int, nargs='+', default=[2000, 20000], help="Synthetic dump sizes.")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help="Worker processes.")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as root:
+        if args.dump is not None:
+            runs.append(measure(args.dump, args.processes, args.limit))
+        else:
+            for pages in args.pages:
+                dump = os.path.join(root, f"synthetic-{pages}-multistream.xml.bz2")
+                write_dump(dump, pages)
+                runs.append(measure(dump, args.processes))
+
+    if not runs:
+        sys.exit(1)
+
+    print(f"{args.processes} processes, {os.cpu_count()} cpus")
+    for stats, (main_rss, worker_rss), size in runs:
+        print(f"{stats['pages']:>8} pages {size / 2 ** 20:8.1f} MiB dump: {stats['pages_per_second']:8.1f} pages/s, "
+              f"peak rss {main_rss:6.1f} MiB main {worker_rss:6.1f} MiB worker")
+
+
+if __name__ == '__main__':
+    main()
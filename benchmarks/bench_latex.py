@@ -0,0 +1,65 @@
+""" Measures how much of the extraction time of retrieve the latex pre-filter and memo remove.
+
+Every page is extracted and its paragraphs converted, like retrieve does with config['latex']
+set, once converting every paragraph, once skipping paragraphs which can not contain latex,
+and twice with the memo as well: cold, then warm from the first pass over the corpus.
+
+Usage:
+    python benchmarks/bench_latex.py pages/
+    python benchmarks/bench_latex.py arbiter.db
+"""
+import argparse
+import sys
+import time
+
+from bench_extractor import load_pages
+
+from wikicrawler.core.parse.extractor import extract
+from wikicrawler.core.parse.latex import LatexConverter
+from wikicrawler.core.parse.stage import build_wiki
+
+
+def measure(parts, latex):
+    start = time.perf_counter()
+    wikis = [build_wiki(url, page_parts, latex=latex) for url, page_parts in parts]
+
+    return time.perf_counter() - start, wikis
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help="A directory of .html pages or a cache database with raw html.")
+    parser.add_argument('--limit', type=int, default=None, help="Benchmark at most this many pages.")
+    args = parser.parse_args()
+
+    pages = load_pages(args.source, args.limit)
+    if not pages:
+        print(f"No pages found in {args.source}.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    parts = [(url, extract(url, html)) for url, html in pages]
+    extract_time = time.perf_counter() - start
+
+    baseline, expected = measure(parts, LatexConverter(skip_prose=False, memoize=False))
+
+    memoized = LatexConverter()
+    runs = {'convert all': baseline,
+            'pre-filter': measure(parts, LatexConverter(memoize=False))[0],
+            'memo cold': measure(parts, memoized)[0]}
+    runs['memo warm'], wikis = measure(parts, memoized)
+    assert wikis == expected
+
+    paragraphs = sum(len(page_parts['paragraphs']) for _, page_parts in parts)
+    print(f"{len(pages)} pages, {paragraphs} paragraphs, extraction without latex {extract_time:.2f}s")
+    for name, elapsed in runs.items():
+        saved = (baseline - elapsed) / (extract_time + baseline)
+        print(f"{name:>12}: latex {elapsed:7.2f}s, {saved:6.1%} of retrieve's extraction time saved")
+
+    stats = memoized.stats()
+    print(f"skipped {stats['skipped'] / stats['paragraphs']:.1%} of paragraphs, "
+          f"{stats['memo_size']} memoized conversions")
+
+
+if __name__ == '__main__':
+    main()
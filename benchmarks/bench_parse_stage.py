@@ -0,0 +1,57 @@
+""" Measures the throughput of the parse stage, in pages per second, against its worker count.
+
+Every page is extracted and its latex converted, like retrieve does with config['latex'] set.
+Zero workers parses in the calling thread, the behaviour without worker processes.
+
+Usage:
+    python benchmarks/bench_parse_stage.py pages/ --workers 0 1 2 4
+    python benchmarks/bench_parse_stage.py arbiter.db
+"""
+import argparse
+import os
+import sys
+import time
+
+from bench_extractor import load_pages
+
+from wikicrawler.core.parse.stage import ParseStage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help="A directory of .html pages or a cache database with raw html.")
+    parser.add_argument('--limit', type=int, default=None, help="Benchmark at most this many pages.")
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help="Worker counts to measure, defaults to 0 and powers of two up to the cpu count.")
+    parser.add_argument('--no-latex', action='store_true', help="Skip the latex conversion.")
+    args = parser.parse_args()
+
+    pages = load_pages(args.source, args.limit)
+    if not pages:
+        print(f"No pages found in {args.source}.")
+        sys.exit(1)
+
+    workers = args.workers
+    if workers is None:
+        workers = [0] + [2 ** i for i in range(os.cpu_count().bit_length()) if 2 ** i <= os.cpu_count()]
+
+    print(f"{len(pages)} pages, {os.cpu_count()} cpus")
+    baseline = None
+    for count in workers:
+        with ParseStage(count, latex=not args.no_latex) as stage:
+            # Start the worker processes before timing.
+            list(stage.map(pages[:count]))
+
+            start = time.perf_counter()
+            results = list(stage.map(pages))
+            elapsed = time.perf_counter() - start
+
+        assert [wiki['url'] for wiki, _ in results] == [url for url, _ in pages]
+
+        rate = len(pages) / elapsed
+        baseline = baseline or rate
+        print(f"{count:>3} workers: {rate:8.1f} pages/s {rate / baseline:6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
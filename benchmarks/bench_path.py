@@ -0,0 +1,111 @@
+""" Measures finding a path of links between random pages, from both ends and forward only.
+
+A local stand-in for the api serves a synthetic wiki and its backlinks, each page linking
+to random others, with a fixed latency per request like a remote server. Each pair of pages
+is searched from an empty cache by the one-sided breadth first search and by the bidirectional
+one, then once more by the bidirectional one from the cache it left.
+
+Usage:
+    python benchmarks/bench_path.py --pages 20000 --links 20 --pairs 5 --latency 0.05
+"""
+import argparse
+import json
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from wikicrawler.core.crawler import WikiCrawler
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.parse.wikitext import title_url
+from wikicrawler.core.utils.config import default_config
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.05
+    # The links of each page, and the pages linking to each page.
+    out = []
+    into = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+        time.sleep(self.latency)
+
+        if params.get('list') == 'backlinks':
+            n = int(params['bltitle'].split()[-1])
+            data = {'batchcomplete': True, 'query': {'backlinks': [{'ns': 0, 'title': f"Page {i}"}
+                                                                   for i in self.into[n][:int(params['bllimit'])]]}}
+        else:
+            pages = []
+            for title in params['titles'].split('|'):
+                links = ' '.join(f"[[Page {i}]]" for i in self.out[int(title.split()[-1])])
+                text = f"'''{title}''' is a page of the benchmark. It links to {links}."
+                pages.append({'title': title, 'revisions': [{'slots': {'main': {'content': text}}}]})
+            data = {'batchcomplete': True, 'query': {'pages': pages}}
+
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def search(api_url, pages, start, goal, bidirectional):
+    with tempfile.TemporaryDirectory() as root:
+        config = default_config(root)
+        config.update(api_url=api_url, backend='query', latex=False,
+                      rate_limit={'anonymous': {'rate': 1000, 'burst': 100}}, path_max_pages=pages)
+        with WikiCacher(config) as cacher:
+            crawler = WikiCrawler(config, cacher=cacher)
+            try:
+                # The bidirectional search runs again from the cache it left.
+                for name in (('bidirectional', 'cached') if bidirectional else ('bfs',)):
+                    path, stats = crawler.path(start, goal, bidirectional=bidirectional)
+                    print(f"{name:>13}: {len(path) - 1 if path else '-'} links, {stats['expanded']:5} expanded, "
+                          f"{stats['retrieved']:5} retrieved, {stats['backlinks']:3} backlinks "
+                          f"in {stats['seconds']:6.2f}s")
+            finally:
+                crawler.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=20_000, help="Pages in the synthetic wiki.")
+    parser.add_argument('--links', type=int, default=20, help="Links per page.")
+    parser.add_argument('--pairs', type=int, default=5, help="Pairs of pages to search between.")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds the stand-in takes per request.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    StandIn.latency = args.latency
+    StandIn.out = rng.integers(0, args.pages, (args.pages, args.links)).tolist()
+    StandIn.into = [[] for _ in range(args.pages)]
+    for i, links in enumerate(StandIn.out):
+        for j in links:
+            StandIn.into[j].append(i)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    api_url = f"http://127.0.0.1:{server.server_port}/w/api.php"
+    try:
+        for start, goal in rng.integers(0, args.pages, (args.pairs, 2)):
+            start, goal = title_url(f"Page {start}"), title_url(f"Page {goal}")
+            for bidirectional in (False, True):
+                search(api_url, args.pages, start, goal, bidirectional)
+            print()
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
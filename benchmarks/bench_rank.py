@@ -0,0 +1,85 @@
+""" Measures PageRank over a large link graph, from scratch and again after pages are added.
+
+The graph is written in the files of a LinkGraph directly, pages linking to pages drawn from a
+power law, then opened and ranked like the cache's graph. Pages are then added through
+LinkGraph.add, as caching them would, and ranked again from the previous ranks.
+
+Usage:
+    python benchmarks/bench_rank.py --pages 1000000 --links 20 --added 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from wikicrawler.core.db.graph import LinkGraph
+from wikicrawler.core.rank import PageRanker
+
+
+WIKI = "https://en.wikipedia.org/wiki/"
+
+
+def write_graph(path, pages, links, seed=0):
+    rng = np.random.default_rng(seed)
+    degrees = rng.poisson(links, pages)
+    offsets = np.concatenate([[0], np.cumsum(degrees)]).astype(np.int64)
+    targets = rng.integers(0, pages, offsets[-1], dtype=np.int32)
+    popular = rng.random(offsets[-1]) < 0.3
+    targets[popular] = (rng.zipf(1.5, popular.sum()) - 1) % pages
+    sources = np.repeat(np.arange(pages, dtype=np.int32), degrees)
+
+    # Sorted and without duplicates or loops, as LinkGraph.compact leaves them.
+    keys = np.unique(sources.astype(np.int64) * pages + targets)
+    sources, targets = keys // pages, keys % pages
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=pages))]).astype(np.int64)
+    in_offsets = np.concatenate([[0], np.cumsum(np.bincount(targets, minlength=pages))]).astype(np.int64)
+    in_sources = sources[np.argsort(targets, kind='stable')].astype(np.int32)
+
+    os.makedirs(path)
+    with open(path + '/nodes.txt', 'w') as f:
+        f.write(''.join(f"{WIKI}Page_{i}\n" for i in range(pages)))
+    np.savez(path + '/csr.npz', offsets=offsets, targets=targets.astype(np.int32), in_offsets=in_offsets,
+             in_sources=in_sources, forward=np.zeros((0, 2), dtype=np.int32))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=1_000_000, help="Pages in the graph.")
+    parser.add_argument('--links', type=int, default=20, help="Links per page on average.")
+    parser.add_argument('--added', type=int, default=1000, help="Pages added before ranking again.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        path = root + '/links.graph'
+        write_graph(path, args.pages, args.links)
+
+        start = time.perf_counter()
+        graph = LinkGraph(path)
+        print(f"{len(graph)} pages, {graph.stats()['edges']} links, opened in {time.perf_counter() - start:.2f}s")
+
+        ranker = PageRanker(graph)
+        for name, around in (('pagerank', None), ('personalized', [0])):
+            start = time.perf_counter()
+            ranker.ranks(around=around)
+            print(f"{name}: {time.perf_counter() - start:.2f}s, {ranker.last['iterations']} iterations "
+                  f"of {ranker.last['seconds'] / ranker.last['iterations'] * 1e3:.0f}ms")
+
+        rng = np.random.default_rng(1)
+        for i in range(args.added):
+            graph.add(f"{WIKI}New_{i}", [f"{WIKI}Page_{j}" for j in rng.integers(0, args.pages, args.links)],
+                      canonical=True)
+
+        start = time.perf_counter()
+        graph.compact()
+        compacted = time.perf_counter() - start
+        ranker.ranks()
+        print(f"pagerank after adding {args.added} pages: {time.perf_counter() - start:.2f}s, "
+              f"{compacted:.2f}s compacting the graph, {ranker.last['iterations']} iterations from the previous ranks")
+
+
+if __name__ == '__main__':
+    main()
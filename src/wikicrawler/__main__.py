@@ -14,6 +14,48 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import argparse
+import logging
+
+from .core.db.cacher import WikiCacher
+from .core.dump import DumpIngester
+from .core.parse.urls import LinkFilter
+from .core.utils.config import init_config
+
+
+logger = logging.getLogger(__name__)
+
+
+def ingest_dump(args):
+    """ Ingests a pages-articles-multistream dump into the cache, see DumpIngester. """
+    config = init_config()
+
+    with WikiCacher(config) as wc:
+        ingester = DumpIngester(wc, args.dump, args.index, processes=args.processes, latex=config['latex'],
+                                links=LinkFilter.from_config(config))
+        stats = ingester.ingest(limit=args.limit)
+
+    print(f"Cached {stats['pages']} articles from {stats['streams']} streams in {stats['seconds']:.1f}s "
+          f"({stats['pages_per_second']:.0f} articles/s), skipped {stats['redirects']} redirects and "
+          f"{stats['skipped']} other pages.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='wikicrawler')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest-dump', help="cache the articles of a wikipedia xml dump")
+    ingest.add_argument('dump', help="a pages-articles-multistream.xml.bz2 dump")
+    ingest.add_argument('--index', help="its multistream index, defaults to the -index.txt.bz2 next to it")
+    ingest.add_argument('--processes', type=int, help="worker processes, defaults to the number of cores")
+    ingest.add_argument('--limit', type=int, help="only ingest this many streams of 100 pages")
+    ingest.set_defaults(func=ingest_dump)
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(name)s:%(lineno)d::%(levelname)s> %(message)s', level=logging.INFO)
+    args.func(args)
+
+
 if __name__ == '__main__':
-    # TODO: argparse commands/entries into sub-modules
-    pass
\ No newline at end of file
+    main()
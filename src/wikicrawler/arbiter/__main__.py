@@ -26,7 +26,10 @@ def main():
         prompt = WikiPrompt(config, crawler, cacher=wc)
 
         logger.info("Arbiter started, enjoy your tumble.")
-        prompt.loop()
+        try:
+            prompt.loop()
+        finally:
+            crawler.close()
 
 
 if __name__ == '__main__':
@@ -1,8 +1,12 @@
 import logging
 import os
+import time
+import urllib.parse
 from random import randint
 
 from .utils.frequency import get_highest_freq
+from ..core.parse.wikitext import title_url
+from ..core.rank import PageRanker
 
 
 logger = logging.getLogger(__name__)
@@ -30,6 +34,7 @@ class Oracle:
             os.makedirs(oracle_path)
 
         self.brain = None
+        self.ranker = None
 
     def save_state(self):
         pass
@@ -61,6 +66,7 @@ class Oracle:
             if hook is not None:
                 # TODO: make hook a list?
                 script.append(f"{hook}")
+            script.append("checkpoint")
         
         ## logging.debug("Running script:\n\t{}".format('\n\t'.join(script))) TODO: DelayedExecution lambda wrapper?
         self.prompt.run_script(script)
@@ -86,6 +92,111 @@ class Oracle:
 
         # logger.debug(f"cmov proc: {jump_phrase}, {self.prompt.pointer['most_similar_colloc']}, {self.prompt.crawl_state['last_search'][0]}")
 
+    def handle_crawl(self, n, strategy='best', depth=2):
+        """
+        Crawl n pages from the current page, printing them as they are visited.
+
+        The best-first crawl follows the links closest to the current page's collocations first.
+        """
+        try:
+            page = self.prompt.crawl_state['pages'][self.prompt.pointer['selection']]
+        except (IndexError, KeyError):
+            print("No page selected to crawl from.")
+            return
+
+        tags = page.get('stats', {}).get('collocations') if strategy == 'best' else None
+        crawl = self.prompt.crawler.traverse(page['url'], tags=tags, strategy=strategy, max_depth=depth,
+                                             max_pages=n)
+        print(f"Crawl {crawl.crawl_id}, continue it with: resume {crawl.crawl_id}")
+        self.__run_crawl(crawl)
+
+    def handle_resume(self, crawl_id):
+        """
+        Resume a checkpointed crawl where it stopped, printing the pages as they are visited.
+        """
+        crawl = self.prompt.crawler.resume(crawl_id)
+        if crawl is None:
+            print(f"No crawl {crawl_id} to resume, see crawls.")
+            return
+
+        self.__run_crawl(crawl)
+
+    def handle_crawls(self):
+        """
+        List the checkpointed crawls, the latest first.
+        """
+        for entry in self.prompt.crawler.crawls():
+            params = entry['params']
+            print(f"{entry['crawl_id']}\t{entry['counts'].get('pages', 0)}/{params['max_pages']} pages\t"
+                  f"{params['strategy']} from {', '.join(params['start'])}\t{time.ctime(entry['updated'])}")
+
+    def __run_crawl(self, crawl):
+        try:
+            for depth, visited in crawl:
+                print(f"{depth}\t{visited['title']}")
+        except KeyboardInterrupt:
+            print(f"Crawl interrupted, continue it with: resume {crawl.crawl_id}")
+
+        print(crawl.stats())
+
+    def handle_rank(self, n=10):
+        """
+        List the n highest ranked pages the current page links to which have not been visited yet.
+
+        Pages are ranked by PageRank personalized around the current page, over the links of all cached pages.
+        """
+        cacher = self.prompt.crawler.cacher
+        graph = cacher.graph if cacher is not None else None
+        if graph is None:
+            print("The link graph is disabled, set link_graph in config.json.")
+            return
+
+        try:
+            page = self.prompt.crawl_state['pages'][self.prompt.pointer['selection']]
+        except (IndexError, KeyError):
+            print("No page selected to rank from.")
+            return
+
+        i = graph.id(page['url'])
+        if i is None:
+            print(f"{page['title']} is not in the link graph.")
+            return
+
+        if self.ranker is None:
+            self.ranker = PageRanker(graph)
+        ranks = self.ranker.ranks(around=[i])
+
+        visited = {graph.id(visited['url']) for visited in self.prompt.crawl_state['pages'].values()} - {None}
+        for j, rank in self.ranker.top(ranks, graph.out_ids(i), n, exclude=visited):
+            url = graph.url(j)
+            title = urllib.parse.unquote(url.rpartition('/wiki/')[2]).replace('_', ' ')
+            print(f"{rank:.6f}\t{title}{'' if url in cacher else ' (not cached)'}")
+
+        print(self.ranker.last)
+
+    def handle_path(self, start, goal, bidirectional=True):
+        """
+        Find a shortest path of links from one page to another, by their titles or urls.
+
+        The search runs from both ends over the cached links, fetching the pages it is missing,
+        or only forward from the start if bidirectional is False.
+        """
+        start, goal = [page if page.startswith('http') else title_url(page) for page in (start, goal)]
+        try:
+            path, stats = self.prompt.crawler.path(start, goal, bidirectional=bidirectional)
+        except ValueError as e:
+            print(e)
+            return
+
+        if path is None:
+            print(f"No path found within {self.prompt.crawler.config['path_max_depth']} links.")
+        else:
+            print(' -> '.join(urllib.parse.unquote(url.rpartition('/wiki/')[2]).replace('_', ' ') for url in path))
+            print(f"{len(path) - 1} links.")
+
+        print(f"{stats['expanded']} pages expanded ({stats['forward']} forward, {stats['backward']} backward), "
+              f"{stats['retrieved']} retrieved, {stats['backlinks']} backlinks requests in {stats['seconds']:.2f}s.")
+
     # TODO: Oracle should compile a summarization of the crawl and user input.
     def parse_cmd(self, command):
         """
@@ -102,6 +213,13 @@ class Oracle:
             cmov <n> <phrase> - move to first page matched by phrase==collocations[n] of current page.
             fmov <n> <phrase> - move to first page matched by phrase==frequency[n] of current page.
 
+            crawl <n> [bfs|dfs|best] [depth] - crawl n pages from the current page, best-first by its collocations.
+            crawls - list the checkpointed crawls.
+            resume <crawl-id> - resume a crawl from its last checkpoint.
+
+            rank [n] - list the n highest ranked unvisited pages the current page links to, by PageRank around it.
+            path [bfs] <A> -> <B> - find a shortest path of links from page A to page B, bfs to only search forward.
+
             help - show help
         """
         match command:
@@ -133,5 +251,33 @@ class Oracle:
                     logger.info("Invalid jump phrase or n")
 
 
+            case ['crawl', n, *options]:
+                try:
+                    strategy = options[0] if len(options) >= 1 else 'best'
+                    depth = int(options[1]) if len(options) >= 2 else 2
+                    self.handle_crawl(int(n), strategy, depth)
+                except ValueError:
+                    logger.info("Invalid arguments for crawl command.")
+
+            case ['crawls']:
+                self.handle_crawls()
+
+            case ['resume', crawl_id]:
+                self.handle_resume(crawl_id)
+
+            case ['rank', *n]:
+                try:
+                    self.handle_rank(int(n[0]) if n else 10)
+                except ValueError:
+                    logger.info("Invalid arguments for rank command.")
+
+            case ['path', *pages]:
+                bidirectional = pages[:1] != ['bfs']
+                start, _, goal = ' '.join(pages[0 if bidirectional else 1:]).partition('->')
+                if start.strip() and goal.strip():
+                    self.handle_path(start.strip(), goal.strip(), bidirectional=bidirectional)
+                else:
+                    logger.info("Invalid arguments for path command.")
+
             case ['help']:
                 print(self.parse_cmd.__doc__)
@@ -371,8 +371,16 @@ class WikiPrompt(WikiScriptEngine):
             o[racle] <subcmd> - handle oracle commands
             seer <subcmd> - handle seer commands
 
+            crawls - list the checkpointed crawls
+            resume <crawl-id> - resume a crawl from its last checkpoint
+            checkpoint - save the state and commit the cache
+            rank [n] - list the n highest ranked unvisited pages the current page links to
+            path <A> -> <B> - find a shortest path of links from page A to page B
+
             pointer - print pointer
             state - print state
+            stats - print fetch statistics
+            media - print media download progress, store usage and failures
 
             newf <name> - create new function
 
@@ -398,10 +406,31 @@ class WikiPrompt(WikiScriptEngine):
             case ['seer', *cmd]:
                 self.seer.parse_cmd(cmd)
 
+            case ['crawls']:
+                self.oracle.handle_crawls()
+            case ['resume', crawl_id]:
+                self.oracle.handle_resume(crawl_id)
+            case ['checkpoint']:
+                self.checkpoint()
+            case ['rank', *n]:
+                self.oracle.parse_cmd(['rank', *n])
+            case ['path', *pages]:
+                self.oracle.parse_cmd(['path', *pages])
+
             case ['pointer']:
                 print(self.pointer)
             case ['state']:
                 print(self.crawl_state)
+            case ['stats']:
+                print(self.crawler.stats())
+            case ['media']:
+                if self.crawler.media is None:
+                    print("Media saving is disabled, set save_media in config.json.")
+                else:
+                    print(self.crawler.media.progress())
+                    print(self.crawler.media_store.stats())
+                    for url, error in self.crawler.media.failed().items():
+                        print(f"\t{url}: {error}")
 
             case ['help']:
                 # TODO: Read from source.
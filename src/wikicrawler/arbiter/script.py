@@ -113,6 +113,18 @@ class WikiScriptEngine:
         except FileNotFoundError as e:
             logger.debug("Files probably deleted while system was running", exc_info=e)
 
+    def checkpoint(self):
+        """ Saves the state and commits the pages cached so far, so a long script loses nothing if it is interrupted.
+
+        Unlike save_state, the last search is kept, since the rest of the script may use it.
+        """
+        last_search = self.crawl_state['last_search']
+        self.save_state()
+        self.crawl_state['last_search'] = last_search
+
+        if self.cacher is not None:
+            self.cacher.commit()
+
     def cmd_func_init(self, name, lines=None):
         """ This function is used to initialize a function from script/interactive mode.
         
@@ -0,0 +1,242 @@
+import html
+import logging
+import urllib.error
+import urllib.parse
+
+from .net.api import BATCH_SIZE, ApiClient, ApiError
+from .parse.wikitext import extract_wikitext, title_url
+
+
+logger = logging.getLogger(__name__)
+
+
+def url_title(url):
+    """
+    The title of the article a url points at, e.g. https://en.wikipedia.org/wiki/Sun_(star) -> Sun (star).
+
+    Raises:
+        ValueError: If the url is not a wikipedia article url.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    if 'wikipedia.org' not in parsed.netloc or not parsed.path.startswith('/wiki/') or parsed.query:
+        raise ValueError(url)
+
+    return urllib.parse.unquote(parsed.path[len('/wiki/'):]).replace('_', ' ')
+
+
+class ApiWikiGrabber:
+    """ ApiWikiGrabber retrieves pages through the MediaWiki action API instead of scraping them.
+
+    With config['backend'] set to 'query', the wikitext of up to BATCH_SIZE pages is fetched
+    in one action=query request and converted by extract_wikitext, so retrieving the links
+    of a page costs a request per 50 links instead of one per link. Templates are not
+    expanded this way. 'parse' fetches each rendered article with action=parse and extracts
+    it like the html backend does, without the skin around it. Both build the same page
+    dictionary as WikiGrabber.retrieve.
+
+    Usage:
+        api = ApiWikiGrabber(grabber, mode='query')
+        wikis = api.retrieve_many(urls)
+    """
+    def __init__(self, grabber, mode='query'):
+        """ Initializes the ApiWikiGrabber class.
+
+        Args:
+            grabber (WikiGrabber): The grabber whose pool, limiter, cacher and page assembly are used.
+            mode (str): 'query' or 'parse'.
+        """
+        if mode not in ('query', 'parse'):
+            raise ValueError(f"Unknown api backend {mode}.")
+
+        self.grabber = grabber
+        self.cacher = grabber.cacher
+        self.mode = mode
+
+        self.api = ApiClient(grabber.pool, grabber.limiter, grabber.config['api_url'], grabber.headers())
+        self.pages = 0
+
+    def stats(self):
+        """ Returns the number of pages retrieved and api requests made. """
+        return {'mode': self.mode, 'pages': self.pages, 'requests': self.api.requests}
+
+    def fetch(self, url):
+        """
+        Fetches and extracts a page without caching it.
+
+        Args:
+            url (str): The url of the page.
+
+        Returns:
+            tuple: The page dictionary and its html, which is only available in parse mode.
+
+        Raises:
+            ValueError: If the url is not a wikipedia article url.
+            AttributeError: If the page could not be fetched or does not exist.
+        """
+        if self.mode == 'parse':
+            return self.parse(url)
+
+        wiki = self.fetch_many([url])[url]
+        if wiki is None:
+            raise AttributeError(f"Failed to fetch {url}.")
+
+        return wiki, None
+
+    def parse(self, url):
+        """ Fetches a rendered article with action=parse and extracts it, see fetch. """
+        params = {'action': 'parse', 'page': url_title(url), 'prop': 'text|sections', 'redirects': '1',
+                  'disableeditsection': '1', 'disabletoc': '1'}
+        try:
+            parsed = self.api.get(params)['parse']
+        except (ApiError, urllib.error.URLError, KeyError) as e:
+            logger.debug(f"Failed to parse {url}.", exc_info=e)
+            raise AttributeError(f"Failed to fetch {url}.") from e
+
+        page_url = title_url(parsed['title'])
+        self.grabber.redirected(url, page_url)
+        page = self.__page_html(parsed)
+        self.pages += 1
+
+        return self.grabber.extract_html(url, page, page_url), page
+
+    def __page_html(self, parsed):
+        """ Wraps the parsed article in the elements the extractors look for, with a toc built from its sections. """
+        toc = ''.join(f"<li><a href=\"#{html.escape(section['anchor'])}\">{section['number']} {section['line']}</a></li>"
+                      for section in parsed.get('sections', []))
+
+        return (f"<html><body><h1 id=\"firstHeading\">{html.escape(parsed['title'])}</h1>"
+                f"<div id=\"mw-content-text\"><div id=\"toc\"><ul>{toc}</ul></div>{parsed['text']}</div>"
+                "</body></html>")
+
+    def fetch_many(self, urls):
+        """
+        Fetches and extracts pages BATCH_SIZE at a time without caching them.
+
+        Args:
+            urls (list): The urls of the pages.
+
+        Returns:
+            dict: The page dictionaries by url, None for pages which could not be fetched.
+        """
+        titles = {}
+        wikis = {}
+        for url in dict.fromkeys(urls):
+            try:
+                if not self.grabber.links.allowed(url):
+                    raise ValueError(f"{url} is in an excluded namespace.")
+                titles[url] = url_title(url)
+            except ValueError as e:
+                logger.debug(f"Refusing to fetch {url}.", exc_info=e)
+                wikis[url] = None
+
+        batch = list(dict.fromkeys(titles.values()))
+        pages = {}
+        for i in range(0, len(batch), BATCH_SIZE):
+            try:
+                pages.update(self.__query(batch[i:i + BATCH_SIZE]))
+            except (ApiError, urllib.error.URLError, KeyError) as e:
+                logger.debug(f"Failed to fetch {len(batch[i:i + BATCH_SIZE])} pages.", exc_info=e)
+
+        for url, title in titles.items():
+            page = pages.get(title)
+            if page is None:
+                wikis[url] = None
+                continue
+
+            title, wikitext = page
+            self.grabber.redirected(url, title_url(title))
+            parts = extract_wikitext(title_url(title), title, wikitext)
+            wikis[url] = self.grabber.assemble(url, parts)
+            self.pages += 1
+
+        return wikis
+
+    def __query(self, titles):
+        """
+        Queries the wikitext of up to BATCH_SIZE pages, following redirects.
+
+        Returns:
+            dict: The title the page was asked for -> (its title after redirects, its wikitext),
+                  pages which do not exist are left out.
+        """
+        params = {'action': 'query', 'prop': 'revisions', 'rvprop': 'content', 'rvslots': 'main',
+                  'redirects': '1', 'titles': '|'.join(titles)}
+
+        aliases = {}
+        contents = {}
+        for data in self.api.query(params):
+            query = data.get('query', {})
+            for alias in query.get('normalized', []) + query.get('redirects', []):
+                aliases[alias['from']] = alias['to']
+
+            for page in query.get('pages', []):
+                if page.get('revisions'):
+                    contents[page['title']] = page['revisions'][0]['slots']['main']['content']
+
+        pages = {}
+        for title in titles:
+            target = title
+            for _ in range(len(aliases)):
+                if target not in aliases:
+                    break
+                target = aliases[target]
+
+            if target in contents:
+                pages[title] = (target, contents[target])
+
+        return pages
+
+    def backlinks(self, url, limit=500):
+        """
+        Lists the articles which link to a page, or to a redirect to it, with list=backlinks.
+
+        Args:
+            url (str): The url of the page.
+            limit (int): The most articles to list.
+
+        Returns:
+            list: The urls of the articles.
+
+        Raises:
+            ValueError: If the url is not a wikipedia article url, or the api returned an error.
+            urllib.error.URLError: If a request failed.
+        """
+        params = {'action': 'query', 'list': 'backlinks', 'bltitle': url_title(url), 'blnamespace': '0',
+                  'blredirect': '1', 'bllimit': str(min(limit, 500))}
+
+        urls = []
+        for data in self.api.query(params):
+            for link in data.get('query', {}).get('backlinks', []):
+                if not link.get('redirect'):
+                    urls.append(title_url(link['title']))
+                urls.extend(title_url(redirected['title']) for redirected in link.get('redirlinks', []))
+
+            if len(urls) >= limit:
+                break
+
+        return urls[:limit]
+
+    def retrieve_many(self, urls):
+        """
+        Retrieves several pages from the cache, or BATCH_SIZE at a time from the api in query mode.
+
+        Args:
+            urls (list): The urls to retrieve.
+
+        Returns:
+            list: The page dictionaries in the same order as urls, None for failed fetches.
+                  Fetched pages are cached in that order too.
+        """
+        wikis = {}
+        if self.cacher is not None:
+            wikis = self.cacher.get_many(urls)
+
+        missing = [url for url in dict.fromkeys(urls) if url not in wikis]
+        fetched = self.fetch_many(missing)
+
+        for url in missing:
+            if fetched[url] is not None:
+                self.grabber.cache(fetched[url])
+            wikis[url] = fetched[url]
+
+        return [wikis[url] for url in urls]
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncWikiGrabber:
+    """ AsyncWikiGrabber overlaps the network waits of a WikiGrabber with asyncio.
+
+    The blocking fetches of the wrapped grabber are run on a thread pool, while
+    at most `max_in_flight` requests are outstanding at once. The cacher is only
+    touched from the event loop's thread, so the database session is never shared
+    between threads.
+
+    Usage:
+        with AsyncWikiGrabber(grabber) as agrabber:
+            pages = asyncio.run(agrabber.retrieve_many(urls))
+    """
+    def __init__(self, grabber, max_in_flight=None):
+        """ Initializes the AsyncWikiGrabber class.
+
+        Args:
+            grabber (WikiGrabber): The grabber used to fetch and parse pages.
+            max_in_flight (int): The maximum number of concurrent requests, defaults to config['max_in_flight'].
+        """
+        self.grabber = grabber
+        self.cacher = grabber.cacher
+
+        if max_in_flight is None:
+            max_in_flight = grabber.max_in_flight
+        self.max_in_flight = max(1, max_in_flight)
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="grabber")
+
+        # asyncio primitives are bound to the loop they are first used on.
+        self.__loop = None
+        self.__semaphore = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        if self.__loop is not loop:
+            self.__loop = loop
+            self.__semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        return self.__semaphore
+
+    async def _run(self, func, *args):
+        """ Runs a blocking grabber call on the thread pool, bounded by the in-flight limit. """
+        async with self._semaphore():
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def fetch(self, url):
+        """
+        Fetches a page from the internet without blocking the event loop.
+
+        Args:
+            url (str): The url to fetch.
+
+        Returns:
+            bs4.BeautifulSoup: The naked page soup, or None if the fetch failed.
+        """
+        try:
+            return await self._run(self.grabber.fetch, url)
+        except ValueError as e:
+            logger.debug(f"Refusing to fetch {url}.", exc_info=e)
+            return None
+
+    async def retrieve(self, url):
+        """
+        Retrieves a page from the cache or the internet, see WikiGrabber.retrieve.
+
+        Args:
+            url (str): The url to retrieve.
+
+        Returns:
+            dict: The page dictionary, or None if the page could not be fetched.
+        """
+        return (await self.retrieve_many([url]))[0]
+
+    async def _fetch_extract(self, url):
+        """ Fetches and extracts a page without caching it, returns the page dictionary and its html. """
+        try:
+            return await self._run(self.grabber.fetch_extract, url)
+        except ValueError as e:
+            logger.debug(f"Refusing to fetch {url}.", exc_info=e)
+        except AttributeError as e:
+            logger.debug(f"Failed to extract {url} - is this even a wiki page?", exc_info=e)
+
+        return None, None
+
+    async def fetch_many(self, urls):
+        """
+        Fetches several pages concurrently.
+
+        Args:
+            urls (list): The urls to fetch.
+
+        Returns:
+            list: The page soups in the same order as urls, None for failed fetches.
+        """
+        return await asyncio.gather(*[self.fetch(url) for url in urls])
+
+    async def retrieve_many(self, urls):
+        """
+        Retrieves several pages concurrently.
+
+        Args:
+            urls (list): The urls to retrieve.
+
+        Returns:
+            list: The page dictionaries in the same order as urls, None for failed fetches.
+                  Fetched pages are cached in that order too.
+        """
+        wikis = {}
+        if self.cacher is not None:
+            wikis = self.cacher.get_many(urls)
+
+        missing = list(dict.fromkeys(url for url in urls if url not in wikis))
+        fetched = await asyncio.gather(*[self._fetch_extract(url) for url in missing])
+
+        # Cached from the loop's thread, in the order the pages were asked for.
+        for url, (wiki, html) in zip(missing, fetched):
+            if wiki is not None:
+                self.grabber.cache(wiki, html)
+            wikis[url] = wiki
+
+        return [wikis[url] for url in urls]
@@ -1,15 +1,798 @@
+import collections
+import heapq
+import logging
+import multiprocessing
 import os
+import queue
+import re
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+from .grabber import WikiGrabber
 from .seeker import WikiSeeker
 from .db.cacher import WikiCacher
+from .db.frontier import SqliteFrontier
+from .parse.urls import canonical_url
+from .path import PathFinder
+from .utils.bloom import BloomFilter, ExactSet
+
+
+logger = logging.getLogger(__name__)
+
+
+STRATEGIES = ('bfs', 'dfs', 'best')
+
+
+def tag_score(tags):
+    """
+    A scoring function for best-first crawls, the overlap of a link with tags such as the collocations of a page.
+
+    Args:
+        tags (list): Phrases, as strings or tuples of words, e.g. page['stats']['collocations'].
+
+    Returns:
+        function: score(text, url), the number of tag words in the link's text and title,
+                  plus one for each whole tag phrase in its text.
+    """
+    phrases = [' '.join(tag).lower() if isinstance(tag, (tuple, list)) else str(tag).lower() for tag in tags]
+    words = {word for phrase in phrases for word in re.findall(r'\w+', phrase)}
+
+    def score(text, url):
+        text = text.lower()
+        title = _link_title(url).lower()
+        link_words = set(re.findall(r'\w+', text)) | set(re.findall(r'\w+', title))
+
+        return len(words & link_words) + sum(phrase in text for phrase in phrases if phrase)
+
+    return score
+
+
+def _link_title(url):
+    """ The title of a page from its url, or '' if it is not a page url. """
+    _, _, title = url.partition('/wiki/')
+    return urllib.parse.unquote(title).replace('_', ' ')
+
+
+def priority(strategy, depth, score=0.0):
+    """ The priority of a page in a SqliteFrontier, lower is claimed first, see Frontier. Ties are
+    broken by the order pages were queued in, most recent first for 'dfs', see SqliteFrontier. """
+    if strategy == 'bfs':
+        return depth
+    if strategy == 'dfs':
+        return -depth
+    return -score
+
+
+class Frontier:
+    """ Frontier holds the pages a crawl has yet to visit, in order of priority.
+
+    'bfs' visits the shallowest pages first, 'dfs' the deepest and most recently found,
+    and 'best' the highest scored, shallowest first among equal scores. Pages found at
+    the same priority are visited in the order they were found, except for 'dfs'.
+    """
+    def __init__(self, strategy='bfs'):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown crawl strategy {strategy}, expected one of {STRATEGIES}.")
+
+        self.strategy = strategy
+        self.heap = []
+        self.order = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, url, depth, score=0.0):
+        n = self.order
+        self.order += 1
+        if self.strategy == 'bfs':
+            key = (depth, n)
+        elif self.strategy == 'dfs':
+            key = (-depth, -n)
+        else:
+            key = (-score, depth, n)
+
+        heapq.heappush(self.heap, (key, url, depth, score))
+
+    def pop(self):
+        """ Returns the entry of the page to visit next, see requeue. """
+        return heapq.heappop(self.heap)
+
+    def requeue(self, entry):
+        """ Puts a popped entry back, at the priority it had. """
+        heapq.heappush(self.heap, entry)
+
+    def state(self, popped=()):
+        """ Returns the entries, with popped entries yet to be requeued, and the order of the next page, see restore. """
+        return {'entries': self.heap + list(popped), 'order': self.order}
+
+    def restore(self, state):
+        """ Restores the entries and order of a frontier from its state, e.g. after it went through JSON. """
+        self.heap = [(tuple(key), url, depth, score) for key, url, depth, score in state['entries']]
+        heapq.heapify(self.heap)
+        self.order = state['order']
+
+
+def new_crawl_id():
+    """ A short random id for a crawl, see Crawl.checkpoint. """
+    return uuid.uuid4().hex[:8]
+
+
+class Crawl:
+    """ Crawl traverses the wiki from a set of pages, following their paragraph and see also links.
+
+    Pages are visited in the order of a Frontier, up to max_depth links away from the start
+    and at most max_pages of them. Up to `workers` pages are fetched concurrently, on threads
+    which only fetch and extract. Pages are cached and their links followed on the thread
+    iterating over the crawl, so it is the only one touching the cacher. Pages which are
+    cached already are not fetched again. Every page is queued once, by its canonical url,
+    and redirects to a page visited already are skipped.
+
+    Iterating over a crawl runs it, yielding each page as it is visited, so callers can
+    process pages while the rest are being fetched. Stopping early leaves the frontier
+    as it was, the crawl can be iterated over again to continue it.
+
+    With a cacher, the crawl is checkpointed every config['crawl_checkpoint_every'] pages and
+    when it stops, see checkpoint. If the process is interrupted, WikiCrawler.resume continues
+    the crawl from its last checkpoint, reading the pages it had fetched from the cache.
+
+    The urls seen are kept in a BloomFilter with a false positive rate of config['crawl_seen_error'],
+    a few bytes per url however long it is, and saved next to the cache with each checkpoint
+    until the crawl finishes with nothing left to visit, see forget.
+    A false positive skips a link. The frontier and the cache stay the record of what was
+    queued and visited: the filter is rebuilt from them if it is missing or older than the
+    checkpoint. With crawl_seen_error set to None the urls are kept in a set instead.
+
+    Usage:
+        crawl = crawler.traverse(url, tags=collocations, max_pages=50)
+        for depth, page in crawl:
+            ...
+        print(crawl.stats()['pages_per_second'])
+
+        crawl = crawler.resume(crawl.crawl_id)
+    """
+    def __init__(self, crawler, start, strategy='bfs', score=None, max_depth=2, max_pages=100, workers=4,
+                 tags=None, crawl_id=None):
+        """ Initializes the Crawl class.
+
+        Args:
+            crawler (WikiGrabber): The grabber used to fetch, extract and cache pages.
+            start (list): The urls to start from, at depth 0.
+            strategy (str): 'bfs', 'dfs' or 'best', see Frontier.
+            score (function): score(text, url) of a link for 'best', higher is visited first, see tag_score.
+            max_depth (int): The most links away from the start to follow, None for no limit.
+            max_pages (int): The most pages to visit, None for no limit.
+            workers (int): The number of pages fetched concurrently.
+            tags (list): Phrases to score links by when score is None, see tag_score. Unlike a score
+                         function they are checkpointed, so a resumed crawl scores links the same way.
+            crawl_id (str): The id the crawl is checkpointed under, a new one by default.
+        """
+        self.crawler = crawler
+        self.crawl_id = crawl_id or new_crawl_id()
+        self.start = list(start)
+        self.strategy = strategy
+        self.frontier = Frontier(strategy)
+        self.tags = tags
+        self.score = tag_score(tags) if score is None and tags else score
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.workers = max(1, workers)
+
+        # Canonical urls of the pages queued or visited, and the cache keys of the pages visited.
+        error_rate = crawler.config['crawl_seen_error']
+        self.seen = BloomFilter(crawler.config['crawl_seen_capacity'], error_rate) if error_rate else ExactSet()
+        self.seen_path = crawler.config['data_root'] + f'/databases/crawl-{self.crawl_id}.seen'
+        self.visited = set()
+        self.counts = collections.Counter()
+        self.seconds = 0.0
+        self.running_since = None
+
+        # The (url, state) of the urls taken off the frontier or visited since the last checkpoint.
+        self.reached = []
+        self.checkpoint_every = crawler.config['crawl_checkpoint_every']
+        self.checkpoint_overhead = crawler.config['crawl_checkpoint_overhead']
+        self.checkpointed = 0
+        self.checkpoint_seconds = 0.0
+
+        for url in start:
+            self.push(url, 0)
+
+    def push(self, url, depth, score=0.0):
+        """ Queues a page unless it has been queued before. Returns whether it was queued. """
+        if not self.seen.add(canonical_url(url)):
+            return False
+
+        self.frontier.push(url, depth, score)
+        return True
+
+    def finished(self):
+        """ Whether the crawl has no pages left to visit. """
+        return not self.frontier
+
+    def forget(self):
+        """ Deletes the seen urls filter of a finished crawl, its checkpoint is all that is kept of it. """
+        if os.path.exists(self.seen_path):
+            os.remove(self.seen_path)
+
+    def __budget(self, in_flight=0):
+        return self.max_pages is None or self.counts['pages'] + in_flight < self.max_pages
+
+    def __iter__(self):
+        self.running_since = time.perf_counter()
+        in_flight = {}
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='crawl')
+        try:
+            while self.__budget():
+                while self.frontier and len(in_flight) < self.workers and self.__budget(len(in_flight)):
+                    entry = self.frontier.pop()
+                    _, url, depth, _ = entry
+
+                    page = self.crawler.cacher.get_or_none(url) if self.crawler.cacher is not None else None
+                    if page is None:
+                        in_flight[executor.submit(self.crawler.fetch_extract, url)] = entry
+                        continue
+
+                    self.reached.append((canonical_url(url), 'done'))
+                    self.counts['cached'] += 1
+                    if page['url'] not in self.visited:
+                        self.visit(page, depth)
+                        if self.checkpoint_due():
+                            self.checkpoint(in_flight.values())
+                        yield depth, page
+                    else:
+                        self.counts['duplicates'] += 1
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _, url, depth, _ = in_flight.pop(future)
+                    self.reached.append((canonical_url(url), 'done'))
+                    page = self.__fetched(url, future)
+                    if page is not None:
+                        self.visit(page, depth)
+                        if self.checkpoint_due():
+                            self.checkpoint(in_flight.values())
+                        yield depth, page
+        finally:
+            # When the caller stops early, the pages in flight go back to the frontier. Those
+            # which were fetched already are cached, so they are not fetched again.
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True)
+            for future, entry in in_flight.items():
+                if future.cancelled() or self.__fetched(entry[1], future) is not None:
+                    self.frontier.requeue(entry)
+
+            self.seconds = self.elapsed()
+            self.running_since = None
+            self.checkpoint()
+            if self.finished():
+                self.forget()
+
+    def __fetched(self, url, future):
+        try:
+            wiki, html = future.result()
+        except (ValueError, AttributeError) as e:
+            logger.debug(f"Failed to crawl {url}.", exc_info=e)
+            self.counts['failed'] += 1
+            return None
+
+        self.counts['fetched'] += 1
+        self.crawler.cache(wiki, html)
+
+        # A redirect is cached under the url of the page it led to, which may have been visited already.
+        if wiki['url'] in self.visited:
+            self.counts['duplicates'] += 1
+            return None
+
+        return wiki
+
+    def visit(self, page, depth):
+        """ Marks a page visited and queues its links. """
+        self.visited.add(page['url'])
+        self.reached.append((page['url'], 'visited'))
+        self.counts['pages'] += 1
+
+        if self.max_depth is None or depth < self.max_depth:
+            links = {}
+            for text, url in self.links(page):
+                links.setdefault(canonical_url(url), (text, url))
+
+            for key in self.seen.add_many(links):
+                text, url = links[key]
+                self.frontier.push(url, depth + 1, self.score(text, url) if self.score is not None else 0.0)
+
+    def links(self, page):
+        """ Yields the (text, url) of the paragraph and see also links of a page, see LinkFilter. """
+        for links in list(page.get('paragraph_links') or []) + [page.get('see_also') or {}]:
+            yield from self.crawler.links.filter(links).items()
+
+    def elapsed(self):
+        """ The seconds spent crawling, including the current run. """
+        if self.running_since is None:
+            return self.seconds
+
+        return self.seconds + time.perf_counter() - self.running_since
+
+    def params(self):
+        """ The arguments of the crawl, which WikiCrawler.resume makes it again with. """
+        return {'start': self.start, 'strategy': self.strategy, 'max_depth': self.max_depth,
+                'max_pages': self.max_pages, 'workers': self.workers, 'tags': self.tags,
+                'custom_score': self.score is not None and not self.tags}
+
+    def frontier_state(self, popped=()):
+        """ The state of the frontier to checkpoint, popped are entries being fetched, see Frontier.state. """
+        return self.frontier.state(popped)
+
+    def checkpoint_due(self):
+        """ Whether checkpoint_every pages were visited since the last checkpoint, unless checkpoints
+        took more than checkpoint_overhead of the crawl's time so far.
+        """
+        if self.checkpoint_every is None or self.counts['pages'] - self.checkpointed < self.checkpoint_every:
+            return False
+
+        return self.checkpoint_overhead is None or self.checkpoint_seconds <= self.checkpoint_overhead * self.elapsed()
+
+    def checkpoint(self, popped=()):
+        """
+        Stores the params, frontier, urls reached and counts of the crawl, and commits the pages
+        cached since the last checkpoint with them in one transaction, see PageCacher.store_crawl.
+
+        The visited urls are written as they are reached, so a checkpoint writes the frontier and
+        the urls reached since the last one. It does nothing without a cacher.
+
+        Args:
+            popped (list): Frontier entries being fetched, which are checkpointed as still queued.
+        """
+        cacher = self.crawler.cacher
+        if cacher is None:
+            return
+
+        start = time.perf_counter()
+        self.counts['checkpoints'] += 1
+        saved = self.counts['seen']
+        self.counts['seen'] = len(self.seen)
+        cacher.store_crawl(self.crawl_id, {'params': self.params(), 'counts': dict(self.counts),
+                                           'frontier': self.frontier_state(popped), 'seconds': self.elapsed()},
+                           self.reached)
+        self.reached = []
+        # Saved after the commit, so a filter is never ahead of the checkpoint, see restore.
+        if isinstance(self.seen, BloomFilter) and len(self.seen) != saved:
+            self.seen.save(self.seen_path)
+        self.checkpointed = self.counts['pages']
+        self.checkpoint_seconds += time.perf_counter() - start
+
+    def restore(self, checkpoint):
+        """ Restores the frontier, the visited pages and the counts of the crawl from a checkpoint, see WikiCrawler.resume. """
+        self.start = checkpoint['params']['start']
+        self.counts = collections.Counter(checkpoint['counts'])
+        self.seconds = checkpoint['seconds']
+        self.checkpointed = self.counts['pages']
+
+        for url, state in checkpoint['urls']:
+            if state == 'visited':
+                self.visited.add(url)
+
+        self.restore_frontier(checkpoint['frontier'])
+
+        # The filter of the checkpoint is used as is, one which is missing or from an earlier checkpoint is rebuilt.
+        if isinstance(self.seen, BloomFilter) and os.path.exists(self.seen_path):
+            seen = BloomFilter.load(self.seen_path)
+            if len(seen) == self.counts['seen']:
+                self.seen = seen
+                return
+
+        self.seen.update(canonical_url(url) for url, _ in checkpoint['urls'])
+        self.seen.update(self.queued())
+
+    def restore_frontier(self, state):
+        self.frontier.restore(state)
+
+    def queued(self):
+        """ Yields the canonical urls of the pages in the frontier. """
+        for _, url, _, _ in self.frontier.heap:
+            yield canonical_url(url)
+
+    def stats(self):
+        """ Returns the pages visited, fetched and read from the cache, the failures, the pages left
+        in the frontier, the seconds spent crawling and the pages visited per second, and the
+        checkpoints with the seconds spent on them.
+        """
+        stats = {key: self.counts[key] for key in ('pages', 'fetched', 'cached', 'failed', 'duplicates')}
+        stats['frontier'] = len(self.frontier)
+        stats['seconds'] = self.seconds
+        stats['pages_per_second'] = stats['pages'] / self.seconds if self.seconds else 0.0
+        stats['checkpoints'] = self.counts['checkpoints']
+        stats['checkpoint_seconds'] = self.checkpoint_seconds
+        stats['seen'] = len(self.seen)
+
+        return stats
+
+
+def _crawl_worker(config, path, lease, lifo, results, stop, name):
+    """ Claims pages from the frontier, fetches and extracts them and sends them to the crawl, the work of a MultiCrawl process. """
+    grabber = WikiGrabber(config)
+    frontier = SqliteFrontier(path, lease=lease, lifo=lifo)
+    try:
+        while not stop.is_set():
+            claimed = frontier.claim(name)
+            if not claimed:
+                stop.wait(0.05)
+                continue
+
+            for url, depth in claimed:
+                try:
+                    wiki, html = grabber.fetch_extract(url)
+                except (ValueError, AttributeError) as e:
+                    logger.debug(f"{name} failed to crawl {url}.", exc_info=e)
+                    results.put((name, url, depth, None, None, None))
+                    continue
+
+                results.put((name, url, depth, wiki, html, grabber.redirects.pop(url, None)))
+    finally:
+        grabber.close()
+        frontier.close()
+
+
+class MultiCrawl(Crawl):
+    """ MultiCrawl is a Crawl whose pages are fetched by worker processes sharing a SqliteFrontier.
+
+    Each worker process has its own WikiGrabber, with its own connections and rate limiter.
+    Workers claim urls from the frontier with a lease, fetch and extract them, and send the
+    pages back. The process iterating over the crawl is the only writer to the page cache:
+    it caches the pages, queues their links in the frontier and yields them. Pages which are
+    cached already are read on this side and never handed to a worker. If a worker dies, the
+    urls it had claimed are claimed by the others once their lease runs out.
+
+    Workers fetch ahead of the caller, so when max_pages is reached a few more pages may
+    have been fetched. They are cached, and visited first if the crawl is iterated over again.
+
+    Each crawl has its own frontier file, which is kept so the crawl can be resumed until it
+    finishes with nothing left to visit, see forget. Urls are marked done in it as pages arrive,
+    ahead of the checkpoint committing them, so on resuming those whose page did not make it
+    into the cache are queued again, see restore.
+
+    Usage:
+        crawl = crawler.traverse(url, processes=4, max_pages=1000)
+        for depth, page in crawl:
+            ...
+    """
+    def __init__(self, crawler, start, strategy='bfs', score=None, max_depth=2, max_pages=100, processes=2,
+                 path=None, lease=60.0, tags=None, crawl_id=None):
+        """ Initializes the MultiCrawl class.
+
+        Args:
+            crawler (WikiGrabber): The grabber used to cache pages, its config is used by the workers' grabbers.
+            start (list): The urls to start from, at depth 0.
+            strategy (str): 'bfs', 'dfs' or 'best', see Frontier.
+            score (function): score(text, url) of a link for 'best', higher is visited first, see tag_score.
+            max_depth (int): The most links away from the start to follow, None for no limit.
+            max_pages (int): The most pages to visit, None for no limit.
+            processes (int): The number of worker processes.
+            path (str): The path of the frontier's SQLite file, defaults to frontier-<crawl id>.db next to the cache.
+            lease (float): The seconds a worker may hold a url before others may claim it.
+            tags (list): Phrases to score links by when score is None, see Crawl.
+            crawl_id (str): The id of a crawl to resume, whose frontier is kept, a new crawl by default.
+        """
+        resuming = crawl_id is not None
+        crawl_id = crawl_id or new_crawl_id()
+
+        self.strategy = strategy
+        self.path = path or crawler.config['data_root'] + f'/databases/frontier-{crawl_id}.db'
+        self.lease = lease
+        self.shared = SqliteFrontier(self.path, lease=lease, lifo=strategy == 'dfs')
+        if not resuming:
+            self.shared.clear()
+
+        # Pages found in the cache, waiting to be visited.
+        self.ready = collections.deque()
+        self.worker_counts = collections.Counter()
+
+        super().__init__(crawler, [], strategy=strategy, score=score, max_depth=max_depth, max_pages=max_pages,
+                         workers=processes, tags=tags, crawl_id=crawl_id)
+        self.start = list(start)
+        self.queue([(url, 0, 0.0) for url in start])
+
+    def close(self):
+        if self.shared is not None:
+            self.shared.close()
+
+    def finished(self):
+        """ Whether the crawl has no pages left to visit, in the shared frontier or from the cache. """
+        return self.shared is None or not (self.ready or self.shared.pending())
+
+    def forget(self):
+        """ Deletes the frontier file and seen urls filter of a finished crawl, its checkpoint is all that is kept of it. """
+        if self.shared is not None:
+            self.shared.delete()
+            self.shared = None
+        super().forget()
+
+    def push(self, url, depth, score=0.0):
+        return self.queue([(url, depth, score)]) > 0
+
+    def queue(self, links):
+        """
+        Queues pages in the shared frontier, or to be read from the cache if they are cached.
+
+        Args:
+            links (list): (url, depth, score) of the pages.
+
+        Returns:
+            int: The number of pages which had not been queued before.
+        """
+        cacher = self.crawler.cacher
+        found = {}
+        for url, depth, score in links:
+            found.setdefault(canonical_url(url), (depth, score))
+
+        entries = {}
+        cached = {}
+        # Only the links not seen before are looked up in the cache and queued.
+        for url in self.seen.add_many(found):
+            depth, score = found[url]
+            key = cacher.resolve(url) if cacher is not None else None
+            if key is None:
+                entries.setdefault(url, (url, depth, priority(self.strategy, depth, score)))
+            else:
+                cached.setdefault(url, (depth, key))
+
+        queued = self.shared.push(list(entries.values()))
+        for url, (depth, key) in cached.items():
+            if self.shared.mark([(url, depth)]):
+                self.ready.append((depth, key))
+                self.reached.append((url, 'done'))
+                queued += 1
+
+        return queued
+
+    def visit(self, page, depth):
+        """ Marks a page visited and queues its links, in one transaction. """
+        self.visited.add(page['url'])
+        self.reached.append((page['url'], 'visited'))
+        self.counts['pages'] += 1
+
+        if self.max_depth is None or depth < self.max_depth:
+            self.queue([(url, depth + 1, self.score(text, url) if self.score is not None else 0.0)
+                        for text, url in self.links(page)])
+
+    def __iter__(self):
+        if self.shared is None:
+            return
+
+        self.running_since = time.perf_counter()
+        config = dict(self.crawler.config, save_media=False)
+        results = multiprocessing.Queue()
+        stop = multiprocessing.Event()
+        lifo = self.strategy == 'dfs'
+        workers = [multiprocessing.Process(target=_crawl_worker, name=f"crawl-{i}", daemon=True,
+                                           args=(config, self.path, self.lease, lifo, results, stop, f"crawl-{i}"))
+                   for i in range(self.workers)]
+        for worker in workers:
+            worker.start()
+
+        try:
+            while self.max_pages is None or self.counts['pages'] < self.max_pages:
+                if self.ready:
+                    depth, key = self.ready.popleft()
+                    page = self.__read(key)
+                    if page is not None:
+                        self.visit(page, depth)
+                        if self.checkpoint_due():
+                            self.checkpoint()
+                        yield depth, page
+                    continue
+
+                try:
+                    result = results.get(timeout=0.1)
+                except queue.Empty:
+                    if not self.shared.pending():
+                        break
+                    if not any(worker.is_alive() for worker in workers):
+                        logger.warning(f"All crawl workers died, {self.shared.pending()} pages are left.")
+                        break
+                    continue
+
+                page, depth = self.__received(*result)
+                if page is not None:
+                    self.visit(page, depth)
+                    if self.checkpoint_due():
+                        self.checkpoint()
+                    yield depth, page
+        finally:
+            stop.set()
+            # Pages fetched ahead are cached, and visited first if the crawl continues.
+            while any(worker.is_alive() for worker in workers) or not results.empty():
+                try:
+                    page, depth = self.__received(*results.get(timeout=0.1))
+                except queue.Empty:
+                    continue
+                if page is not None:
+                    self.ready.append((depth, page['url']))
+            for worker in workers:
+                worker.join()
+
+            self.seconds = self.elapsed()
+            self.running_since = None
+            self.checkpoint()
+            if self.finished():
+                self.forget()
+
+    def __read(self, key):
+        if key in self.visited:
+            self.counts['duplicates'] += 1
+            return None
+
+        self.counts['cached'] += 1
+        return self.crawler.cacher.get_or_none(key)
+
+    def __received(self, worker, url, depth, wiki, html, page_url):
+        """ Caches a page sent by a worker and marks it done. Returns it and its depth, or None if it failed. """
+        self.reached.append((url, 'done'))
+        if wiki is None:
+            self.shared.done(url, failed=True)
+            self.counts['failed'] += 1
+            self.worker_counts[worker, 'failed'] += 1
+            return None, depth
+
+        self.counts['fetched'] += 1
+        self.worker_counts[worker, 'fetched'] += 1
+        self.crawler.redirected(url, page_url)
+        self.crawler.cache(wiki, html)
+        self.shared.done(url)
+
+        if wiki['url'] in self.visited:
+            self.counts['duplicates'] += 1
+            return None, depth
+
+        return wiki, depth
+
+    def params(self):
+        return dict(super().params(), processes=self.workers, path=self.path, lease=self.lease)
+
+    def frontier_state(self, popped=()):
+        """ The pages waiting to be visited from the cache, the rest of the frontier is the shared one. """
+        return {'ready': list(self.ready)}
+
+    def restore_frontier(self, state):
+        self.ready.extend((depth, key) for depth, key in state['ready'])
+
+    def queued(self):
+        """ Yields every url of the shared frontier, which holds the urls queued and the urls done alike. """
+        yield from self.shared.urls()
+
+    def restore(self, checkpoint):
+        """ Restores the crawl from a checkpoint, and the shared frontier to match it.
+
+        Urls leased by the workers of the interrupted crawl are queued again. Urls marked done in
+        the shared frontier after the checkpoint are visited from the cache if their page was
+        committed, otherwise they are queued again.
+        """
+        super().restore(checkpoint)
+        self.shared.release()
+
+        done = {url for url, state in checkpoint['urls'] if state == 'done'}
+        requeue = []
+        for url, depth in self.shared.finished():
+            if url in done:
+                continue
+
+            key = self.crawler.cacher.resolve(url)
+            if key is None:
+                requeue.append(url)
+            else:
+                self.ready.append((depth, key))
+                self.reached.append((url, 'done'))
+
+        self.shared.requeue(requeue)
+
+    def stats(self):
+        """ Returns the stats of a Crawl, with the pages left in the shared frontier and the pages fetched by each worker. """
+        stats = super().stats()
+        stats['frontier'] = self.shared.pending() if self.shared is not None else 0
+        stats['workers'] = {}
+        for (worker, key), count in sorted(self.worker_counts.items()):
+            stats['workers'].setdefault(worker, {})[key] = count
+
+        return stats
 
 
 class WikiCrawler(WikiSeeker):
-    def traverse(self, start_page, tags):
-        """ Traverses the wiki depth-first from a given page using raw href/links."""
-        path = []
-        
-        # href traversal
+    def __init__(self, config, cacher=None):
+        super().__init__(config, cacher=cacher)
+
+        self.crawl_workers = config['crawl_workers']
+        self.crawl_lease = config['crawl_lease']
+
+    def traverse(self, start_page, tags=None, strategy=None, score=None, max_depth=2, max_pages=100, workers=None,
+                 processes=0):
+        """
+        Traverses the wiki from a given page using its paragraph and see also links, see Crawl.
+
+        Args:
+            start_page (str): The url to start from, or a list of them.
+            tags (list): Phrases to steer the crawl towards, e.g. the collocations of a page. Links are
+                         scored by their overlap with them, see tag_score, and the crawl is best-first.
+            strategy (str): 'bfs', 'dfs' or 'best'. Defaults to 'best' with tags, otherwise 'bfs'.
+            score (function): score(text, url) of a link for 'best', overrides tags.
+            max_depth (int): The most links away from the start to follow, None for no limit.
+            max_pages (int): The most pages to visit, None for no limit.
+            workers (int): The number of pages fetched concurrently, defaults to config['crawl_workers'].
+            processes (int): Fetch on this many worker processes instead of threads, see MultiCrawl.
+
+        Returns:
+            Crawl: Iterating over it runs the crawl, yielding (depth, page) as pages are visited.
+        """
+        if isinstance(start_page, str):
+            start_page = [start_page]
+        if strategy is None:
+            strategy = 'best' if score is not None or tags else 'bfs'
+
+        if processes:
+            return MultiCrawl(self, start_page, strategy=strategy, score=score, max_depth=max_depth,
+                              max_pages=max_pages, processes=processes, lease=self.crawl_lease, tags=tags)
+
+        return Crawl(self, start_page, strategy=strategy, score=score, max_depth=max_depth, max_pages=max_pages,
+                     workers=workers or self.crawl_workers, tags=tags)
+
+    def resume(self, crawl_id, workers=None, processes=None):
+        """
+        Resumes a crawl from its last checkpoint, see Crawl.checkpoint.
+
+        Args:
+            crawl_id (str): The id of the crawl, see crawls.
+            workers (int): The number of pages fetched concurrently, defaults to the crawl's.
+            processes (int): The number of worker processes of a MultiCrawl, defaults to the crawl's.
+
+        Returns:
+            Crawl: Iterating over it continues the crawl where it stopped, None if there is no such crawl.
+        """
+        checkpoint = self.cacher.load_crawl(crawl_id) if self.cacher is not None else None
+        if checkpoint is None:
+            return None
+
+        params = checkpoint['params']
+        if params['custom_score']:
+            logger.warning(f"Crawl {crawl_id} scored links with a function, which is not checkpointed, "
+                           f"the links it finds from now on are not scored.")
+
+        kwargs = dict(strategy=params['strategy'], max_depth=params['max_depth'], max_pages=params['max_pages'],
+                      tags=params['tags'], crawl_id=crawl_id)
+        if 'processes' in params:
+            crawl = MultiCrawl(self, [], processes=processes or params['processes'], path=params['path'],
+                               lease=params['lease'], **kwargs)
+        else:
+            crawl = Crawl(self, [], workers=workers or params['workers'], **kwargs)
+
+        crawl.restore(checkpoint)
+        return crawl
+
+    def crawls(self):
+        """ Returns the id, params, counts and time of the last checkpoint of the crawls, the latest first. """
+        return self.cacher.crawls() if self.cacher is not None else []
+
+    def path(self, start, goal, bidirectional=True):
+        """
+        Finds a shortest path of links between two pages, see PathFinder.
+
+        Args:
+            start (str): The url of the page to start from.
+            goal (str): The url of the page to reach.
+            bidirectional (bool): Whether to search from both ends, or only forward from start.
+
+        Returns:
+            tuple: The urls of the pages on the path, None if none was found, and the stats of the search.
+
+        Raises:
+            ValueError: If start or goal could not be retrieved.
+        """
+        finder = PathFinder(self, max_depth=self.config['path_max_depth'], max_pages=self.config['path_max_pages'],
+                            backlinks=self.config['path_backlinks'], workers=self.crawl_workers)
+
+        return finder.find(start, goal, bidirectional=bidirectional), finder.stats()
 
 
 if __name__ == '__main__':
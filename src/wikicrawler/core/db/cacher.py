@@ -1,7 +1,21 @@
 import os
+import logging
+import time
 
-from .database import DBMan, DBPageEntry, Column, Text, JSON, Base
-from sqlalchemy.exc import NoResultFound
+from .database import DBMan, DBPageEntry, Column, Text, JSON, Integer, LargeBinary, Float, Base
+from .graph import LinkGraph, page_links
+from ..parse.urls import canonical_url
+from ..utils.compression import CODECS, preferred_codec
+from sqlalchemy import bindparam, literal, select, union_all
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.sql.expression import func
+
+
+logger = logging.getLogger(__name__)
+
+
+# The most urls looked up in one statement by get_many, which binds each of them twice.
+LOOKUP_BATCH = 400
 
 
 class PageCacher:
@@ -15,6 +29,14 @@ class PageCacher:
         self.config = config
         self.manager = None
         self.hooks = []
+        # Pages served from the cache under another form of their url, see resolve.
+        self.alias_hits = 0
+        # The graph of the links between cached pages, see WikiCacher.
+        self.graph = None
+        # The columns of a page and the statements looking pages up by them, see get_or_none.
+        self.__columns = None
+        self.__lookup = None
+        self.__lookup_many = None
 
         self.db_path = config['data_root'] + f"/databases/{config['db_file']}"
 
@@ -35,23 +57,421 @@ class PageCacher:
             hook()
 
     def __contains__(self, url):
-        try:
-            self.manager.session.query(self.manager.Node).filter(self.manager.Node.url == url).one()
-            return True
-        except NoResultFound:
-            return False
+        return self.resolve(url) is not None
 
     def get(self, key):
-        return self.manager.session.query(self.manager.Node).filter(self.manager.Node.url == key).one()
+        url = self.resolve(key)
+        if url is not None and url != key:
+            self.alias_hits += 1
+
+        return self.manager.session.query(self.manager.Node).filter(self.manager.Node.url == (url or key)).one()
+
+    def get_or_none(self, url):
+        """
+        Returns the dictionary of the page cached under any form of url, see resolve.
+
+        Unlike get followed by model_to_dict, the page is found in a single query, by its url, the
+        alias of its canonical form or its canonical form, in that order like resolve, and its row
+        is made into a dictionary by the page's columns without going through an ORM object.
+
+        Args:
+            url (str): A url of the page.
+
+        Returns:
+            dict: The page, or None if it is not cached.
+        """
+        if self.manager is None:
+            return None
+
+        self.__statements()
+        row = self.manager.session.execute(self.__lookup, {'url': url, 'canonical': canonical_url(url)}).first()
+        if row is None:
+            return None
+
+        page = dict(zip(self.__columns, row[1:]))
+        if page['url'] != url:
+            self.alias_hits += 1
+
+        return page
+
+    def get_many(self, urls):
+        """
+        Returns the dictionaries of the cached pages among urls, see get_or_none, in one query per LOOKUP_BATCH urls.
+
+        Args:
+            urls (list): Urls of the pages, in any form.
+
+        Returns:
+            dict: The pages by the url they were asked for, urls which are not cached are left out.
+        """
+        if self.manager is None or not urls:
+            return {}
+
+        self.__statements()
+        canonicals = {url: canonical_url(url) for url in urls}
+        keys = list(set(canonicals) | set(canonicals.values()))
+
+        # The rows found by url and by alias, by the key they were found under.
+        direct = {}
+        aliased = {}
+        for i in range(0, len(keys), LOOKUP_BATCH):
+            for row in self.manager.session.execute(self.__lookup_many, {'keys': keys[i:i + LOOKUP_BATCH]}):
+                (aliased if row[0] else direct)[row[1]] = row[2:]
+
+        pages = {}
+        for url, canonical in canonicals.items():
+            row = direct.get(url) or aliased.get(canonical) or direct.get(canonical)
+            if row is not None:
+                pages[url] = dict(zip(self.__columns, row))
+                if pages[url]['url'] != url:
+                    self.alias_hits += 1
+
+        return pages
+
+    def __statements(self):
+        # Compound selects do not autoflush like queries, pages cached since the last flush are flushed first.
+        self.manager.session.flush()
+        if self.__lookup is not None:
+            return
+
+        node = self.manager.Node
+        self.__columns = [attribute.key for attribute in class_mapper(node).column_attrs]
+        columns = [getattr(node, key) for key in self.__columns]
+
+        url, canonical, keys = bindparam('url'), bindparam('canonical'), bindparam('keys', expanding=True)
+        self.__lookup = union_all(
+            select(literal(0).label('rank'), *columns).where(node.url == url),
+            select(literal(1).label('rank'), *columns).join(DBUrlAlias, DBUrlAlias.url == node.url)
+                                                    .where(DBUrlAlias.alias == canonical),
+            select(literal(2).label('rank'), *columns).where(node.url == canonical),
+        ).order_by('rank').limit(1)
+
+        self.__lookup_many = union_all(
+            select(literal(0).label('rank'), node.url.label('key'), *columns).where(node.url.in_(keys)),
+            select(literal(1).label('rank'), DBUrlAlias.alias.label('key'), *columns)
+                .join(DBUrlAlias, DBUrlAlias.url == node.url).where(DBUrlAlias.alias.in_(keys)),
+        )
+
+    def __cached(self, url):
+        return self.manager.session.query(self.manager.Node.url).filter(self.manager.Node.url == url).first() is not None
+
+    def resolve(self, url):
+        """
+        Finds the url a page is cached under from any form of its url.
+
+        Redirects, mobile hosts, fragments and differently escaped titles all lead to the
+        same page. The canonical form of url, see canonical_url, is looked up in the alias
+        index, which maps every form seen so far to the url the page was cached under.
+
+        Args:
+            url (str): A url of the page.
+
+        Returns:
+            str: The url the page is cached under, or None if it is not cached.
+        """
+        if self.manager is None:
+            return None
+
+        if self.__cached(url):
+            return url
+
+        canonical = canonical_url(url)
+        alias = self.manager.session.get(DBUrlAlias, canonical)
+        key = canonical if alias is None else alias.url
+        if key != url and self.__cached(key):
+            return key
+
+        return None
+
+    def alias(self, url, key):
+        """ Records that url, e.g. a redirect or the url a redirect led to, is another form of the page cached under key. """
+        if self.manager is None:
+            return
+
+        canonical = canonical_url(url)
+        if canonical != key:
+            self.manager.session.merge(DBUrlAlias(alias=canonical, url=key))
+
+    def alias_many(self, aliases):
+        """ Records several aliases in one statement, see alias.
 
+        Args:
+            aliases (dict): The url the page is cached under, by the other form of its url.
+        """
+        if self.manager is None:
+            return
+
+        rows = {}
+        for url, key in aliases.items():
+            canonical = canonical_url(url)
+            if canonical != key:
+                rows[canonical] = key
+
+        if rows:
+            self.manager.session.execute(DBUrlAlias.__table__.insert().prefix_with('OR REPLACE'),
+                                         [{'alias': alias, 'url': key} for alias, key in rows.items()])
+
+    def alias_stats(self):
+        """ Returns the number of aliases and how many pages were served from the cache through one. """
+        if self.manager is None:
+            return {'aliases': 0, 'hits': self.alias_hits}
+
+        return {'aliases': self.manager.session.query(func.count(DBUrlAlias.alias)).scalar(),
+                'hits': self.alias_hits}
 
     def cache(self, page): 
         if self.manager is not None: 
             self.manager.session.merge(self.manager.Node(**page))
+            self.alias(page['url'], page['url'])
+
+    def cache_many(self, pages):
+        """ Caches several pages in one statement, replacing the pages already cached under their urls. """
+        if self.manager is not None and pages:
+            self.manager.session.execute(self.manager.Node.__table__.insert().prefix_with('OR REPLACE'), pages)
+            self.alias_many({page['url']: page['url'] for page in pages})
+
+    def commit(self):
+        """ Commits everything cached so far, rather than only when the cacher is closed. """
+        if self.manager is not None:
+            self.manager.session.commit()
 
     def register_hook(self, hook):
         self.hooks.append(hook)
 
+    def store_raw(self, url, html):
+        """ Stores the compressed raw html of a page so it can be re-extracted offline.
+
+        Args:
+            url (str): The url the page is cached under.
+            html (str): The decoded html of the page.
+        """
+        if self.manager is None:
+            return
+
+        data = html.encode('utf-8')
+        codec = preferred_codec()
+        self.manager.session.merge(DBRawPage(url=url, codec=codec.name, size=len(data), html=codec.compress(data)))
+
+    def get_raw(self, url):
+        """ Returns the raw html stored for a url, or None if there is none. """
+        if self.manager is None:
+            return None
+
+        entry = self.manager.session.get(DBRawPage, url)
+        if entry is None:
+            return None
+
+        try:
+            codec = CODECS[entry.codec]
+        except KeyError:
+            logger.debug(f"Raw html of {url} was stored with {entry.codec}, which is not available.")
+            return None
+
+        return codec.decompress(entry.html).decode('utf-8')
+
+    def raw_urls(self):
+        """ Returns the urls of all pages with stored raw html. """
+        if self.manager is None:
+            return []
+
+        return [url for url, in self.manager.session.query(DBRawPage.url)]
+
+    def raw_stats(self):
+        """ Returns the number of stored raw pages, their html size and their size on disk. """
+        if self.manager is None:
+            return {'pages': 0, 'html_bytes': 0, 'stored_bytes': 0, 'disk_savings': 0.0}
+
+        pages, size, stored = self.manager.session.query(func.count(DBRawPage.url),
+                                                         func.coalesce(func.sum(DBRawPage.size), 0),
+                                                         func.coalesce(func.sum(func.length(DBRawPage.html)), 0)).one()
+
+        return {'pages': pages,
+                'html_bytes': size,
+                'stored_bytes': stored,
+                'disk_savings': 1 - stored / size if size else 0.0}
+
+    def latex_memo(self):
+        """ Returns the persisted latex conversions by content hash, see LatexConverter. """
+        if self.manager is None:
+            return {}
+
+        return {key: text for key, text in self.manager.session.query(DBLatexMemo.key, DBLatexMemo.text)}
+
+    def store_latex(self, entries):
+        """ Persists latex conversions by content hash.
+
+        Args:
+            entries (dict): The converted text of paragraphs by latex_key.
+        """
+        if self.manager is None:
+            return
+
+        for key, text in entries.items():
+            self.manager.session.merge(DBLatexMemo(key=key, text=text))
+
+    def media_enqueue(self, downloads):
+        """ Persists queued media downloads, see MediaDownloader.
+
+        Args:
+            downloads (list): (url, path) tuples.
+        """
+        if self.manager is None:
+            return
+
+        for url, path in downloads:
+            self.manager.session.merge(DBMediaDownload(url=url, path=path, status='pending', attempts=0))
+
+    def media_update(self, url, status, attempts, size=None, error=None):
+        """ Persists the state of a media download. """
+        if self.manager is None:
+            return
+
+        self.manager.session.merge(DBMediaDownload(url=url, status=status, attempts=attempts, size=size, error=error))
+
+    def media_pending(self):
+        """ Returns the (url, path, attempts) of the media downloads which have not finished. """
+        if self.manager is None:
+            return []
+
+        return [tuple(row) for row in self.manager.session.query(DBMediaDownload.url, DBMediaDownload.path,
+                                                                 DBMediaDownload.attempts)
+                                                          .filter(DBMediaDownload.status == 'pending')]
+
+    def media_infos(self):
+        """ Returns the resolved media infos by file title, None for titles which do not exist. """
+        if self.manager is None:
+            return {}
+
+        return {info.title: None if info.url is None else {'url': info.url, 'sha1': info.sha1, 'size': info.size}
+                for info in self.manager.session.query(DBMediaInfo)}
+
+    def store_media_infos(self, infos):
+        """ Persists resolved media infos, see MediaResolver.
+
+        Args:
+            infos (dict): {'url', 'sha1', 'size'} by file title, None for titles which do not exist.
+        """
+        if self.manager is None:
+            return
+
+        for title, info in infos.items():
+            info = info or {}
+            self.manager.session.merge(DBMediaInfo(title=title, url=info.get('url'), sha1=info.get('sha1'),
+                                                   size=info.get('size')))
+
+    def media_store_index(self):
+        """ Returns the media store's title to digest index and its blobs' (size, last used) by digest. """
+        if self.manager is None:
+            return {}, {}
+
+        session = self.manager.session
+        titles = {title: digest for title, digest in session.query(DBMediaTitle.title, DBMediaTitle.digest)}
+        blobs = {digest: (size, last_used)
+                 for digest, size, last_used in session.query(DBMediaBlob.digest, DBMediaBlob.size,
+                                                              DBMediaBlob.last_used)}
+
+        return titles, blobs
+
+    def media_store_update(self, titles, blobs):
+        """ Persists changes to the media store's index, see MediaStore.
+
+        Args:
+            titles (dict): Digests by title, None for titles which were dropped.
+            blobs (dict): (size, last used) by digest, None for blobs which were evicted.
+        """
+        if self.manager is None:
+            return
+
+        session = self.manager.session
+        for digest, blob in blobs.items():
+            if blob is None:
+                session.query(DBMediaBlob).filter(DBMediaBlob.digest == digest).delete()
+            else:
+                session.merge(DBMediaBlob(digest=digest, size=blob[0], last_used=blob[1]))
+
+        for title, digest in titles.items():
+            if digest is None:
+                session.query(DBMediaTitle).filter(DBMediaTitle.title == title).delete()
+            else:
+                session.merge(DBMediaTitle(title=title, digest=digest))
+
+    def search_results(self, phrase):
+        """ Returns the cached results of a normalized search phrase, or None, see store_search_results. """
+        if self.manager is None:
+            return None
+
+        entry = self.manager.session.get(DBSearchResult, phrase)
+        if entry is None:
+            return None
+
+        return {'kind': entry.kind, 'url': entry.url, 'search_links': entry.search_links,
+                'disambiguation_links': entry.disambiguation_links, 'created': entry.created}
+
+    def store_search_results(self, phrase, url, search_links=None, disambiguation_links=None):
+        """ Caches the results of a search, see WikiSeeker.search.
+
+        Args:
+            phrase (str): The normalized search phrase.
+            url (str): The url the search led to.
+            search_links (list): The result hrefs if it led to the search page, otherwise None.
+            disambiguation_links (list): The result hrefs if it led to a disambiguation page, otherwise None.
+        """
+        if self.manager is None:
+            return
+
+        if disambiguation_links is not None:
+            kind = 'disambiguation'
+        elif search_links is not None:
+            kind = 'search'
+        else:
+            kind = 'page'
+
+        self.manager.session.merge(DBSearchResult(phrase=phrase, kind=kind, url=url, search_links=search_links,
+                                                  disambiguation_links=disambiguation_links, created=time.time()))
+
+    def store_crawl(self, crawl_id, checkpoint, urls):
+        """ Checkpoints a crawl and commits it, together with the pages cached since the last checkpoint,
+        through commit, so a WikiCacher's link graph is written with them.
+
+        Args:
+            crawl_id (str): The id of the crawl.
+            checkpoint (dict): The params, counts, frontier and seconds of the crawl, see Crawl.checkpoint.
+            urls (list): (url, state) of the urls reached since the last checkpoint, the canonical urls
+                         taken off the frontier are 'done' and the keys of the pages visited 'visited'.
+        """
+        if self.manager is None:
+            return
+
+        session = self.manager.session
+        session.merge(DBCrawl(crawl_id=crawl_id, updated=time.time(), **checkpoint))
+        if urls:
+            session.execute(DBCrawlUrl.__table__.insert().prefix_with('OR IGNORE'),
+                            [{'crawl_id': crawl_id, 'url': url, 'state': state} for url, state in urls])
+        self.commit()
+
+    def load_crawl(self, crawl_id):
+        """ Returns the last checkpoint of a crawl with the state of the urls it reached, or None, see store_crawl. """
+        if self.manager is None:
+            return None
+
+        session = self.manager.session
+        entry = session.get(DBCrawl, crawl_id)
+        if entry is None:
+            return None
+
+        urls = [tuple(row) for row in session.query(DBCrawlUrl.url, DBCrawlUrl.state)
+                                             .filter(DBCrawlUrl.crawl_id == crawl_id)]
+        return {'crawl_id': entry.crawl_id, 'params': entry.params, 'counts': entry.counts,
+                'frontier': entry.frontier, 'seconds': entry.seconds, 'updated': entry.updated, 'urls': urls}
+
+    def crawls(self):
+        """ Returns the id, params, counts and time of the last checkpoint of every crawl, the latest first. """
+        if self.manager is None:
+            return []
+
+        return [{'crawl_id': entry.crawl_id, 'params': entry.params, 'counts': entry.counts, 'updated': entry.updated}
+                for entry in self.manager.session.query(DBCrawl).order_by(DBCrawl.updated.desc())]
+
 
 class DBWikiPageEntry(DBPageEntry, Base):
     """ This class is a database entry for a wikipeida page. It is used by the WikiCacher to store pages in it's specialized database.
@@ -65,9 +485,169 @@ class DBWikiPageEntry(DBPageEntry, Base):
     media = Column(JSON, nullable=True)
 
 
+class DBRawPage(Base):
+    """ This class is a database entry for the compressed raw html of a page.
+    """
+    __tablename__ = 'raw_pages'
+    url = Column(Text, nullable=False, primary_key=True)
+    codec = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    html = Column(LargeBinary, nullable=False)
+
+
+class DBLatexMemo(Base):
+    """ This class is a database entry for the latex conversion of a paragraph, keyed by its content hash.
+    """
+    __tablename__ = 'latex_memo'
+    key = Column(Text, nullable=False, primary_key=True)
+    text = Column(Text, nullable=False)
+
+
+class DBMediaDownload(Base):
+    """ This class is a database entry for a queued, finished or failed media download.
+    """
+    __tablename__ = 'media_downloads'
+    url = Column(Text, nullable=False, primary_key=True)
+    path = Column(Text, nullable=False)
+    status = Column(Text, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+
+
+class DBMediaInfo(Base):
+    """ This class is a database entry for the resolved download url of a file title, url is None if it does not exist.
+    """
+    __tablename__ = 'media_infos'
+    title = Column(Text, nullable=False, primary_key=True)
+    url = Column(Text, nullable=True)
+    sha1 = Column(Text, nullable=True)
+    size = Column(Integer, nullable=True)
+
+
+class DBMediaTitle(Base):
+    """ This class is a database entry mapping a media title to the digest of its blob in the media store.
+    """
+    __tablename__ = 'media_titles'
+    title = Column(Text, nullable=False, primary_key=True)
+    digest = Column(Text, nullable=False)
+
+
+class DBMediaBlob(Base):
+    """ This class is a database entry for a blob in the media store.
+    """
+    __tablename__ = 'media_blobs'
+    digest = Column(Text, nullable=False, primary_key=True)
+    size = Column(Integer, nullable=False)
+    last_used = Column(Float, nullable=False)
+
+
+class DBUrlAlias(Base):
+    """ This class is a database entry for the canonical form of a url which leads to a cached page, see PageCacher.resolve.
+    """
+    __tablename__ = 'url_aliases'
+    alias = Column(Text, nullable=False, primary_key=True)
+    url = Column(Text, nullable=False)
+
+
+class DBSearchResult(Base):
+    """ This class is a database entry for the results of a search phrase, kind is page, search or disambiguation.
+    """
+    __tablename__ = 'search_results'
+    phrase = Column(Text, nullable=False, primary_key=True)
+    kind = Column(Text, nullable=False)
+    url = Column(Text, nullable=False)
+    search_links = Column(JSON, nullable=True)
+    disambiguation_links = Column(JSON, nullable=True)
+    created = Column(Float, nullable=False)
+
+
+class DBCrawl(Base):
+    """ This class is a database entry for the last checkpoint of a crawl, see Crawl.checkpoint.
+    """
+    __tablename__ = 'crawls'
+    crawl_id = Column(Text, nullable=False, primary_key=True)
+    params = Column(JSON, nullable=False)
+    counts = Column(JSON, nullable=False)
+    frontier = Column(JSON, nullable=True)
+    seconds = Column(Float, nullable=False)
+    updated = Column(Float, nullable=False)
+
+
+class DBCrawlUrl(Base):
+    """ This class is a database entry for a url a crawl took off its frontier or visited, see PageCacher.store_crawl.
+    """
+    __tablename__ = 'crawl_urls'
+    crawl_id = Column(Text, nullable=False, primary_key=True)
+    url = Column(Text, nullable=False, primary_key=True)
+    state = Column(Text, nullable=False, primary_key=True)
+
+
 class WikiCacher(PageCacher):
     """ The WikiCacher is a specialized PageCacher that caches wikipedia pages only.
+
+    With config['link_graph'] set, it keeps the LinkGraph of the paragraph and see also links of
+    the cached pages next to the database, updated as pages and redirects are cached and written
+    when the cache commits. A cache made before the graph existed has it built on opening.
     """
     def __enter__(self):
         self.manager = DBMan(DBWikiPageEntry, self.db_path)
+
+        if self.config['link_graph']:
+            self.graph = LinkGraph(os.path.splitext(self.db_path)[0] + '.graph')
+            if not len(self.graph) and self.manager.session.query(DBWikiPageEntry.url).first() is not None:
+                logger.info("Building the link graph of the cache.")
+                self.rebuild_graph()
+
         return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        super().__exit__(exc_type, exc_val, exc_tb)
+
+        if self.graph is not None:
+            self.graph.close()
+            self.graph = None
+
+    def cache(self, page):
+        super().cache(page)
+        if self.graph is not None:
+            self.graph.add(page['url'], page_links(page), canonical=True)
+
+    def cache_many(self, pages):
+        super().cache_many(pages)
+        if self.graph is not None:
+            for page in pages:
+                self.graph.add(page['url'], page_links(page), canonical=True)
+
+    def alias(self, url, key):
+        super().alias(url, key)
+        if self.graph is not None and canonical_url(url) != key:
+            self.graph.redirect(url, key)
+
+    def alias_many(self, aliases):
+        super().alias_many(aliases)
+        if self.graph is not None:
+            for url, key in aliases.items():
+                if canonical_url(url) != key:
+                    self.graph.redirect(url, key)
+
+    def commit(self):
+        super().commit()
+        if self.graph is not None:
+            self.graph.flush()
+
+    def rebuild_graph(self):
+        """ Builds the link graph again from the cached pages and aliases, e.g. if its files were lost. """
+        if self.manager is None or self.graph is None:
+            return
+
+        self.graph.clear()
+        session = self.manager.session
+        query = session.query(DBWikiPageEntry.url, DBWikiPageEntry.paragraph_links, DBWikiPageEntry.see_also)
+        for url, paragraph_links, see_also in query.yield_per(1000):
+            self.graph.add(url, page_links({'paragraph_links': paragraph_links, 'see_also': see_also}), canonical=True)
+        for alias, url in session.query(DBUrlAlias.alias, DBUrlAlias.url).yield_per(1000):
+            self.graph.redirect(alias, url)
+
+        self.graph.compact()
+        self.graph.flush()
@@ -6,7 +6,7 @@ import sqlalchemy as sa
 from sqlalchemy import Column, Integer
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine, Text, JSON
+from sqlalchemy import create_engine, Text, JSON, LargeBinary, Float
 from sqlalchemy.sql.expression import func
 
 
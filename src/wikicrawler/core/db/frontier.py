@@ -0,0 +1,179 @@
+import logging
+import os
+import sqlite3
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteFrontier:
+    """ SqliteFrontier is a crawl frontier shared by several processes through a SQLite file.
+
+    Every url is a row, queued once and then leased, done or failed. Workers claim queued
+    urls in order of priority with a lease, so the urls of a worker which died are claimed
+    again by the others once its lease runs out. Claims happen in an immediate transaction,
+    so no url is leased to two workers at once.
+
+    It uses sqlite3 directly rather than the cache's session, since the workers' claims have
+    to be atomic across processes and the file is not part of the page cache.
+
+    Urls of the same priority and depth are claimed in the order they were queued, by rowid,
+    which counts insertions since urls are never deleted, or most recently queued first with
+    lifo set, as a 'dfs' Frontier does.
+
+    Usage:
+        frontier = SqliteFrontier(path, lease=60)
+        frontier.push([(url, 0, 0.0)])
+        for url, depth in frontier.claim('worker-0'):
+            ...
+            frontier.done(url)
+    """
+    def __init__(self, path, lease=60.0, lifo=False):
+        """ Initializes the SqliteFrontier class.
+
+        Args:
+            path (str): The path of the SQLite file, created if it does not exist.
+            lease (float): The seconds a claimed url is leased to a worker before others may claim it.
+            lifo (bool): Whether urls of the same priority are claimed most recently queued first.
+        """
+        self.path = str(path)
+        self.lease = lease
+        self.order = 'rowid DESC' if lifo else 'rowid'
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS frontier (
+                                       url TEXT PRIMARY KEY,
+                                       depth INTEGER NOT NULL,
+                                       priority REAL NOT NULL,
+                                       state TEXT NOT NULL DEFAULT 'queued',
+                                       worker TEXT,
+                                       expires REAL,
+                                       attempts INTEGER NOT NULL DEFAULT 0)""")
+        self.connection.execute('CREATE INDEX IF NOT EXISTS frontier_claim ON frontier (state, priority, depth)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def delete(self):
+        """ Closes the frontier and deletes its file, with the write-ahead log and shared memory files next to it. """
+        self.close()
+        for path in (self.path, self.path + '-wal', self.path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def clear(self):
+        self.connection.execute('DELETE FROM frontier')
+
+    def push(self, entries):
+        """
+        Queues urls which have not been queued before.
+
+        Args:
+            entries (list): (url, depth, priority) tuples, lower priorities are claimed first.
+
+        Returns:
+            int: The number of urls queued.
+        """
+        with self.__transaction():
+            before = self.connection.total_changes
+            self.connection.executemany('INSERT OR IGNORE INTO frontier (url, depth, priority) VALUES (?, ?, ?)',
+                                        entries)
+            return self.connection.total_changes - before
+
+    def claim(self, worker, n=1):
+        """
+        Leases up to n urls to a worker, queued urls and urls whose lease ran out alike.
+
+        Args:
+            worker (str): The name of the worker.
+            n (int): The most urls to claim.
+
+        Returns:
+            list: (url, depth) of the claimed urls, in order of priority.
+        """
+        now = time.time()
+        with self.__transaction():
+            rows = self.connection.execute(f"""SELECT url, depth FROM frontier
+                                               WHERE state = 'queued' OR (state = 'leased' AND expires < ?)
+                                               ORDER BY state = 'leased', priority, depth, {self.order} LIMIT ?""",
+                                           (now, n)).fetchall()
+            self.connection.executemany("""UPDATE frontier SET state = 'leased', worker = ?, expires = ?,
+                                           attempts = attempts + 1 WHERE url = ?""",
+                                        [(worker, now + self.lease, url) for url, _ in rows])
+
+        return rows
+
+    def done(self, url, failed=False):
+        """ Marks a url as done, or failed, so it is not claimed again. """
+        self.connection.execute("UPDATE frontier SET state = ?, expires = NULL WHERE url = ?",
+                                ('failed' if failed else 'done', url))
+
+    def mark(self, entries):
+        """ Records urls as done without queueing them, e.g. pages read from the cache. Returns how many were new. """
+        with self.__transaction():
+            before = self.connection.total_changes
+            self.connection.executemany("""INSERT OR IGNORE INTO frontier (url, depth, priority, state)
+                                           VALUES (?, ?, 0, 'done')""", entries)
+            return self.connection.total_changes - before
+
+    def release(self):
+        """ Queues the leased urls again, e.g. when resuming a crawl whose workers are gone. Returns how many there were. """
+        return self.connection.execute("UPDATE frontier SET state = 'queued', worker = NULL, expires = NULL "
+                                       "WHERE state = 'leased'").rowcount
+
+    def requeue(self, urls):
+        """ Queues done or failed urls again. """
+        with self.__transaction():
+            self.connection.executemany("UPDATE frontier SET state = 'queued', expires = NULL WHERE url = ?",
+                                        [(url,) for url in urls])
+
+    def urls(self):
+        """ Yields every url in the frontier, whatever its state. """
+        for url, in self.connection.execute('SELECT url FROM frontier'):
+            yield url
+
+    def finished(self):
+        """ Returns (url, depth) of the urls done or failed. """
+        return self.connection.execute("SELECT url, depth FROM frontier WHERE state IN ('done', 'failed')").fetchall()
+
+    def __contains__(self, url):
+        return self.connection.execute('SELECT 1 FROM frontier WHERE url = ?', (url,)).fetchone() is not None
+
+    def pending(self):
+        """ The number of urls queued or leased. """
+        return self.connection.execute("SELECT COUNT(*) FROM frontier WHERE state IN ('queued', 'leased')").fetchone()[0]
+
+    def counts(self):
+        """ Returns the number of urls in each state. """
+        counts = {'queued': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(self.connection.execute('SELECT state, COUNT(*) FROM frontier GROUP BY state').fetchall())
+
+        return counts
+
+    def __transaction(self):
+        return _Transaction(self.connection)
+
+
+class _Transaction:
+    """ An immediate transaction, which takes the write lock up front so concurrent claims do not deadlock. """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.connection.execute('COMMIT' if exc_type is None else 'ROLLBACK')
@@ -0,0 +1,368 @@
+import logging
+import os
+
+import numpy as np
+import scipy.sparse
+
+from ..parse.urls import canonical_url
+
+
+logger = logging.getLogger(__name__)
+
+
+EDGES = 0
+REDIRECT = 1
+
+
+class LinkGraph:
+    """ LinkGraph is the graph of the links between cached pages, with integer ids and CSR adjacency arrays.
+
+    Every page url, cached or only linked to, gets an integer id in the order it is first seen.
+    The out-links of the pages are kept in compressed sparse rows: the links of page i are
+    targets[offsets[i]:offsets[i + 1]], and the in-links likewise in in_offsets and in_sources,
+    so the graph takes 4 bytes per link and 16 per page, rather than Python objects.
+
+    Pages cached since the arrays were built are kept in a delta, their links replacing those in
+    the arrays, and appended to a log so they survive a restart. Once the delta holds a quarter
+    of the links the arrays are rebuilt with it, see compact. A redirect makes its id an alias of
+    the page it leads to, links to either are links to the page.
+
+    The graph is kept in a directory next to the cache: nodes.txt with the url of each id, one
+    per line, csr.npz with the arrays and log.bin with the changes since they were built. Nothing
+    is written until flush, which the cache calls when it commits, so the files never hold pages
+    the cache does not: arrays rebuilt in between are saved by the next flush.
+
+    Usage:
+        graph = LinkGraph(path)
+        graph.add(url, [link, ...])
+        graph.out_links(url), graph.in_links(url)
+        graph.close()
+    """
+    def __init__(self, path, compact_ratio=0.25, min_compact=100_000):
+        """ Initializes the LinkGraph class.
+
+        Args:
+            path (str): The directory of the graph, created if it does not exist.
+            compact_ratio (float): The share of links in the delta over which the arrays are rebuilt.
+            min_compact (int): The fewest links in the delta which the arrays are rebuilt for.
+        """
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.min_compact = min_compact
+
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        self.urls = []
+        self.ids = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.targets = np.zeros(0, dtype=np.int32)
+        self.in_offsets = np.zeros(1, dtype=np.int64)
+        self.in_sources = np.zeros(0, dtype=np.int32)
+
+        # The links of the pages added since the arrays were built, by page id, and their count.
+        self.delta = {}
+        self.delta_links = 0
+        # The ids of redirects to the id of the page they lead to, and the reverse.
+        self.forward = {}
+        self.aliases = {}
+        # Whether there are redirects which the arrays do not resolve yet.
+        self.redirected = False
+        # Counts the changes, so what is computed from the graph knows when it is out of date.
+        self.version = 0
+
+        # Nodes and log records not written yet, and whether the arrays were rebuilt since they were saved.
+        self.written = 0
+        self.pending = []
+        self.compacted = False
+        # The delta as (sources, targets) arrays, and the forward map as an array, built when needed.
+        self.__delta_arrays = None
+        self.__forward_array = None
+
+        self.__load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __contains__(self, url):
+        return canonical_url(url) in self.ids
+
+    def id(self, url, create=False, canonical=False):
+        """ Returns the id of a url, or None if it has none and create is not set. """
+        if not canonical:
+            url = canonical_url(url)
+        i = self.ids.get(url)
+        if i is None and create:
+            i = self.ids[url] = len(self.urls)
+            self.urls.append(url)
+
+        return i
+
+    def url(self, i):
+        return self.urls[i]
+
+    def edges(self):
+        """ The number of links, those in the delta counted once. """
+        replaced = sum(int(self.offsets[i + 1] - self.offsets[i]) for i in self.delta if i < len(self.offsets) - 1)
+        return len(self.targets) - replaced + self.delta_links
+
+    def add(self, url, links, canonical=False):
+        """
+        Sets the links of a page, replacing those it had.
+
+        Args:
+            url (str): The url of the page.
+            links (list): The urls it links to, duplicates and links to itself are dropped.
+            canonical (bool): Whether the links are canonical urls already, e.g. from page_links.
+        """
+        source = self.id(url, create=True)
+        targets = {self.id(link, create=True, canonical=canonical) for link in links}
+        targets.discard(source)
+        targets = np.fromiter(sorted(targets), dtype=np.int32, count=len(targets))
+
+        self.delta_links += len(targets) - len(self.delta.get(source, ()))
+        self.delta[source] = targets
+        self.version += 1
+        self.__delta_arrays = None
+        self.pending.append(np.concatenate([np.array([EDGES, source, len(targets)], dtype=np.int32), targets]))
+
+        if self.delta_links > max(self.min_compact, self.compact_ratio * len(self.targets)):
+            self.compact()
+
+    def redirect(self, url, page_url):
+        """ Makes url an alias of the page at page_url, e.g. a redirect to it. """
+        alias, page = self.id(url, create=True), self.id(page_url, create=True)
+        page = self.forward.get(page, page)
+        if alias == page or self.forward.get(alias) == page:
+            return
+
+        self.__redirect(alias, page)
+        self.redirected = True
+        self.version += 1
+        self.pending.append(np.array([REDIRECT, alias, 1, page], dtype=np.int32))
+
+    def __redirect(self, alias, page):
+        self.forward[alias] = page
+        self.aliases.setdefault(page, []).append(alias)
+        # Redirects to the alias now lead to the page.
+        for other in self.aliases.pop(alias, []):
+            self.forward[other] = page
+            self.aliases[page].append(other)
+        self.__forward_array = None
+
+    def resolve(self, i):
+        """ The id of the page an id leads to, itself unless it is a redirect. """
+        return self.forward.get(i, i)
+
+    def out_ids(self, i):
+        """ Returns the ids of the pages a page links to, as an array. """
+        i = self.resolve(i)
+        if i in self.delta:
+            targets = self.delta[i]
+        elif i < len(self.offsets) - 1:
+            targets = self.targets[self.offsets[i]:self.offsets[i + 1]]
+        else:
+            return np.zeros(0, dtype=np.int32)
+
+        if self.forward:
+            targets = np.unique(self.__forwarding()[targets])
+            targets = targets[targets != i]
+
+        return targets
+
+    def in_ids(self, i):
+        """ Returns the ids of the pages which link to a page or a redirect to it, as an array. """
+        i = self.resolve(i)
+        ids = np.array([i] + self.aliases.get(i, []), dtype=np.int32)
+
+        sources = [self.in_sources[self.in_offsets[j]:self.in_offsets[j + 1]] for j in ids if j < len(self.in_offsets) - 1]
+        sources = np.concatenate(sources) if sources else np.zeros(0, dtype=np.int32)
+        if self.delta:
+            # The links of the pages in the delta replace those in the arrays.
+            delta_sources, delta_targets = self.__delta()
+            sources = sources[~np.isin(sources, np.fromiter(self.delta, dtype=np.int32, count=len(self.delta)))]
+            sources = np.concatenate([sources, delta_sources[np.isin(delta_targets, ids)]])
+
+        if self.forward:
+            sources = self.__forwarding()[sources]
+
+        sources = np.unique(sources)
+        return sources[sources != i]
+
+    def out_links(self, url):
+        """ Returns the urls of the pages a page links to. """
+        i = self.id(url)
+        return [] if i is None else [self.urls[j] for j in self.out_ids(i)]
+
+    def in_links(self, url):
+        """ Returns the urls of the pages which link to a page. """
+        i = self.id(url)
+        return [] if i is None else [self.urls[j] for j in self.in_ids(i)]
+
+    def csr(self):
+        """ Returns the offsets and targets of the whole graph with redirects resolved, compacting it first if it changed. """
+        self.__compacted()
+        return self.offsets, self.targets
+
+    def in_csr(self):
+        """ Returns the in_offsets and in_sources of the whole graph, the CSR arrays of its transpose, see csr. """
+        self.__compacted()
+        return self.in_offsets, self.in_sources
+
+    def __compacted(self):
+        if self.delta or self.redirected or len(self.offsets) - 1 < len(self.urls):
+            self.compact()
+
+    def __delta(self):
+        if self.__delta_arrays is None:
+            sources = np.fromiter(self.delta, dtype=np.int32, count=len(self.delta))
+            counts = np.fromiter((len(targets) for targets in self.delta.values()), dtype=np.int64, count=len(self.delta))
+            targets = np.concatenate(list(self.delta.values())) if self.delta else np.zeros(0, dtype=np.int32)
+            self.__delta_arrays = (np.repeat(sources, counts), targets)
+
+        return self.__delta_arrays
+
+    def __forwarding(self):
+        if self.__forward_array is None or len(self.__forward_array) < len(self.urls):
+            forward = np.arange(len(self.urls), dtype=np.int32)
+            if self.forward:
+                forward[np.fromiter(self.forward.keys(), dtype=np.int32)] = np.fromiter(self.forward.values(), dtype=np.int32)
+            self.__forward_array = forward
+
+        return self.__forward_array
+
+    def compact(self):
+        """ Rebuilds the arrays with the delta and the redirects. They replace the saved ones and the log on the next flush. """
+        n = len(self.urls)
+        base = len(self.offsets) - 1
+
+        # The links in the arrays of the pages which are not in the delta, and the links of those which are.
+        counts = np.diff(self.offsets)
+        replaced = np.zeros(base, dtype=bool)
+        replaced[np.fromiter((i for i in self.delta if i < base), dtype=np.int64)] = True
+        keep = np.repeat(~replaced, counts)
+        delta_sources, delta_targets = self.__delta()
+
+        sources = np.concatenate([np.repeat(np.arange(base, dtype=np.int32), counts)[keep], delta_sources])
+        targets = self.__forwarding()[np.concatenate([self.targets[keep], delta_targets])]
+        loops = sources == targets
+        sources, targets = sources[~loops], targets[~loops]
+
+        # Sorted by source then target and without duplicates, then transposed, by counting rather than sorting.
+        matrix = scipy.sparse.csr_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(n, n))
+        matrix.sum_duplicates()
+        transpose = matrix.tocsc()
+
+        self.offsets = matrix.indptr.astype(np.int64)
+        self.targets = matrix.indices.astype(np.int32)
+        self.in_offsets = transpose.indptr.astype(np.int64)
+        self.in_sources = transpose.indices.astype(np.int32)
+
+        self.delta = {}
+        self.delta_links = 0
+        self.redirected = False
+        self.__delta_arrays = None
+        # The arrays hold the changes so far, the log only needs those made after.
+        self.pending = []
+        self.compacted = True
+
+    def flush(self):
+        """ Writes the new nodes and the changes since the last flush, or the arrays if they were rebuilt, see save. """
+        if self.written < len(self.urls):
+            with open(self.path + '/nodes.txt', 'a', encoding='utf-8') as f:
+                f.write(''.join(url + '\n' for url in self.urls[self.written:]))
+            self.written = len(self.urls)
+
+        if self.compacted:
+            self.save()
+        elif self.pending:
+            with open(self.path + '/log.bin', 'ab') as f:
+                f.write(np.concatenate(self.pending).astype('<i4').tobytes())
+        self.pending = []
+
+    def save(self):
+        """ Saves the arrays, replacing those saved at once, and restarts the log with the changes made since. """
+        forward = np.array(sorted(self.forward.items()), dtype=np.int32).reshape(-1, 2)
+        with open(self.path + '/csr.npz.tmp', 'wb') as f:
+            np.savez(f, offsets=self.offsets, targets=self.targets, in_offsets=self.in_offsets,
+                     in_sources=self.in_sources, forward=forward)
+        os.replace(self.path + '/csr.npz.tmp', self.path + '/csr.npz')
+
+        with open(self.path + '/log.bin', 'wb') as f:
+            if self.pending:
+                f.write(np.concatenate(self.pending).astype('<i4').tobytes())
+        self.compacted = False
+
+    def close(self):
+        self.flush()
+
+    def clear(self):
+        """ Empties the graph and its files. """
+        for name in ('nodes.txt', 'csr.npz', 'log.bin'):
+            if os.path.exists(self.path + '/' + name):
+                os.remove(self.path + '/' + name)
+
+        self.__init__(self.path, self.compact_ratio, self.min_compact)
+
+    def stats(self):
+        """ Returns the number of pages and links, the links in the delta and the bytes of the arrays. """
+        arrays = (self.offsets, self.targets, self.in_offsets, self.in_sources)
+        return {'nodes': len(self.urls), 'edges': self.edges(), 'delta': self.delta_links,
+                'redirects': len(self.forward), 'bytes': sum(array.nbytes for array in arrays)}
+
+    def __load(self):
+        if os.path.exists(self.path + '/nodes.txt'):
+            with open(self.path + '/nodes.txt', encoding='utf-8') as f:
+                self.urls = f.read().splitlines()
+            self.ids = {url: i for i, url in enumerate(self.urls)}
+            self.written = len(self.urls)
+
+        if os.path.exists(self.path + '/csr.npz'):
+            with np.load(self.path + '/csr.npz') as arrays:
+                self.offsets, self.targets = arrays['offsets'], arrays['targets']
+                self.in_offsets, self.in_sources = arrays['in_offsets'], arrays['in_sources']
+                for alias, page in arrays['forward']:
+                    self.__redirect(int(alias), int(page))
+
+        if os.path.exists(self.path + '/log.bin'):
+            self.__replay(np.fromfile(self.path + '/log.bin', dtype='<i4'))
+
+    def __replay(self, log):
+        position = 0
+        while position + 3 <= len(log):
+            kind, a, n = (int(x) for x in log[position:position + 3])
+            values = log[position + 3:position + 3 + n]
+            # A record cut short by a crash, or naming nodes which were not written, ends the log.
+            if len(values) < n or max(a, values.max(initial=0)) >= len(self.urls):
+                logger.warning(f"The link graph log in {self.path} ends in a partial record, ignoring it.")
+                break
+
+            if kind == EDGES:
+                self.delta_links += n - len(self.delta.get(a, ()))
+                self.delta[a] = values.astype(np.int32)
+            elif kind == REDIRECT:
+                self.__redirect(a, int(values[0]))
+                self.redirected = True
+            position += 3 + n
+
+
+def page_links(page):
+    """ The canonical urls of the wikipedia pages a page links to, in its paragraphs and see also. """
+    links = []
+    for paragraph in page.get('paragraph_links') or []:
+        links.extend(paragraph.values())
+    links.extend((page.get('see_also') or {}).values())
+
+    urls = []
+    for link in links:
+        url = canonical_url(link)
+        if url.startswith('https://') and '.wikipedia.org/wiki/' in url:
+            urls.append(url)
+
+    return urls
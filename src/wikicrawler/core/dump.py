@@ -0,0 +1,213 @@
+import bz2
+import collections
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool
+
+from .parse.latex import LatexConverter
+from .parse.stage import build_wiki
+from .parse.wikitext import extract_wikitext, title_url
+
+
+logger = logging.getLogger(__name__)
+
+
+def index_path(dump_path):
+    """ The path of a multistream dump's index, e.g. ...-multistream.xml.bz2 -> ...-multistream-index.txt.bz2. """
+    dump_path = str(dump_path)
+    if dump_path.endswith('.xml.bz2'):
+        return dump_path[:-len('.xml.bz2')] + '-index.txt.bz2'
+
+    return dump_path + '-index.txt.bz2'
+
+
+def read_streams(index):
+    """
+    Reads the bz2 streams of a multistream dump from its index.
+
+    Args:
+        index (str): The path of the index, whose lines are offset:page id:title.
+
+    Returns:
+        list: (offset, length) of each stream of pages, the length of the last one is None.
+    """
+    offsets = []
+    with bz2.open(index, 'rt', encoding='utf-8') as f:
+        for line in f:
+            offset = int(line.split(':', 1)[0])
+            if not offsets or offsets[-1] != offset:
+                offsets.append(offset)
+
+    if not offsets:
+        return []
+
+    return [(offset, end - offset) for offset, end in zip(offsets, offsets[1:])] + [(offsets[-1], None)]
+
+
+def read_pages(dump, offset, length=None):
+    """
+    Decompresses a single stream of a multistream dump.
+
+    Args:
+        dump (str): The path of the dump.
+        offset (int): The offset of the stream.
+        length (int): Its compressed length, None to read until it ends.
+
+    Yields:
+        tuple: The namespace, title, redirect target or None, and wikitext of each page in the stream.
+    """
+    decompressor = bz2.BZ2Decompressor()
+    chunks = []
+    with open(dump, 'rb') as f:
+        f.seek(offset)
+        while not decompressor.eof:
+            data = f.read(length if length is not None else 1 << 20)
+            if not data:
+                break
+            chunks.append(decompressor.decompress(data))
+
+    xml = b''.join(chunks)
+    start = xml.find(b'<page>')
+    end = xml.rfind(b'</page>')
+    if start < 0 or end < 0:
+        return
+
+    # A stream holds a run of <page> elements, without the <mediawiki> root around them.
+    root = ET.fromstring(b'<pages>' + xml[start:end + len(b'</page>')] + b'</pages>')
+    for page in root.iterfind('page'):
+        redirect = page.find('redirect')
+        yield (page.findtext('ns'), page.findtext('title'),
+               None if redirect is None else redirect.get('title'),
+               page.findtext('revision/text') or '')
+
+
+# The latex converter of a worker process. The memo is off, paragraphs rarely recur across a dump
+# and it would grow with it.
+_worker_latex = None
+_worker_links = None
+
+
+def _init_worker(latex, links):
+    global _worker_latex, _worker_links
+    _worker_latex = LatexConverter(memoize=False) if latex else None
+    _worker_links = links
+
+
+def _ingest_stream(dump, offset, length):
+    """ Converts the articles of a stream into page dictionaries, the work done by a DumpIngester worker. """
+    wikis = []
+    redirects = {}
+    counts = collections.Counter()
+    for namespace, title, redirect, wikitext in read_pages(dump, offset, length):
+        if namespace != '0':
+            counts['skipped'] += 1
+        elif redirect is not None:
+            redirects[title_url(title)] = title_url(redirect.partition('#')[0])
+            counts['redirects'] += 1
+        else:
+            url = title_url(title)
+            wikis.append(build_wiki(url, extract_wikitext(url, title, wikitext), latex=_worker_latex,
+                                    links=_worker_links))
+
+    return wikis, redirects, counts
+
+
+class DumpIngester:
+    """ DumpIngester bulk loads a pages-articles-multistream dump into the cache.
+
+    The index of the dump gives the offset of every bz2 stream of pages, so each stream
+    is decompressed and converted by extract_wikitext on its own, on worker processes.
+    At most `window` streams are in flight and the pages are written as each stream
+    finishes, so memory stays flat however large the dump is. Articles are cached under
+    their canonical url, so retrieving them afterwards is a cache hit. Redirects are
+    recorded as aliases of their targets, see PageCacher.resolve, and pages outside the
+    article namespace are skipped.
+
+    Usage:
+        with WikiCacher(config) as cacher:
+            stats = DumpIngester(cacher, dump, processes=4).ingest()
+    """
+    def __init__(self, cacher, dump, index=None, processes=None, latex=True, links=None, window=None,
+                 commit_every=64):
+        """ Initializes the DumpIngester class.
+
+        Args:
+            cacher (PageCacher): The cache the pages are written to.
+            dump (str): The path of the pages-articles-multistream.xml.bz2 dump.
+            index (str): The path of its index, defaults to the dump's sibling, see index_path.
+            processes (int): The number of worker processes, 0 converts in the calling process.
+                             Defaults to the number of cores.
+            latex (bool): Whether to convert latex in the paragraphs to unicode.
+            links (LinkFilter): Filters the links of the articles, None to keep them as is.
+            window (int): The most streams in flight at once, defaults to twice the processes.
+            commit_every (int): The number of streams written between commits.
+        """
+        self.cacher = cacher
+        self.dump = str(dump)
+        self.index = str(index) if index is not None else index_path(dump)
+        self.processes = os.cpu_count() if processes is None else max(0, processes)
+        self.latex = latex
+        self.links = links
+        self.window = window or max(2, 2 * self.processes)
+        self.commit_every = commit_every
+
+        self.counts = collections.Counter()
+
+    def ingest(self, limit=None):
+        """
+        Ingests the dump.
+
+        Args:
+            limit (int): The most streams to ingest, None for all of them.
+
+        Returns:
+            dict: The streams read, the articles cached, the redirects and other pages skipped,
+                  the seconds taken and the articles cached per second.
+        """
+        streams = read_streams(self.index)[:limit]
+        logger.info(f"Ingesting {len(streams)} streams of {self.dump} on {self.processes} processes.")
+
+        start = time.perf_counter()
+        if self.processes:
+            with Pool(self.processes, initializer=_init_worker, initargs=(self.latex, self.links)) as pool:
+                self.__write(self.__windowed(pool, streams), start)
+        else:
+            _init_worker(self.latex, self.links)
+            self.__write((_ingest_stream(self.dump, *stream) for stream in streams), start)
+        self.cacher.commit()
+
+        return self.stats(time.perf_counter() - start)
+
+    def __windowed(self, pool, streams):
+        """ Yields the results of the streams in order, with at most self.window of them submitted. """
+        pending = collections.deque()
+        for stream in streams:
+            pending.append(pool.apply_async(_ingest_stream, (self.dump, *stream)))
+            if len(pending) >= self.window:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+
+    def __write(self, results, start):
+        for i, (wikis, redirects, counts) in enumerate(results, 1):
+            self.cacher.cache_many(wikis)
+            self.cacher.alias_many(redirects)
+            self.counts.update(counts)
+            self.counts['streams'] += 1
+            self.counts['pages'] += len(wikis)
+
+            if i % self.commit_every == 0:
+                self.cacher.commit()
+                logger.info(f"Ingested {self.counts['pages']} pages from {i} streams, "
+                            f"{self.counts['pages'] / (time.perf_counter() - start):.0f} pages/s.")
+
+    def stats(self, seconds=None):
+        stats = {key: self.counts[key] for key in ('streams', 'pages', 'redirects', 'skipped')}
+        if seconds is not None:
+            stats['seconds'] = seconds
+            stats['pages_per_second'] = stats['pages'] / seconds if seconds else 0.0
+
+        return stats
@@ -1,10 +1,10 @@
+import asyncio
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-from functools import partial
 from multiprocessing import Pool
 import os
 import json
-import time
 
+import http.client
 import urllib
 from urllib import response
 import urllib.request
@@ -13,31 +13,28 @@ import logging
 import bs4
 from bs4 import BeautifulSoup as bs
 from pathlib import Path
-from time import sleep
 
 import re 
-import threading
-
-from pylatexenc.latexwalker import LatexWalker
-from pylatexenc.latex2text import LatexNodes2Text
 
+from .api_grabber import ApiWikiGrabber
+from .async_grabber import AsyncWikiGrabber
+from .media.downloader import MediaDownloader
+from .media.resolver import MediaResolver, file_title
+from .media.store import MediaStore
+from .net.limiter import RateLimiter
+from .net.pool import ConnectionPool
+from .parse.stage import ParseStage, build_wiki
+from .parse.streaming import stream_extract
+from .parse.urls import LinkFilter, canonical_url
 from .db.cacher import WikiCacher
-from .utils.model_to_dict import model_to_dict
 
 
 logger = logging.getLogger(__name__)
 
 
-def media_retrieve_wrapper(dl_url, save_loc):
-    try:
-        urllib.request.urlretrieve(dl_url, save_loc)
-    except (urllib.error.HTTPError, urllib.error.URLError) as e:
-        # logger.debug("Failed to download media. - Likely rate limited.")
-        sleep(5)
-        media_retrieve_wrapper(dl_url, save_loc)
+USER_AGENT = "wikicrawler/0.1.0 (https://github.com/GRAYgoose124/wikicrawler)"
 
 
-# TODO: make grabber asyncronous
 class WikiGrabber:
     """ WikiGrabber is a class that handles the fetching of wikipedia pages
 
@@ -63,12 +60,25 @@ class WikiGrabber:
         self.save_media = config['save_media']
         self.process_media_links = config['process_media_links']
         self.media_save_location = config['data_root'] + config['media_folder']
+        self.max_in_flight = config['max_in_flight']
+        self.store_raw_html = config['store_raw_html']
+        self.extractor = config['extractor']
+        self.extractor_tokenizer = config['extractor_tokenizer']
+        self.stream_chunk_size = config['stream_chunk_size']
+        self.parse_workers = config['parse_workers']
+        self.backend = config['backend']
+        self.links = LinkFilter.from_config(config)
     
         logger.debug(" -- Config Settings -- " +
                      f"\n\tMedia saving: {self.save_media}" +
                      f"\n\t\tMedia save location: {self.media_save_location}" +
                      f"\n\t\tMedia processing: {self.process_media_links}" +
-                     f"\n\tLatex conversion: {self.convert_latex}")
+                     f"\n\tLatex conversion: {self.convert_latex}" +
+                     f"\n\tRaw html storage: {self.store_raw_html}" +
+                     f"\n\tBackend: {self.backend}" +
+                     f"\n\tExtractor: {self.extractor} ({self.extractor_tokenizer})" +
+                     f"\n\tParse workers: {self.parse_workers}" +
+                     f"\n\tMax requests in flight: {self.max_in_flight}")
 
         if not os.path.exists(config['data_root']):
             os.makedirs(config['data_root'])
@@ -76,29 +86,133 @@ class WikiGrabber:
         if self.save_media and not os.path.exists(self.media_save_location):
             os.makedirs(self.media_save_location)
 
-        self.fetches = []
-
         # internal
         self.__shown_no_token_warning = False
+        # The url each fetched page led to, by the url it was fetched for, until the page is cached.
+        self.redirects = {}
 
-    def limit(self, t=5, limit=3):
+        self.limiter = RateLimiter.from_config(config)
+        self.pool = ConnectionPool(config['pool_size'], config['pool_idle_timeout'])
+
+        memo = None
+        if self.convert_latex and cacher is not None:
+            memo = cacher.latex_memo()
+        self.stage = ParseStage(self.parse_workers, tokenizer=self.extractor_tokenizer,
+                                latex=self.convert_latex, media=self.process_media_links, memo=memo,
+                                links=self.links)
+
+        self.resolver = MediaResolver(self.pool, self.limiter, config['api_url'], cacher,
+                                      headers={'User-Agent': USER_AGENT})
+        if self.process_media_links:
+            self.resolver.load()
+
+        self.api = None
+        if self.backend != 'html':
+            self.api = ApiWikiGrabber(self, mode=self.backend)
+
+        self.media = None
+        self.media_store = None
+        if self.save_media:
+            self.media_store = MediaStore(self.media_save_location, cacher, budget=config['media_budget'])
+            self.media_store.load()
+
+            self.media = MediaDownloader(self.pool, self.limiter, cacher, workers=config['media_workers'],
+                                         max_retries=config['media_max_retries'], backoff=config['media_backoff'],
+                                         max_backoff=config['media_max_backoff'], headers={'User-Agent': USER_AGENT},
+                                         store=self.media_store)
+            self.media.resume()
+
+    def close(self):
+        """ Stops the media and parse workers and closes idle connections. """
+        if self.media is not None:
+            self.media.close()
+        self.stage.close()
+        self.pool.close()
+
+    def stats(self):
+        """ Returns statistics about the grabber's fetching. """
+        stats = {'pool': self.pool.stats()}
+        if self.api is not None:
+            stats['api'] = self.api.stats()
+        if self.stage.latex is not None:
+            stats['latex'] = self.stage.latex.stats()
+        if self.process_media_links:
+            stats['media_resolver'] = self.resolver.stats()
+        if self.media is not None:
+            stats['media'] = self.media.progress()
+            stats['media_store'] = self.media_store.stats()
+        if self.store_raw_html and self.cacher is not None:
+            stats['raw_html'] = self.cacher.raw_stats()
+        if self.cacher is not None:
+            stats['aliases'] = self.cacher.alias_stats()
+
+        return stats
+
+    def headers(self):
+        """ The headers sent with every request, the api token is sent if one is configured. """
+        headers = {'User-Agent': USER_AGENT}
+        try:
+            headers['Authorization'] = 'Bearer ' + self.config['wiki_api_token']
+        except (ValueError, KeyError, TypeError) as e:
+            if not self.__shown_no_token_warning:
+                self.__shown_no_token_warning = True
+                logger.exception("No wiki api token provided. Continuing without one.", exc_info=e)
+
+        return headers
+
+    def request(self, url):
         """
-        Checks if the number of fetches in the last t seconds is greater than the limit.
-        
-        If it is, it will return True, otherwise False.
-        
-        This is a helper used by fetch to prevent too many requests from happening at once. 
+        Requests a page from the internet, leaving its body unread.
+
+        Args:
+            url (str): The url to request.
+
+        Returns:
+            PooledResponse: The response, or None if the request failed.
+
+        Raises:
+            ValueError: If the url is not a wikipedia url.
         """
-        for f in self.fetches:
-            if f + t < time.perf_counter():
-                self.fetches.remove(f)
-        
-        if len(self.fetches) > limit:
-            sleep(t)
-            return True
-        else:
-            self.fetches.append(time.perf_counter())
-            return False
+        parsed_url = urllib.parse.urlparse(url)
+
+        if not re.search("wikipedia.org", parsed_url.netloc):
+            raise ValueError(url)
+
+        self.limiter.acquire(parsed_url.netloc)
+
+        try:
+            return self.pool.request(url, self.headers())
+        except urllib.error.HTTPError as e:
+            logger.debug(f"{url} is invalid?", exc_info=e)
+        except urllib.error.URLError as e:
+            logger.debug(f"{url} timed out.", exc_info=e)
+
+        return None
+
+    def fetch_html(self, url):
+        """
+        Fetches the raw html of a page from the internet.
+
+        Args:
+            url (str): The url to fetch.
+
+        Returns:
+            tuple: The url after redirects and the decoded html, which is None if the fetch failed.
+
+        Raises:
+            ValueError: If the url is not a wikipedia url.
+        """
+        response = self.request(url)
+        if response is None:
+            return url, None
+
+        try:
+            with response:
+                return response.geturl(), response.read().decode("utf-8")
+        except (OSError, http.client.HTTPException) as e:
+            logger.debug(f"{url} timed out.", exc_info=e)
+
+        return url, None
 
     def fetch(self, url):
         """
@@ -111,51 +225,44 @@ class WikiGrabber:
             bs4.BeautifulSoup: The naked page soup.
 
         Raises:
-            urllib.error.HTTPError: If the page is not found or rate limited.
-            urllib.error.URLError: If the url is invalid.
-
+            ValueError: If the url is not a wikipedia url.
         """
+        return self.parse_html(*self.fetch_html(url))
 
-        if self.limit():
-            self.fetch(url)
-            return
+    def parse_html(self, url, html):
+        """
+        Parses fetched or stored html into a page soup.
 
-        parsed_url = urllib.parse.urlparse(url)
+        Args:
+            url (str): The url of the page.
+            html (str): The html of the page.
 
-        page = None
-        if re.search("wikipedia.org", parsed_url.netloc):
-            try:
-                req = urllib.request.Request(url)
-                try:
-                    req.add_header('Authorization', 'Bearer ' + self.config['wiki_api_token'])
-                except (ValueError, KeyError, TypeError) as e:
-                    if not self.__shown_no_token_warning:
-                        self.__shown_no_token_warning = True
-                        logger.exception("No wiki api token provided. Continuing without one.", exc_info=e)
-
-                response = urllib.request.urlopen(req)
-                url = response.geturl()
-
-                page = response.read().decode("utf-8")
-            except urllib.error.HTTPError as e:
-                logger.debug(f"{url} is invalid?", exc_info=e)
-                # sleep(3)
-                # return self.fetch(url)
-            except urllib.error.URLError as e:
-                logger.debug(f"{url} timed out.", exc_info=e)
-                #sleep(3)
-                #return self.fetch(url)
-        else:
-            raise ValueError(url)
-    
+        Returns:
+            bs4.BeautifulSoup: The naked page soup, or None if there is no html.
+        """
         try:
-            page_struct = bs(page, 'html.parser')
+            page_struct = bs(html, 'html.parser')
             page_struct.url = url
+            if self.store_raw_html:
+                page_struct.raw_html = html
             return page_struct
         except TypeError as e:
             logger.debug(f"Failed to parse {url} - likely throttled.", exc_info=e)
             return None
 
+    def fetch_many(self, urls):
+        """
+        Fetches several pages concurrently, see AsyncWikiGrabber.fetch_many.
+
+        Args:
+            urls (list): The urls to fetch.
+
+        Returns:
+            list: The page soups in the same order as urls, None for failed fetches.
+        """
+        with AsyncWikiGrabber(self) as agrabber:
+            return asyncio.run(agrabber.fetch_many(urls))
+
     def retrieve(self, url, page=None):
         """
         Retrieves a page from the internet or cache and parses it into a dictionary 
@@ -166,36 +273,242 @@ class WikiGrabber:
             TODO: Deprecate page argument.
             page (bs4.BeautifulSoup): If the page has already been fetched, pass it here.
         """
-        if url in self.cacher:
-            return model_to_dict(self.cacher.get(url))
+        if self.cacher is not None:
+            wiki = self.cacher.get_or_none(url)
+            if wiki is not None:
+                return wiki
+
+        if page is not None:
+            wiki = self.extract(url, page)
+            self.cache(wiki, page.__dict__.get('raw_html'))
+
+            return wiki
+
+        wiki, html = self.fetch_extract(url)
+        self.cache(wiki, html)
+           
+        return wiki
+
+    def fetch_extract(self, url):
+        """
+        Fetches and extracts a page with the configured backend and extractor, without caching it.
+
+        This does not touch the cacher, so it is safe to call from worker threads.
+
+        Args:
+            url (str): The url to fetch.
+
+        Returns:
+            tuple: The page dictionary and the html it was extracted from, which is None if it was not kept.
+
+        Raises:
+            ValueError: If the url is not a wikipedia url, or is in an excluded namespace, see LinkFilter.
+            AttributeError: If the page could not be fetched or is not a wiki page.
+        """
+        if not self.links.allowed(url):
+            raise ValueError(f"{url} is in an excluded namespace.")
+
+        if self.api is not None:
+            return self.api.fetch(url)
+
+        if self.extractor == 'streaming':
+            return self.stream(url)
+
+        page_url, html = self.fetch_html(url)
+        self.redirected(url, page_url)
+        return self.extract_html(url, html, page_url), html
+
+    def redirected(self, url, page_url):
+        """
+        Notes the url a fetch led to, e.g. after a redirect. When the page is cached it is cached
+        under that url, and url is recorded as an alias of it, so later retrievals under either are
+        cache hits, see PageCacher.resolve.
+
+        This does not touch the cacher, so it is safe to call from worker threads.
+
+        Args:
+            url (str): The url the page was fetched for.
+            page_url (str): The url the page was fetched from.
+        """
+        if page_url is not None and page_url != url:
+            self.redirects[url] = page_url
+
+    def reextract(self, url):
+        """
+        Re-extracts a page from its stored raw html without fetching it, and recaches it.
+
+        Args:
+            url (str): A url of the page, e.g. a redirect to it.
+
+        Returns:
+            dict: The page dictionary, or None if no raw html is stored for url.
+        """
+        key = self.cacher.resolve(url) or url
+        html = self.cacher.get_raw(key)
+        if html is None:
+            return None
+
+        wiki = self.extract_html(key, html)
+        self.cache(wiki)
+
+        return wiki
+
+    def cache(self, wiki, html=None):
+        """
+        Caches a retrieved page, along with its compressed raw html if config['store_raw_html'] is set,
+        and persists the latex conversions, media infos and media downloads since the last page.
+
+        A page which was redirected is cached under the url it led to, which becomes its url,
+        and the url it was retrieved for is recorded as an alias of it, see redirected.
+
+        Args:
+            wiki (dict): The extracted page dictionary.
+            html (str): The html it was extracted from.
+        """
+        url = wiki['url']
+        page_url = self.redirects.pop(url, None)
+        if page_url is not None:
+            wiki['url'] = canonical_url(page_url)
+
+        if self.cacher is None:
+            return
+
+        self.cacher.cache(wiki)
+        if page_url is not None:
+            self.cacher.alias(url, wiki['url'])
+
+        if self.stage.latex is not None:
+            entries, _ = self.stage.latex.drain()
+            if entries:
+                self.cacher.store_latex(entries)
+
+        self.resolver.flush()
+        if self.media is not None:
+            self.media.poll()
+
+        if self.store_raw_html and html is not None:
+            self.cacher.store_raw(wiki['url'], html)
+
+    def retrieve_many(self, urls):
+        """
+        Retrieves several pages concurrently, see AsyncWikiGrabber.retrieve_many. With
+        config['backend'] set to 'query' they are retrieved in batches instead, see
+        ApiWikiGrabber.retrieve_many.
+
+        Args:
+            urls (list): The urls to retrieve.
+
+        Returns:
+            list: The page dictionaries in the same order as urls, None for failed fetches.
+        """
+        if self.backend == 'query':
+            return self.api.retrieve_many(urls)
+
+        with AsyncWikiGrabber(self) as agrabber:
+            return asyncio.run(agrabber.retrieve_many(urls))
+
+    def extract_html(self, url, html, page_url=None):
+        """
+        Parses fetched or stored html into the dictionary which is cached and processed.
+
+        With config['extractor'] set to 'single_pass' or 'streaming' the page is extracted
+        while it is tokenized and no soup is built, on one of config['parse_workers'] worker
+        processes if there are any. 'soup' parses it with BeautifulSoup first. All produce
+        the same dictionary. This does not touch the cacher, so it is safe to call from
+        worker threads.
+
+        Args:
+            url (str): The url the page was retrieved for.
+            html (str): The html of the page.
+            page_url (str): The url of the page after redirects, defaults to url.
+
+        Raises:
+            AttributeError: If the html is missing or not a wiki page.
+        """
+        if page_url is None:
+            page_url = url
+
+        if self.extractor == 'soup':
+            return self.extract(url, self.parse_html(page_url, html))
+
+        if html is None:
+            raise AttributeError(f"No html to extract for {url}.")
+
+        wiki, hrefs = self.stage.submit(url, html, page_url).result()
+        if hrefs is not None:
+            wiki['media'] = self.__get_media(hrefs)
+
+        return wiki
+
+    def stream(self, url):
+        """
+        Fetches a page and extracts it while the response is read, see stream_extract.
 
-        if page is None:
-            page = self.fetch(url)
+        Neither the html nor a tree of the page is held in memory, so the memory used
+        per page stays bounded however long the page is. The html is only kept if
+        config['store_raw_html'] is set. This does not touch the cacher, so it is safe
+        to call from worker threads.
 
+        Args:
+            url (str): The url to retrieve.
+
+        Returns:
+            tuple: The page dictionary and its html, which is None unless it is stored.
+
+        Raises:
+            ValueError: If the url is not a wikipedia url.
+            AttributeError: If the page could not be fetched or is not a wiki page.
+        """
+        response = self.request(url)
+        if response is None:
+            raise AttributeError(f"Failed to fetch {url}.")
+
+        with response:
+            try:
+                parts, html = stream_extract(response, response.geturl(), tokenizer=self.extractor_tokenizer,
+                                             chunk_size=self.stream_chunk_size, keep_html=self.store_raw_html)
+            except urllib.error.URLError as e:
+                logger.debug(f"{url} timed out.", exc_info=e)
+                raise AttributeError(f"Failed to fetch {url}.") from e
+            self.redirected(url, response.geturl())
+
+        return self.assemble(url, parts), html
+
+    def extract(self, url, page):
+        """
+        Parses a fetched page soup into the dictionary which is cached and processed.
+
+        This does not touch the cacher, so it is safe to call from worker threads.
+
+        Args:
+            url (str): The url the page was retrieved for.
+            page (bs4.BeautifulSoup): The fetched page.
+        """
         paragraphs, para_links = self.__paragraphs(page)
 
-        # Latex conversion to unicode
-        if self.convert_latex:
-            nl2t = LatexNodes2Text().nodelist_to_text
-            paragraphs = [nl2t(LatexWalker(paragraph).get_latex_nodes()[0]) for paragraph in paragraphs]
+        parts = {'title': page.find(id='firstHeading').get_text(),
+                 'paragraphs': paragraphs,
+                 'paragraph_links': para_links,
+                 'see_also': self.__see_also(page),
+                 'toc_links': self.__page_links(page),
+                 'references': self.__reference_links(page),
+                 'images': [a.attrs for a in page.find_all('a', attrs={'class': "image"})]}
+
+        return self.assemble(url, parts)
+
+    def assemble(self, url, parts):
+        """
+        Builds the page dictionary from the extracted parts of a page.
+
+        Args:
+            url (str): The url the page was retrieved for.
+            parts (dict): The parts extracted by any of the extractors.
+        """
+        wiki = build_wiki(url, parts, latex=self.stage.latex, links=self.links)
 
-        media_list = None
         if self.process_media_links:
-            media_list = self.__get_media(page) 
-
-        # TODO: define this as a class for typing/API?
-        wiki = { 'url': url, 
-                'title': page.find(id='firstHeading').get_text(), 
-                'paragraphs': paragraphs,
-                'paragraph_links': para_links,
-                'see_also': self.__see_also(page),
-                'toc_links': self.__page_links(page), 
-                'references': self.__reference_links(page), 
-                'media': media_list}
-        
-        if self.cacher is not None:
-            self.cacher.cache(wiki)
-           
+            wiki['media'] = self.__get_media([image['href'] for image in parts['images']])
+
         return wiki
 
     # Wikipedia page parsing
@@ -297,53 +610,46 @@ class WikiGrabber:
                     logger.debug(f"No title for see also link? {a}")
         return see_also
 
-    def __get_media(self, page):
+    def __get_media(self, hrefs):
         """
-        Parses the media links from a wikipedia page.
+        Resolves the media links of a wikipedia page, in batches through the api, see MediaResolver.
         
         Args:
-            page (bs4.BeautifulSoup): The page to parse.
+            hrefs (list): The hrefs of the page's image links.
             
         Returns:
             A list of media link references.
 
         Class Variables Used:
-            self.save_media: If True, saves the media to disk.
+            self.save_media: If True, queues the media to be downloaded by self.media.
             self.process_media_links (bool): Whether to process media links if not saving.
-            self.media_save_path (str): The path to save media to if saving.
+            self.media_store (MediaStore): The store media is saved into, by title.
         """
-        save_locs = []
+        titles = []
         dl_urls = []
 
         if self.process_media_links:
-            logger.debug("Downloading page media... (This may take a moment.)")
-            for img in page.find_all('a', attrs={'class': "image"}):
-                url = 'https://en.wikipedia.org/' + img['href']
-                # TODO: Fix worker thread blocking.
-                dl_page = self.fetch(url)
+            logger.debug("Resolving page media... (This may take a moment.)")
+            infos = self.resolver.resolve([file_title(href) for href in hrefs])
+            for title, info in infos.items():
+                if info is None:
+                    continue
 
-                dl_link = dl_page.select('.fullMedia')[0].p.a
+                dl_url = info['url']
 
-                dl_url = "https://" + dl_link['href'].lstrip('//')
-                save_loc = Path(self.media_save_location, dl_link['title'])
+                if self.media_store is not None:
+                    held = self.media_store.has(title)
+                else:
+                    held = Path(self.media_save_location, title).exists()
 
-                if not save_loc.exists():
-                    save_locs.append(str(save_loc))
+                if not held:
+                    titles.append(title)
                     dl_urls.append(dl_url)
 
-        # Download the media with workers. TODO: Handle with asyncio loop to avoid blocking caller.
+        # Queue the downloads, see self.media.progress().
         if self.save_media and self.process_media_links:
-            try:
-                # with Pool(len(dl_urls)) as p:
-                #     p.starmap(urllib.request.urlretrieve, zip(dl_urls, save_locs))
-                for dl_url, save_loc in zip(dl_urls, save_locs):
-                    p = partial(media_retrieve_wrapper, dl_url, save_loc)
-                    t = threading.Thread(target=p, daemon=True)
-                    logger.debug(f"Started downloading {dl_url}.")
-                    t.start()
-            except urllib.error.HTTPError:
-                logger.debug(f"Failed to download media from {dl_url}")
-                sleep(1)
+            queued = self.media.enqueue(zip(dl_urls, titles))
+            logger.debug(f"Queued {queued} media downloads.")
 
         return dl_urls
 
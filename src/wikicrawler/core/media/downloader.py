@@ -0,0 +1,291 @@
+import hashlib
+import http.client
+import logging
+import os
+import queue
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+
+PENDING, DONE, FAILED = 'pending', 'done', 'failed'
+
+# Statuses worth retrying, everything else >= 400 fails the download at once.
+RETRY_CODES = (408, 425, 429, 500, 502, 503, 504)
+
+
+class MediaDownloader:
+    """ MediaDownloader downloads media files on a fixed number of worker threads.
+
+    Downloads are queued in the cache database, so pending downloads are resumed the
+    next time the downloader starts. Failed downloads are retried with exponential
+    backoff up to a retry cap, and files are written to a temporary file next to their
+    destination and renamed into place, so a partial file never appears under its name.
+
+    The database is only touched from the thread which owns the cacher: enqueue() can be
+    called from any thread, poll() persists new downloads and the workers' results.
+
+    With a MediaStore, downloads are (url, title) and go into the store instead of a path,
+    see MediaStore.
+
+    Usage:
+        downloader = MediaDownloader(pool, limiter, cacher)
+        downloader.resume()
+        downloader.enqueue([(url, path)])
+        downloader.progress()
+    """
+    def __init__(self, pool, limiter, cacher=None, workers=4, max_retries=5, backoff=1.0, max_backoff=60.0,
+                 headers=None, store=None):
+        """ Initializes the MediaDownloader class.
+
+        Args:
+            pool (ConnectionPool): The pool to download over.
+            limiter (RateLimiter): Limits the downloads per host.
+            cacher (PageCacher): Persists the download queue, if None downloads do not survive restarts.
+            workers (int): The number of download threads.
+            max_retries (int): How often a download is retried before it fails.
+            backoff (float): Seconds before the first retry, doubled for every further retry.
+            max_backoff (float): The longest wait between retries.
+            headers (dict): Extra request headers, e.g. the User-Agent.
+            store (MediaStore): Stores downloads by content, their targets are then titles instead of paths.
+        """
+        self.pool = pool
+        self.limiter = limiter
+        self.cacher = cacher
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.headers = dict(headers or {})
+        self.store = store
+
+        self.queue = queue.Queue()
+        self.results = queue.Queue()
+        self.stopping = threading.Event()
+        self.threads = []
+        self.lock = threading.Lock()
+
+        # url -> {'path', 'status', 'attempts', 'size', 'error'}, the state of every known download.
+        self.downloads = {}
+        self.unsaved = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        """ Starts the worker threads if they are not running yet, queueing every pending download.
+
+        Returns:
+            bool: Whether the workers were started.
+        """
+        with self.lock:
+            if self.threads:
+                return False
+
+            self.stopping.clear()
+            self.queue = queue.Queue()
+            for url, download in self.downloads.items():
+                if download['status'] == PENDING:
+                    self.queue.put((url, download['path'], download['attempts']))
+
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"media-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+        return True
+
+    def close(self, wait=True):
+        """ Stops the workers. Downloads which have not finished stay queued for the next start.
+
+        Args:
+            wait (bool): Whether to wait for the downloads in progress to finish.
+        """
+        self.stopping.set()
+        with self.lock:
+            threads, self.threads = self.threads, []
+            for _ in threads:
+                self.queue.put(None)
+
+        if wait:
+            for thread in threads:
+                thread.join()
+
+        self.poll()
+
+    def resume(self):
+        """ Queues the pending downloads persisted by an earlier run. """
+        if self.cacher is None:
+            return
+
+        pending = self.cacher.media_pending()
+        with self.lock:
+            for url, path, attempts in pending:
+                self.downloads[url] = {'path': path, 'status': PENDING, 'attempts': attempts, 'size': None,
+                                       'error': None}
+
+        if pending:
+            logger.debug(f"Resuming {len(pending)} media downloads.")
+            if not self.start():
+                for download in pending:
+                    self.queue.put(download)
+
+    def enqueue(self, downloads):
+        """
+        Queues downloads, skipping urls which are already queued or downloaded and titles already stored.
+
+        Args:
+            downloads (iterable): (url, path) tuples, or (url, title) with a store.
+
+        Returns:
+            int: The number of newly queued downloads.
+        """
+        self.start()
+
+        queued = []
+        with self.lock:
+            for url, path in downloads:
+                if url in self.downloads and self.downloads[url]['status'] != FAILED:
+                    continue
+                if self.store is not None and self.store.has(path):
+                    continue
+
+                self.downloads[url] = {'path': str(path), 'status': PENDING, 'attempts': 0, 'size': None,
+                                       'error': None}
+                self.unsaved.append((url, str(path)))
+                queued.append((url, str(path), 0))
+
+        for download in queued:
+            self.queue.put(download)
+
+        return len(queued)
+
+    def poll(self):
+        """ Persists new downloads and the results of finished ones, call it from the cacher's thread. """
+        with self.lock:
+            unsaved, self.unsaved = self.unsaved, []
+
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+
+        with self.lock:
+            for url, status, attempts, size, error, _ in results:
+                self.downloads[url].update(status=status, attempts=attempts, size=size, error=error)
+
+        if self.store is not None:
+            for url, status, _, size, _, digest in results:
+                if digest is not None:
+                    self.store.add(self.downloads[url]['path'], digest, size)
+            self.store.flush()
+
+        if self.cacher is not None:
+            if unsaved:
+                self.cacher.media_enqueue(unsaved)
+            for result in results:
+                self.cacher.media_update(*result[:5])
+
+    def progress(self):
+        """ Returns the number of pending, done and failed downloads and the bytes downloaded. """
+        self.poll()
+
+        with self.lock:
+            progress = dict.fromkeys((PENDING, DONE, FAILED), 0)
+            for download in self.downloads.values():
+                progress[download['status']] += 1
+            progress['bytes'] = sum(download['size'] or 0 for download in self.downloads.values())
+            progress['workers'] = len(self.threads)
+
+        return progress
+
+    def status(self, url):
+        """ Returns the state of a download, or None if the url was never queued. """
+        with self.lock:
+            download = self.downloads.get(url)
+            return dict(download) if download is not None else None
+
+    def failed(self):
+        """ Returns the failed downloads and their last errors. """
+        with self.lock:
+            return {url: download['error'] for url, download in self.downloads.items()
+                    if download['status'] == FAILED}
+
+    # workers
+
+    def _work(self):
+        work = self.queue
+        while True:
+            download = work.get()
+            if download is None or self.stopping.is_set():
+                return
+
+            url, path, attempts = download
+            while True:
+                attempts += 1
+                try:
+                    size, digest = self._download(url, path)
+                except urllib.error.HTTPError as e:
+                    error, retry = f"HTTP {e.code}", e.code in RETRY_CODES
+                except (urllib.error.URLError, OSError, http.client.HTTPException) as e:
+                    error, retry = str(e), True
+                else:
+                    self.results.put((url, DONE, attempts, size, None, digest))
+                    break
+
+                if not retry or attempts > self.max_retries:
+                    logger.debug(f"Failed to download {url} after {attempts} attempts: {error}")
+                    self.results.put((url, FAILED, attempts, None, error, None))
+                    break
+
+                # Stays pending with the attempts so far if the downloader stops while waiting.
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+                logger.debug(f"Retrying {url} in {delay:.1f}s: {error}")
+                if self.stopping.wait(delay):
+                    self.results.put((url, PENDING, attempts, None, error, None))
+                    return
+
+    def _download(self, url, target):
+        """ Downloads url atomically to a path or into the store, returns the bytes written and their digest. """
+        self.limiter.acquire(urllib.parse.urlparse(url).netloc)
+
+        if self.store is not None:
+            directory, name = self.store.incoming, 'blob'
+        else:
+            path = Path(target)
+            directory, name = path.parent, path.name
+            directory.mkdir(parents=True, exist_ok=True)
+
+        with self.pool.request(url, self.headers) as response:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix='.part')
+            try:
+                size = 0
+                digest = hashlib.sha256()
+                with os.fdopen(fd, 'wb') as f:
+                    while chunk := response.read(65536):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                if self.store is not None:
+                    self.store.ingest(tmp_path, digest.hexdigest())
+                else:
+                    os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+        return size, digest.hexdigest()
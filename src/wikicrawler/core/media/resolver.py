@@ -0,0 +1,120 @@
+import logging
+import threading
+import urllib.error
+import urllib.parse
+
+from ..net.api import BATCH_SIZE, ApiClient
+
+
+logger = logging.getLogger(__name__)
+
+
+def file_title(href):
+    """ The title of a file description page from its href, e.g. /wiki/File:Sun_(star).jpg -> File:Sun (star).jpg. """
+    return urllib.parse.unquote(href.rsplit('/wiki/', 1)[-1]).replace('_', ' ')
+
+
+class MediaResolver:
+    """ MediaResolver resolves file titles to their download urls with MediaWiki imageinfo queries.
+
+    Titles are resolved BATCH_SIZE at a time instead of fetching every file description
+    page. Results, including titles which do not exist, are kept in the cache database so
+    a title is only ever queried once.
+
+    Lookups are served from memory and are thread-safe. The database is only touched
+    from the thread which owns the cacher, by load() and flush().
+
+    Usage:
+        resolver = MediaResolver(pool, limiter, api_url, cacher)
+        resolver.load()
+        infos = resolver.resolve(['File:Sun.jpg'])
+    """
+    def __init__(self, pool, limiter, api_url, cacher=None, headers=None):
+        """ Initializes the MediaResolver class.
+
+        Args:
+            pool (ConnectionPool): The pool to query over.
+            limiter (RateLimiter): Limits the queries per host.
+            api_url (str): The url of the wiki's api.php.
+            cacher (PageCacher): Persists resolved titles, if None they are kept in memory only.
+            headers (dict): Extra request headers, e.g. the User-Agent.
+        """
+        self.api = ApiClient(pool, limiter, api_url, headers)
+        self.cacher = cacher
+
+        self.lock = threading.Lock()
+        # title -> {'url', 'sha1', 'size'}, None for titles which do not exist.
+        self.infos = {}
+        self.unsaved = {}
+
+        self.hits = 0
+
+    def load(self):
+        """ Loads the resolved titles from the cache database. """
+        if self.cacher is not None:
+            with self.lock:
+                self.infos.update(self.cacher.media_infos())
+
+    def flush(self):
+        """ Persists the titles resolved since the last flush, call it from the cacher's thread. """
+        with self.lock:
+            unsaved, self.unsaved = self.unsaved, {}
+
+        if self.cacher is not None and unsaved:
+            self.cacher.store_media_infos(unsaved)
+
+    def resolve(self, titles):
+        """
+        Resolves file titles to their download urls.
+
+        Args:
+            titles (list): File titles, e.g. 'File:Sun.jpg'.
+
+        Returns:
+            dict: {'url', 'sha1', 'size'} by title, None for titles which do not exist. Titles
+                  which could not be queried, e.g. because the api is unreachable, are left out.
+        """
+        with self.lock:
+            missing = list(dict.fromkeys(title for title in titles if title not in self.infos))
+            self.hits += len(titles) - len(missing)
+
+        for i in range(0, len(missing), BATCH_SIZE):
+            batch = missing[i:i + BATCH_SIZE]
+            try:
+                infos = self._query(batch)
+            except (urllib.error.URLError, ValueError, KeyError) as e:
+                logger.debug(f"Failed to resolve {len(batch)} media titles.", exc_info=e)
+                continue
+
+            with self.lock:
+                self.infos.update(infos)
+                self.unsaved.update(infos)
+
+        with self.lock:
+            return {title: self.infos[title] for title in titles if title in self.infos}
+
+    def _query(self, titles):
+        """ Queries the imageinfo of up to BATCH_SIZE titles, following continuations. """
+        params = {'action': 'query', 'prop': 'imageinfo', 'iiprop': 'url|sha1|size', 'titles': '|'.join(titles)}
+
+        aliases = {title: title for title in titles}
+        infos = {}
+        for data in self.api.query(params):
+            query = data.get('query', {})
+            for alias in query.get('normalized', []):
+                aliases[alias['to']] = alias['from']
+
+            for page in query.get('pages', []):
+                title = aliases.get(page['title'], page['title'])
+                if 'imageinfo' in page:
+                    info = page['imageinfo'][0]
+                    infos[title] = {'url': info['url'], 'sha1': info.get('sha1'), 'size': info.get('size')}
+                elif page.get('missing') or page.get('invalid'):
+                    infos.setdefault(title, None)
+
+        return infos
+
+    def stats(self):
+        """ Returns the number of titles resolved, api requests made and titles served from the cache. """
+        with self.lock:
+            return {'titles': len(self.infos), 'requests': self.api.requests, 'cache_hits': self.hits}
@@ -0,0 +1,185 @@
+import collections
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+
+class MediaStore:
+    """ MediaStore keeps media files as blobs named by the sha256 of their content.
+
+    Titles map to blobs through an index in the cache database, so a file referenced by
+    many articles is stored once, and different titles with identical bytes share a
+    blob. When the blobs outgrow the size budget, the least recently used ones are
+    evicted together with the titles pointing at them.
+
+    Lookups are served from memory and are thread-safe. The database is only touched
+    from the thread which owns the cacher, by load() and flush(). A blob ingested by a
+    download is pinned until it is added under its title, so it is not evicted between.
+
+    Usage:
+        store = MediaStore(root, cacher, budget=2 ** 30)
+        store.load()
+        path = store.path(title)
+    """
+    def __init__(self, root, cacher=None, budget=None):
+        """ Initializes the MediaStore class.
+
+        Args:
+            root (str): The directory blobs are stored in.
+            cacher (PageCacher): Persists the index, if None the index is kept in memory only.
+            budget (int): The most bytes of blobs kept, None for no limit.
+        """
+        self.root = Path(root)
+        self.cacher = cacher
+        self.budget = budget
+
+        self.incoming = self.root / 'incoming'
+        self.incoming.mkdir(parents=True, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.titles = {}
+        # digest -> [size, last used]
+        self.blobs = {}
+        self.size = 0
+        # Ingested digests not added yet, by the number of downloads holding them.
+        self.pinned = collections.Counter()
+
+        self.changed_titles = set()
+        self.changed_blobs = set()
+        self.evictions = 0
+
+    def load(self):
+        """ Loads the index from the cache database, dropping entries whose blob is missing. """
+        if self.cacher is None:
+            return
+
+        titles, blobs = self.cacher.media_store_index()
+        with self.lock:
+            for digest, (size, last_used) in blobs.items():
+                if self.blob_path(digest).exists():
+                    self.blobs[digest] = [size, last_used]
+                else:
+                    self.changed_blobs.add(digest)
+            for title, digest in titles.items():
+                if digest in self.blobs:
+                    self.titles[title] = digest
+                else:
+                    self.changed_titles.add(title)
+            self.size = sum(size for size, _ in self.blobs.values())
+
+    def flush(self):
+        """ Persists the index changes since the last flush, call it from the cacher's thread. """
+        with self.lock:
+            titles = {title: self.titles.get(title) for title in self.changed_titles}
+            blobs = {digest: tuple(self.blobs[digest]) if digest in self.blobs else None
+                     for digest in self.changed_blobs}
+            self.changed_titles = set()
+            self.changed_blobs = set()
+
+        if self.cacher is not None and (titles or blobs):
+            self.cacher.media_store_update(titles, blobs)
+
+    def blob_path(self, digest):
+        return self.root / digest[:2] / digest
+
+    def has(self, title):
+        """ Whether the media of a title is held, marking it as used like path, since it is held for a page using it. """
+        return self.path(title) is not None
+
+    def path(self, title):
+        """ Returns the blob path of a title's media and marks it as used, None if it is not held. """
+        with self.lock:
+            digest = self.titles.get(title)
+            if digest is None:
+                return None
+
+            self.blobs[digest][1] = time.time()
+            self.changed_blobs.add(digest)
+
+        return self.blob_path(digest)
+
+    def ingest(self, tmp_path, digest):
+        """
+        Moves a downloaded file into the store, or drops it if its blob is already held,
+        and pins the blob until it is added, see add.
+
+        Args:
+            tmp_path (str): The downloaded file, in self.incoming so it can be renamed atomically.
+            digest (str): The sha256 hex digest of its content.
+        """
+        path = self.blob_path(digest)
+        with self.lock:
+            self.pinned[digest] += 1
+            if path.exists():
+                os.unlink(tmp_path)
+                return
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+
+    def add(self, title, digest, size):
+        """ Indexes an ingested blob under a title and unpins it, evicting blobs if the budget is exceeded. """
+        with self.lock:
+            self.pinned[digest] -= 1
+            if self.pinned[digest] <= 0:
+                del self.pinned[digest]
+
+            self.titles[title] = digest
+            self.changed_titles.add(title)
+
+            if digest not in self.blobs:
+                self.blobs[digest] = [size, 0.0]
+                self.size += size
+            self.blobs[digest][1] = time.time()
+            self.changed_blobs.add(digest)
+
+            # Unlinked under the lock, so an ingest of the same digest waits rather than losing its file.
+            for evicted in self._evict(keep=digest):
+                if evicted in self.blobs:
+                    continue
+                try:
+                    os.unlink(self.blob_path(evicted))
+                except FileNotFoundError:
+                    pass
+
+    def _evict(self, keep):
+        """ Drops the least recently used blobs until the budget is met, except pinned ones, returns their digests. """
+        if self.budget is None or self.size <= self.budget:
+            return []
+
+        evicted = []
+        for digest, (size, _) in sorted(self.blobs.items(), key=lambda blob: blob[1][1]):
+            if self.size <= self.budget:
+                break
+            if digest == keep or digest in self.pinned:
+                continue
+
+            del self.blobs[digest]
+            self.size -= size
+            self.changed_blobs.add(digest)
+            evicted.append(digest)
+
+        if evicted:
+            dropped = set(evicted)
+            for title in [title for title, digest in self.titles.items() if digest in dropped]:
+                del self.titles[title]
+                self.changed_titles.add(title)
+
+            self.evictions += len(evicted)
+            logger.debug(f"Evicted {len(evicted)} media blobs, {self.size} bytes held.")
+
+        return evicted
+
+    def stats(self):
+        """ Returns the number of titles and blobs held, their size and the evictions so far. """
+        with self.lock:
+            return {'titles': len(self.titles),
+                    'blobs': len(self.blobs),
+                    'bytes': self.size,
+                    'budget': self.budget,
+                    'evictions': self.evictions}
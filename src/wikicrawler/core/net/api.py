@@ -0,0 +1,90 @@
+import json
+import logging
+import threading
+import urllib.parse
+
+
+logger = logging.getLogger(__name__)
+
+
+# The most titles the API accepts in one query without bot rights.
+BATCH_SIZE = 50
+
+
+class ApiError(ValueError):
+    """ An error returned by the MediaWiki API, e.g. missingtitle. """
+    def __init__(self, code, info):
+        super().__init__(f"{code}: {info}")
+        self.code = code
+
+
+class ApiClient:
+    """ ApiClient makes rate limited requests to a MediaWiki action API over the connection pool.
+
+    Usage:
+        api = ApiClient(pool, limiter, 'https://en.wikipedia.org/w/api.php')
+        for response in api.query({'action': 'query', 'titles': 'Sun'}):
+            ...
+    """
+    def __init__(self, pool, limiter, api_url, headers=None):
+        """ Initializes the ApiClient class.
+
+        Args:
+            pool (ConnectionPool): The pool to request over.
+            limiter (RateLimiter): Limits the requests per host.
+            api_url (str): The url of the wiki's api.php.
+            headers (dict): Extra request headers, e.g. the User-Agent.
+        """
+        self.pool = pool
+        self.limiter = limiter
+        self.api_url = api_url
+        self.headers = dict(headers or {})
+
+        self.host = urllib.parse.urlparse(api_url).netloc
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def get(self, params):
+        """
+        Makes a single api request.
+
+        Args:
+            params (dict): The request parameters, format and formatversion 2 are added.
+
+        Returns:
+            dict: The decoded response.
+
+        Raises:
+            ApiError: If the api returned an error.
+            urllib.error.URLError: If the request failed.
+        """
+        params = dict(params, format='json', formatversion='2')
+        url = self.api_url + '?' + urllib.parse.urlencode(params)
+
+        self.limiter.acquire(self.host)
+        with self.pool.request(url, self.headers) as response:
+            data = json.loads(response.read().decode('utf-8'))
+
+        with self.lock:
+            self.requests += 1
+
+        if 'error' in data:
+            raise ApiError(data['error'].get('code'), data['error'].get('info'))
+
+        return data
+
+    def query(self, params):
+        """
+        Makes an api request and the requests continuing it, see get.
+
+        Yields:
+            dict: The decoded responses.
+        """
+        params = dict(params)
+        while True:
+            data = self.get(params)
+            yield data
+
+            if 'continue' not in data:
+                break
+            params.update(data['continue'])
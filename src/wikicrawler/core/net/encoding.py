@@ -0,0 +1,115 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def accept_encoding():
+    """ The Accept-Encoding header value for the codecs available in this environment. """
+    encodings = ['gzip', 'deflate']
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+
+    return ', '.join(encodings)
+
+
+class _DeflateDecoder:
+    """ Decodes deflate bodies, which servers send both zlib wrapped and raw.
+
+    The two bytes of a zlib header tell them apart, so chunks are buffered until there are two.
+    """
+    def __init__(self):
+        self.decoder = None
+        self.buffer = b''
+
+    def decompress(self, data):
+        if self.decoder is None:
+            self.buffer += data
+            if len(self.buffer) < 2:
+                return b''
+
+            data, self.buffer = self.buffer, b''
+            self.decoder = zlib.decompressobj(zlib.MAX_WBITS if _zlib_header(data) else -zlib.MAX_WBITS)
+
+        return self.decoder.decompress(data)
+
+    def flush(self):
+        if self.decoder is None:
+            # A body shorter than a zlib header can only be raw.
+            self.decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self.decoder.decompress(self.buffer) + self.decoder.flush()
+
+        return self.decoder.flush()
+
+
+def _zlib_header(data):
+    """ Whether data starts with a zlib header: deflate as method, and a check of the first two bytes. """
+    return data[0] & 0x0f == 8 and (data[0] << 8 | data[1]) % 31 == 0
+
+
+class _BrotliDecoder:
+    def __init__(self):
+        self.decoder = brotli.Decompressor()
+
+    def decompress(self, data):
+        return self.decoder.process(data)
+
+    def flush(self):
+        return b''
+
+
+class _ZstdDecoder:
+    def __init__(self):
+        self.decoder = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data):
+        return self.decoder.decompress(data)
+
+    def flush(self):
+        return b''
+
+
+class _IdentityDecoder:
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+def decoder(content_encoding):
+    """
+    Returns an incremental decoder for a Content-Encoding header value.
+
+    Args:
+        content_encoding (str): The Content-Encoding of a response, None or '' for identity.
+
+    Returns:
+        An object with decompress(chunk) and flush() methods.
+
+    Raises:
+        ValueError: If the encoding is not supported.
+    """
+    content_encoding = (content_encoding or 'identity').strip().lower()
+
+    if content_encoding in ('gzip', 'x-gzip'):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif content_encoding == 'deflate':
+        return _DeflateDecoder()
+    elif content_encoding == 'br' and brotli is not None:
+        return _BrotliDecoder()
+    elif content_encoding == 'zstd' and zstandard is not None:
+        return _ZstdDecoder()
+    elif content_encoding == 'identity':
+        return _IdentityDecoder()
+
+    raise ValueError(f"Unsupported content encoding: {content_encoding}")
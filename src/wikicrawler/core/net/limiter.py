@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """ A thread-safe token bucket.
+
+    Tokens refill continuously at `rate` per second up to `burst`. Taking a token never
+    blocks while holding the lock: the bucket is allowed to go into debt and each caller
+    is told how long to wait for its own token, so waiters are served in order and
+    nobody sleeps longer than needed.
+    """
+    def __init__(self, rate, burst):
+        """ Initializes the TokenBucket class.
+
+        Args:
+            rate (float): Tokens added per second.
+            burst (int): The maximum number of tokens held, i.e. requests allowed back to back.
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Invalid token bucket rate={rate} burst={burst}")
+
+        self.rate = rate
+        self.burst = burst
+
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """ Takes a token and returns the number of seconds to wait before using it. """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """ Blocks until a token is available, returns the time waited. """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+    async def acquire_async(self):
+        """ Waits without blocking the event loop until a token is available, returns the time waited. """
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        return wait
+
+
+class RateLimiter:
+    """ RateLimiter keeps a token bucket per host.
+
+    A single limiter is shared by every thread and task fetching through a grabber.
+    """
+    def __init__(self, rate, burst):
+        """ Initializes the RateLimiter class.
+
+        Args:
+            rate (float): Requests per second allowed for each host.
+            burst (int): Requests allowed back to back for each host.
+        """
+        self.rate = rate
+        self.burst = burst
+
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """ Creates a limiter from config['rate_limit'], picking the token or anonymous quota.
+
+        Args:
+            config (dict): The configuration dictionary.
+        """
+        access = 'token' if config['wiki_api_token'] else 'anonymous'
+        settings = config['rate_limit'][access]
+
+        logger.debug(f"Rate limiting {access} access to {settings['rate']} req/s, burst {settings['burst']}.")
+
+        return cls(settings['rate'], settings['burst'])
+
+    def bucket(self, host):
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+
+            return self.buckets[host]
+
+    def acquire(self, host):
+        """ Blocks until a request to host is allowed, returns the time waited. """
+        return self.bucket(host).acquire()
+
+    async def acquire_async(self, host):
+        """ Waits until a request to host is allowed, returns the time waited. """
+        return await self.bucket(host).acquire_async()
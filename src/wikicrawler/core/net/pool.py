@@ -0,0 +1,282 @@
+import http.client
+import logging
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+from .encoding import accept_encoding, decoder
+
+
+logger = logging.getLogger(__name__)
+
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+class PooledResponse:
+    """ A response read from a pooled connection.
+
+    The body is transparently decoded according to its Content-Encoding. The connection
+    goes back to the pool once the body has been fully read or the response is closed,
+    so callers streaming the body should close it when done.
+    """
+    def __init__(self, pool, key, conn, response, url):
+        self.pool = pool
+        self.key = key
+        self.conn = conn
+        self.response = response
+        self.url = url
+
+        self.status = response.status
+        self.headers = response.headers
+        self.decoder = decoder(response.getheader('Content-Encoding'))
+        self.exhausted = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def geturl(self):
+        return self.url
+
+    def getheader(self, name, default=None):
+        return self.response.getheader(name, default)
+
+    def read(self, amt=None):
+        """ Reads and decodes up to amt bytes of the body, or all of it, b'' once exhausted. """
+        data = b''
+        while not data and not self.exhausted:
+            try:
+                raw = self.response.read(amt)
+            except (OSError, http.client.HTTPException):
+                if self.conn is not None:
+                    self.conn.close()
+                    self.conn = None
+                    self.pool._discard()
+                raise
+
+            data = self.decoder.decompress(raw)
+            if amt is None or not raw:
+                data += self.decoder.flush()
+                self.exhausted = True
+                self.close()
+                self.pool._transferred(len(raw), len(data))
+                break
+
+            self.pool._transferred(len(raw), len(data))
+
+        return data
+
+    def close(self):
+        if self.conn is None:
+            return
+
+        conn, self.conn = self.conn, None
+        if self.response.isclosed() and not self.response.will_close:
+            self.pool._release(self.key, conn)
+        else:
+            self.response.close()
+            conn.close()
+            self.pool._discard()
+
+
+class ConnectionPool:
+    """ ConnectionPool keeps HTTP/1.1 keep-alive connections open per host.
+
+    Every request checks out an idle connection to the url's host, or opens a new one,
+    so consecutive fetches skip the TCP and TLS handshakes. At most `size` idle
+    connections are kept per host and connections idle for longer than `idle_timeout`
+    seconds are closed instead of reused. It is thread-safe, so it is shared by the
+    sync grabber and the worker threads of the async grabber.
+    """
+    def __init__(self, size=4, idle_timeout=30, timeout=30):
+        """ Initializes the ConnectionPool class.
+
+        Args:
+            size (int): The maximum number of idle connections kept per host.
+            idle_timeout (float): Seconds after which an idle connection is dropped.
+            timeout (float): The socket timeout for connections.
+        """
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.ssl_context = ssl.create_default_context()
+
+        self.requests = 0
+        self.reused = 0
+        self.opened = 0
+        self.open = 0
+
+        self.bytes_on_wire = 0
+        self.bytes_decoded = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """ Closes all idle connections. """
+        with self.lock:
+            for conns in self.idle.values():
+                for conn, _ in conns:
+                    conn.close()
+                    self.open -= 1
+            self.idle = {}
+
+    def stats(self):
+        """ Returns the request, reuse and connection counters of the pool. """
+        with self.lock:
+            return {'requests': self.requests,
+                    'reused': self.reused,
+                    'opened': self.opened,
+                    'reuse_ratio': self.reused / self.requests if self.requests else 0.0,
+                    'open_connections': self.open,
+                    'idle_connections': sum(len(conns) for conns in self.idle.values()),
+                    'bytes_on_wire': self.bytes_on_wire,
+                    'bytes_decoded': self.bytes_decoded,
+                    'wire_savings': 1 - self.bytes_on_wire / self.bytes_decoded if self.bytes_decoded else 0.0}
+
+    def _connect(self, key):
+        scheme, host, port = key
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+        with self.lock:
+            self.opened += 1
+            self.open += 1
+
+        return conn
+
+    def _checkout(self, key):
+        """ Returns an idle connection for key and whether it is being reused. """
+        stale = []
+        conn = None
+
+        with self.lock:
+            conns = self.idle.get(key, [])
+            now = time.monotonic()
+            while conns:
+                candidate, last_used = conns.pop()
+                if now - last_used < self.idle_timeout:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+            self.open -= len(stale)
+
+        for candidate in stale:
+            candidate.close()
+
+        if conn is not None:
+            return conn, True
+
+        return self._connect(key), False
+
+    def _release(self, key, conn):
+        with self.lock:
+            conns = self.idle.setdefault(key, [])
+            if len(conns) < self.size:
+                conns.append((conn, time.monotonic()))
+                return
+            self.open -= 1
+
+        conn.close()
+
+    def _transferred(self, wire, decoded):
+        with self.lock:
+            self.bytes_on_wire += wire
+            self.bytes_decoded += decoded
+
+    def _discard(self):
+        with self.lock:
+            self.open -= 1
+
+    def _send(self, key, method, target, headers):
+        conn, reused = self._checkout(key)
+
+        try:
+            conn.request(method, target, headers=headers)
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._discard()
+            if not reused:
+                raise
+
+            # The server dropped the idle connection, retry once on a fresh one.
+            logger.debug(f"Stale connection to {key[1]}, reconnecting.")
+            conn, reused = self._connect(key), False
+            try:
+                conn.request(method, target, headers=headers)
+                response = conn.getresponse()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                self._discard()
+                raise
+
+        with self.lock:
+            self.requests += 1
+            if reused:
+                self.reused += 1
+
+        return conn, response
+
+    def request(self, url, headers=None, method='GET', max_redirects=10):
+        """
+        Requests a url over a pooled connection, following redirects.
+
+        Args:
+            url (str): The url to request.
+            headers (dict): Extra request headers.
+            method (str): The HTTP method.
+            max_redirects (int): The maximum number of redirects to follow.
+
+        Returns:
+            PooledResponse: The response, geturl() is the url after redirects.
+
+        Raises:
+            urllib.error.HTTPError: If the server responds with an error status.
+            urllib.error.URLError: If the connection fails.
+        """
+        headers = dict(headers or {})
+        headers.setdefault('Connection', 'keep-alive')
+        headers.setdefault('Accept-Encoding', accept_encoding())
+
+        for _ in range(max_redirects + 1):
+            parsed = urllib.parse.urlsplit(url)
+            port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+            key = (parsed.scheme, parsed.hostname, port)
+
+            target = parsed.path or '/'
+            if parsed.query:
+                target += '?' + parsed.query
+
+            try:
+                conn, response = self._send(key, method, target, headers)
+            except (OSError, http.client.HTTPException) as e:
+                raise urllib.error.URLError(e)
+
+            pooled = PooledResponse(self, key, conn, response, url)
+
+            if response.status in REDIRECT_CODES and response.getheader('Location'):
+                pooled.read()
+                url = urllib.parse.urljoin(url, response.getheader('Location'))
+                continue
+
+            if response.status >= 400:
+                pooled.read()
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+
+            return pooled
+
+        raise urllib.error.HTTPError(url, response.status, "Too many redirects", response.headers, None)
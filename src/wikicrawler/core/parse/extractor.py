@@ -0,0 +1,503 @@
+import logging
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# Tree building rules of BeautifulSoup's html.parser builder, mirrored so that the single
+# pass extractor sees exactly the tree the soup path sees.
+EMPTY_ELEMENT_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+                      'menuitem', 'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound',
+                      'command', 'frame', 'image', 'isindex', 'nextid', 'spacer'}
+STRING_CONTAINER_TAGS = {'rt', 'rp', 'style', 'script', 'template'}
+PRESERVE_WHITESPACE_TAGS = {'pre', 'textarea'}
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+# A numeric character reference and the text html.parser passed along with it.
+CHARREF_REGEX = re.compile(r'(x[0-9a-f]+|[0-9]+)(.*)', re.IGNORECASE | re.DOTALL)
+
+# String kinds, only text and cdata are part of get_text().
+TEXT, CDATA, OTHER = range(3)
+
+WIKI_BASE = "https://en.wikipedia.org"
+
+
+class _Text:
+    """ Collects the text of an element. """
+    __slots__ = ('parts',)
+
+    def __init__(self):
+        self.parts = []
+
+    def text(self):
+        return ''.join(self.parts)
+
+
+class _Anchor(_Text):
+    """ Collects the text of a link, href is None if the link has none. """
+    __slots__ = ('href',)
+
+    def __init__(self, href):
+        super().__init__()
+        self.href = href
+
+
+class _Paragraph(_Text):
+    __slots__ = ('anchors',)
+
+    def __init__(self):
+        super().__init__()
+        self.anchors = []
+
+
+class _Slot:
+    """ Holds the first matching descendant anchor of an element, e.g. li.a. """
+    __slots__ = ('anchor',)
+
+    def __init__(self):
+        self.anchor = None
+
+
+class _Element:
+    __slots__ = ('name', 'records', 'paragraph', 'item', 'ref_child', 'roles')
+
+    def __init__(self, name):
+        self.name = name
+        self.records = []
+        self.paragraph = None
+        self.item = None
+        self.ref_child = None
+        self.roles = ()
+
+
+class PageExtractor:
+    """ PageExtractor extracts everything the grabber needs from a page in one pass.
+
+    It consumes start/end/data events, from html.parser or lxml, and builds no tree.
+    The result is the same as WikiGrabber's soup based extraction of the page: title,
+    paragraphs, paragraph links, toc, see also, references and the image links.
+
+    Usage:
+        extractor = PageExtractor(url)
+        extractor.feed(html)
+        parts = extractor.close()
+    """
+    def __init__(self, page_url, tokenizer='html.parser'):
+        """ Initializes the PageExtractor class.
+
+        Args:
+            page_url (str): The url of the page after redirects, toc links are relative to it.
+            tokenizer (str): 'html.parser', or 'lxml' which is faster but does not close tags
+                             exactly like the soup path does.
+        """
+        self.page_url = page_url
+
+        self.stack = []
+        self.open_counts = {}
+        self.active = []
+        self.pending = []
+        self.containers = []
+        self.preserving = 0
+
+        # Elements found so far, each is the first match in document order like find() or select()[0].
+        self.title = None
+        self.content = None
+        self.body = None
+        self.see_also = None
+        self.references = None
+        self.toc = None
+        self.toc_ul = None
+
+        # Open elements of each kind.
+        self.open_roles = {'content': 0, 'body': 0, 'see_also': 0, 'toc': 0, 'toc_ul': 0}
+        self.open_paragraphs = []
+        self.open_items = []
+        self.open_ref_children = []
+
+        self.paragraphs = []
+        self.see_also_anchors = []
+        self.toc_items = []
+        self.ref_children = []
+        self.images = []
+
+        if tokenizer == 'lxml':
+            if etree is None:
+                raise ValueError("The lxml tokenizer requires lxml to be installed.")
+            self.tokenizer = etree.HTMLParser(target=_LxmlTarget(self))
+        elif tokenizer == 'html.parser':
+            self.tokenizer = _HTMLTokenizer(self)
+        else:
+            raise ValueError(f"Unknown tokenizer: {tokenizer}")
+
+    def feed(self, html):
+        """ Feeds a chunk of html, which may end anywhere. """
+        self.tokenizer.feed(html)
+
+    def close(self):
+        """ Finishes parsing and returns the extracted parts of the page.
+
+        Raises:
+            AttributeError: If the page has no content text or heading, like the soup path.
+        """
+        self.tokenizer.close()
+        self.flush()
+        while self.stack:
+            self._pop()
+
+        return self.result()
+
+    # tree events
+
+    def start(self, name, attrs):
+        self.flush()
+
+        element = _Element(name)
+        id_ = attrs.get('id')
+        classes = attrs['class'].split() if 'class' in attrs else ()
+        roles = []
+
+        if self.title is None and id_ == 'firstHeading':
+            self.title = _Text()
+            element.records.append(self.title)
+
+        if self.open_roles['content']:
+            if self.body is None and 'mw-parser-output' in classes:
+                self.body = True
+                roles.append('body')
+            if self.see_also is None and 'div-col' in classes:
+                self.see_also = True
+                roles.append('see_also')
+            if self.references is None and 'references' in classes:
+                self.references = element
+        elif self.content is None and id_ == 'mw-content-text':
+            self.content = True
+            roles.append('content')
+
+        if self.references is not None and self.stack and self.stack[-1] is self.references:
+            element.ref_child = _Slot()
+            self.ref_children.append(element.ref_child)
+            self.open_ref_children.append(element.ref_child)
+
+        if self.toc is None and id_ == 'toc':
+            self.toc = True
+            roles.append('toc')
+        elif self.open_roles['toc_ul'] and name == 'li':
+            element.item = _Slot()
+            self.toc_items.append(element.item)
+            self.open_items.append(element.item)
+        elif self.open_roles['toc'] and self.toc_ul is None and name == 'ul':
+            self.toc_ul = True
+            roles.append('toc_ul')
+
+        if name == 'p' and self.open_roles['body']:
+            element.paragraph = _Paragraph()
+            element.records.append(element.paragraph)
+            self.paragraphs.append(element.paragraph)
+        elif name == 'a':
+            self._anchor(element, attrs, classes)
+
+        element.roles = roles
+        for role in roles:
+            self.open_roles[role] += 1
+
+        if element.paragraph is not None:
+            self.open_paragraphs.append(element.paragraph)
+
+        self.stack.append(element)
+        self.open_counts[name] = self.open_counts.get(name, 0) + 1
+        self.active.extend(element.records)
+        if name in PRESERVE_WHITESPACE_TAGS:
+            self.preserving += 1
+        if name in STRING_CONTAINER_TAGS:
+            self.containers.append(element)
+
+    def _anchor(self, element, attrs, classes):
+        anchor = None
+
+        for paragraph in self.open_paragraphs:
+            anchor = anchor or _Anchor(attrs.get('href'))
+            paragraph.anchors.append(anchor)
+
+        for slot in self.open_items:
+            if slot.anchor is None:
+                anchor = anchor or _Anchor(attrs.get('href'))
+                slot.anchor = anchor
+
+        if 'external' in classes:
+            for slot in self.open_ref_children:
+                if slot.anchor is None:
+                    anchor = anchor or _Anchor(attrs.get('href'))
+                    slot.anchor = anchor
+
+        if self.open_roles['see_also']:
+            self.see_also_anchors.append((attrs.get('href'), attrs.get('title')))
+
+        if 'image' in classes:
+            self.images.append(attrs)
+
+        if anchor is not None:
+            element.records.append(anchor)
+
+    def end(self, name):
+        self.flush()
+
+        if not self.open_counts.get(name):
+            return
+
+        while self.stack:
+            if self._pop().name == name:
+                break
+
+    def _pop(self):
+        element = self.stack.pop()
+        self.open_counts[element.name] -= 1
+
+        if element.records:
+            del self.active[-len(element.records):]
+            # Closed records get no more text, keep one string instead of every fragment.
+            for record in element.records:
+                record.parts = [record.text()]
+        for role in element.roles:
+            self.open_roles[role] -= 1
+        if element.paragraph is not None:
+            self.open_paragraphs.remove(element.paragraph)
+        if element.item is not None:
+            self.open_items.remove(element.item)
+        if element.ref_child is not None:
+            self.open_ref_children.remove(element.ref_child)
+        if element.name in PRESERVE_WHITESPACE_TAGS:
+            self.preserving -= 1
+        if self.containers and self.containers[-1] is element:
+            self.containers.pop()
+
+        return element
+
+    def data(self, text):
+        self.pending.append(text)
+
+    def flush(self, kind=TEXT):
+        """ Ends the current string, like BeautifulSoup.endData. """
+        if not self.pending:
+            return
+
+        text = ''.join(self.pending)
+        self.pending = []
+
+        if not self.preserving and not text.strip(ASCII_SPACES):
+            text = '\n' if '\n' in text else ' '
+
+        if kind == OTHER or (kind == TEXT and self.containers):
+            return
+
+        for record in self.active:
+            record.parts.append(text)
+
+    # results
+
+    def result(self):
+        if self.content is None:
+            raise AttributeError("'NoneType' object has no attribute 'find'")
+
+        paragraphs, paragraph_links = self._paragraphs()
+
+        if self.title is None:
+            raise AttributeError("'NoneType' object has no attribute 'get_text'")
+
+        return {'title': self.title.text(),
+                'paragraphs': paragraphs,
+                'paragraph_links': paragraph_links,
+                'see_also': self._see_also(),
+                'toc_links': self._toc_links(),
+                'references': self._references(),
+                'images': self.images}
+
+    def _paragraphs(self):
+        paragraphs = []
+        paragraph_links = []
+
+        for paragraph in self.paragraphs:
+            text = paragraph.text()
+            if text != '' and text != '\n':
+                paragraphs.append(text)
+
+            if any(anchor.href is None for anchor in paragraph.anchors):
+                logger.debug("Paragraph link without href, stopping like the soup path.")
+                break
+
+            paragraph_links.append({anchor.text(): WIKI_BASE + anchor.href
+                                    for anchor in paragraph.anchors if anchor.href.startswith('/wiki')})
+
+        return paragraphs, paragraph_links
+
+    def _see_also(self):
+        see_also = {}
+
+        for href, title in self.see_also_anchors:
+            if href is None:
+                raise KeyError('href')
+
+            if href.startswith('/wiki'):
+                if title is None:
+                    logger.debug(f"No title for see also link? {href}")
+                else:
+                    see_also[title] = WIKI_BASE + href
+
+        return see_also
+
+    def _toc_links(self):
+        links = {}
+
+        for item in self.toc_items:
+            if item.anchor is None:
+                logger.debug("Missing toc?")
+                break
+
+            _, name = item.anchor.text().split(' ', 1)
+            links[name] = self.page_url + item.anchor.href
+
+        return links
+
+    def _references(self):
+        references = {}
+
+        for child in self.ref_children:
+            if child.anchor is not None:
+                if child.anchor.href is None:
+                    raise KeyError('href')
+                references[child.anchor.text()] = child.anchor.href
+
+        return references
+
+
+def _numeric_reference(number):
+    """ The character of a numeric character reference, resolved as the HTML spec and BeautifulSoup resolve it. """
+    if number == 0 or number > 0x10ffff or 0xd800 <= number <= 0xdfff:
+        return '\ufffd'
+
+    # References to C1 controls were meant as windows-1252.
+    if 0x80 <= number <= 0x9f:
+        try:
+            return bytes([number]).decode('cp1252')
+        except UnicodeDecodeError:
+            pass
+
+    return chr(number)
+
+
+class _HTMLTokenizer(HTMLParser):
+    """ Drives a PageExtractor from the standard library's html.parser, the tokenizer of the soup path.
+
+    Empty element tags and character and entity references are handled the way BeautifulSoup's
+    html.parser builder handles them, so the extractor sees the text the soup path sees.
+    """
+    def __init__(self, extractor):
+        super().__init__(convert_charrefs=False)
+        self.extractor = extractor
+        # Empty element tags closed when they opened, whose end tags are ignored if they show up.
+        self.already_closed_empty_element = []
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        attr_dict = {}
+        for key, value in attrs:
+            attr_dict[key] = '' if value is None else value
+
+        self.extractor.start(tag, attr_dict)
+
+        if handle_empty_element and tag in EMPTY_ELEMENT_TAGS:
+            self.handle_endtag(tag, check_already_closed=False)
+            self.already_closed_empty_element.append(tag)
+
+    def handle_endtag(self, tag, check_already_closed=True):
+        if check_already_closed and tag in self.already_closed_empty_element:
+            self.already_closed_empty_element.remove(tag)
+        else:
+            self.extractor.end(tag)
+
+    def handle_charref(self, name):
+        match = CHARREF_REGEX.match(name)
+        if match is None:
+            self.handle_data(name)
+            return
+
+        number, rest = match.groups()
+        self.handle_data(_numeric_reference(int(number[1:], 16) if number[0] in 'xX' else int(number)))
+        if rest:
+            self.handle_data(rest)
+
+    def handle_entityref(self, name):
+        self.handle_data(html5.get(name + ';', '&' + name))
+
+    def handle_data(self, data):
+        self.extractor.data(data)
+
+    def _typed(self, data, kind):
+        self.extractor.flush()
+        self.extractor.data(data)
+        self.extractor.flush(kind)
+
+    def handle_comment(self, data):
+        self._typed(data, OTHER)
+
+    def handle_decl(self, decl):
+        self._typed(decl, OTHER)
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self._typed(data[len('CDATA['):], CDATA)
+        else:
+            self._typed(data, OTHER)
+
+    def handle_pi(self, data):
+        self._typed(data, OTHER)
+
+
+class _LxmlTarget:
+    """ Drives a PageExtractor from lxml's parser target interface. """
+    def __init__(self, extractor):
+        self.extractor = extractor
+
+    def start(self, tag, attrib):
+        self.extractor.start(tag, dict(attrib))
+
+    def end(self, tag):
+        self.extractor.end(tag)
+
+    def data(self, data):
+        self.extractor.data(data)
+
+    def comment(self, text):
+        self.extractor.flush()
+
+    def close(self):
+        pass
+
+
+def extract(page_url, html, tokenizer='html.parser'):
+    """
+    Extracts the parts of a page in a single pass.
+
+    Args:
+        page_url (str): The url of the page after redirects.
+        html (str): The html of the page.
+        tokenizer (str): 'html.parser' or 'lxml'.
+
+    Returns:
+        dict: title, paragraphs, paragraph_links, see_also, toc_links, references and the attributes
+              of the image links.
+    """
+    extractor = PageExtractor(page_url, tokenizer=tokenizer)
+    extractor.feed(html)
+
+    return extractor.close()
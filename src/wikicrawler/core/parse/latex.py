@@ -0,0 +1,120 @@
+import hashlib
+import re
+import threading
+import time
+
+from pylatexenc.latexwalker import LatexWalker
+from pylatexenc.latex2text import LatexNodes2Text
+
+
+# Everything LatexNodes2Text changes in plain text: macros, groups, math, comments, alignment,
+# ties, dashes and the quote and inverted punctuation ligatures. Text without any of these is
+# converted to itself.
+LATEX_REGEX = re.compile(r"[\\{}$%&~]|''|``|--|[!?]`")
+
+
+def may_contain_latex(text):
+    """ Whether converting text from latex could change it. """
+    return LATEX_REGEX.search(text) is not None
+
+
+def latex_key(text):
+    """ The content hash a conversion of text is memoized under. """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class LatexConverter:
+    """ LatexConverter converts the latex in paragraphs to unicode text.
+
+    Paragraphs which can not contain latex are returned as is, and conversions are
+    memoized by the content hash of the paragraph, since boilerplate paragraphs recur
+    across pages. Conversions made since the last drain() can be persisted, e.g. with
+    WikiCacher.store_latex, and passed back in as the memo later. It is thread-safe.
+    """
+    def __init__(self, memo=None, skip_prose=True, memoize=True):
+        """ Initializes the LatexConverter class.
+
+        Args:
+            memo (dict): Known conversions by latex_key.
+            skip_prose (bool): Whether to skip paragraphs which can not contain latex.
+            memoize (bool): Whether to memoize conversions.
+        """
+        self.memo = dict(memo or {})
+        self.skip_prose = skip_prose
+        self.memoize = memoize
+
+        self.lock = threading.Lock()
+        self.new = {}
+        self.counts = dict.fromkeys(('paragraphs', 'skipped', 'memo_hits', 'converted', 'convert_seconds'), 0)
+        self.drained = dict(self.counts)
+
+    def convert(self, paragraphs):
+        """
+        Converts the latex in paragraphs to unicode text.
+
+        Args:
+            paragraphs (list): The paragraphs to convert.
+
+        Returns:
+            list: The converted paragraphs.
+        """
+        nl2t = None
+        converted = []
+        counts = dict.fromkeys(self.counts, 0)
+
+        for paragraph in paragraphs:
+            counts['paragraphs'] += 1
+
+            if self.skip_prose and not may_contain_latex(paragraph):
+                counts['skipped'] += 1
+                converted.append(paragraph)
+                continue
+
+            key = latex_key(paragraph) if self.memoize else None
+            text = self.memo.get(key) if self.memoize else None
+            if text is not None:
+                counts['memo_hits'] += 1
+                converted.append(text)
+                continue
+
+            start = time.perf_counter()
+            if nl2t is None:
+                nl2t = LatexNodes2Text().nodelist_to_text
+            text = nl2t(LatexWalker(paragraph).get_latex_nodes()[0])
+            counts['convert_seconds'] += time.perf_counter() - start
+            counts['converted'] += 1
+
+            if self.memoize:
+                with self.lock:
+                    self.memo[key] = text
+                    self.new[key] = text
+            converted.append(text)
+
+        self.merge({}, counts)
+
+        return converted
+
+    def merge(self, entries, counts):
+        """ Merges the conversions and counts drained from another converter, e.g. a worker's. """
+        with self.lock:
+            self.memo.update(entries)
+            self.new.update(entries)
+            for name, count in counts.items():
+                self.counts[name] += count
+
+    def drain(self):
+        """ Returns the conversions and counts since the last drain. """
+        with self.lock:
+            entries, self.new = self.new, {}
+            counts = {name: self.counts[name] - self.drained[name] for name in self.counts}
+            self.drained = dict(self.counts)
+
+        return entries, counts
+
+    def stats(self):
+        """ Returns how many paragraphs were skipped, found in the memo or converted. """
+        with self.lock:
+            stats = dict(self.counts)
+            stats['memo_size'] = len(self.memo)
+
+        return stats
@@ -0,0 +1,179 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from .extractor import extract
+from .latex import LatexConverter
+
+
+def build_wiki(url, parts, latex=None, links=None):
+    """
+    Builds the page dictionary from the extracted parts of a page.
+
+    Args:
+        url (str): The url the page was retrieved for.
+        parts (dict): The parts extracted from the page, see PageExtractor.
+        latex (LatexConverter): Converts the latex in the paragraphs, None to keep them as is.
+        links (LinkFilter): Filters the paragraph and see also links, None to keep them as is.
+
+    Returns:
+        dict: The page dictionary, media is None and left to the grabber.
+    """
+    paragraphs = parts['paragraphs']
+    if latex is not None:
+        paragraphs = latex.convert(paragraphs)
+
+    paragraph_links, see_also = parts['paragraph_links'], parts['see_also']
+    if links is not None:
+        paragraph_links = [links.filter(paragraph) for paragraph in paragraph_links]
+        see_also = links.filter(see_also)
+
+    # TODO: define this as a class for typing/API?
+    return {'url': url,
+            'title': parts['title'],
+            'paragraphs': paragraphs,
+            'paragraph_links': paragraph_links,
+            'see_also': see_also,
+            'toc_links': parts['toc_links'],
+            'references': parts['references'],
+            'media': None}
+
+
+def parse_page(url, html, page_url, tokenizer='html.parser', latex=None, media=False, links=None):
+    """
+    Extracts a page and converts its latex, the work done by a ParseStage worker.
+
+    Args:
+        url (str): The url the page was retrieved for.
+        html (str): The html of the page.
+        page_url (str): The url of the page after redirects.
+        tokenizer (str): 'html.parser' or 'lxml'.
+        latex (LatexConverter): Converts the latex in the paragraphs, None to keep them as is.
+        media (bool): Whether to return the hrefs of the image links.
+        links (LinkFilter): Filters the links of the page, None to keep them as is.
+
+    Returns:
+        tuple: The page dictionary and the image hrefs, which are None unless media is set.
+    """
+    parts = extract(page_url, html, tokenizer=tokenizer)
+    hrefs = [image['href'] for image in parts['images']] if media else None
+
+    return build_wiki(url, parts, latex=latex, links=links), hrefs
+
+
+# The latex converter of a worker process, seeded with the memo when the pool starts.
+_worker_latex = None
+
+
+def _init_worker(memo):
+    global _worker_latex
+    _worker_latex = LatexConverter(memo)
+
+
+def _parse_in_worker(url, html, page_url, tokenizer, latex, media, links):
+    wiki, hrefs = parse_page(url, html, page_url, tokenizer=tokenizer, latex=_worker_latex if latex else None,
+                             media=media, links=links)
+
+    # Send the new conversions back, so they are persisted and shared with the other workers.
+    return wiki, hrefs, _worker_latex.drain()
+
+
+class ParseStage:
+    """ ParseStage runs the CPU bound parsing and latex conversion of pages on worker processes.
+
+    Pages are parsed in parallel, using more than one core and keeping the calling
+    thread free. With zero workers pages are parsed in the calling thread instead.
+    Futures are returned in submission order, so results can be cached in order. Latex
+    conversions made by the workers are merged into the stage's LatexConverter.
+
+    Usage:
+        with ParseStage(4) as stage:
+            for wiki, hrefs in stage.map(pages):
+                ...
+    """
+    def __init__(self, workers=0, tokenizer='html.parser', latex=True, media=False, memo=None, links=None):
+        """ Initializes the ParseStage class.
+
+        Args:
+            workers (int): The number of worker processes, 0 parses in the calling thread.
+            tokenizer (str): 'html.parser' or 'lxml'.
+            latex (bool): Whether to convert latex in the paragraphs to unicode.
+            media (bool): Whether to return the hrefs of the image links.
+            memo (dict): Known latex conversions, see LatexConverter.
+            links (LinkFilter): Filters the links of the pages, None to keep them as is.
+        """
+        self.workers = max(0, workers)
+        self.tokenizer = tokenizer
+        self.media = media
+        self.links = links
+        self.latex = LatexConverter(memo) if latex else None
+
+        # Worker processes are only started once the first page is submitted.
+        self.executor = None
+        if self.workers:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                initargs=(memo,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    def submit(self, url, html, page_url=None):
+        """
+        Submits a page to be parsed.
+
+        Args:
+            url (str): The url the page was retrieved for.
+            html (str): The html of the page.
+            page_url (str): The url of the page after redirects, defaults to url.
+
+        Returns:
+            concurrent.futures.Future: The future of the page dictionary and image hrefs, see parse_page.
+        """
+        if page_url is None:
+            page_url = url
+
+        future = Future()
+
+        if self.executor is None:
+            try:
+                future.set_result(parse_page(url, html, page_url, tokenizer=self.tokenizer, latex=self.latex,
+                                             media=self.media, links=self.links))
+            except Exception as e:
+                future.set_exception(e)
+
+            return future
+
+        def done(worker_future):
+            try:
+                wiki, hrefs, (entries, counts) = worker_future.result()
+            except Exception as e:
+                future.set_exception(e)
+                return
+
+            if self.latex is not None:
+                self.latex.merge(entries, counts)
+            future.set_result((wiki, hrefs))
+
+        self.executor.submit(_parse_in_worker, url, html, page_url, self.tokenizer, self.latex is not None,
+                             self.media, self.links).add_done_callback(done)
+
+        return future
+
+    def map(self, pages):
+        """
+        Parses several pages in parallel.
+
+        Args:
+            pages (iterable): (url, html) or (url, html, page_url) tuples.
+
+        Returns:
+            generator: The results of parse_page in the order of pages.
+        """
+        futures = [self.submit(*page) for page in pages]
+        for future in futures:
+            yield future.result()
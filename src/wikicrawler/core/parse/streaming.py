@@ -0,0 +1,52 @@
+import codecs
+import http.client
+import logging
+import urllib.error
+
+from .extractor import PageExtractor
+
+
+logger = logging.getLogger(__name__)
+
+
+def stream_extract(response, page_url, tokenizer='html.parser', chunk_size=16384, keep_html=False):
+    """
+    Extracts the parts of a page while its body is read, see PageExtractor.
+
+    The body is decoded and tokenized chunk by chunk, so neither the html nor a tree of
+    the page is held in memory unless keep_html is set.
+
+    Args:
+        response: A response with read(amt), e.g. a PooledResponse.
+        page_url (str): The url of the page after redirects.
+        tokenizer (str): 'html.parser' or 'lxml'.
+        chunk_size (int): The number of bytes read at once.
+        keep_html (bool): Whether to also return the whole html, e.g. to store it.
+
+    Returns:
+        tuple: The extracted parts and the html, which is None unless keep_html is set.
+
+    Raises:
+        urllib.error.URLError: If reading the body fails.
+        AttributeError: If the page is not a wiki page.
+    """
+    extractor = PageExtractor(page_url, tokenizer=tokenizer)
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = [] if keep_html else None
+
+    try:
+        while True:
+            data = response.read(chunk_size)
+            text = decoder.decode(data, final=not data)
+            if text:
+                extractor.feed(text)
+                if keep_html:
+                    chunks.append(text)
+            if not data:
+                break
+    except (OSError, http.client.HTTPException) as e:
+        raise urllib.error.URLError(e)
+
+    html = ''.join(chunks) if keep_html else None
+
+    return extractor.close(), html
@@ -0,0 +1,98 @@
+import re
+import urllib.parse
+
+from .wikitext import URL_SAFE
+
+
+_MOBILE_HOST = re.compile(r'\.m\.(wikipedia\.org)$')
+
+
+def canonical_url(url):
+    """
+    The canonical form of a wikipedia page url, which the many forms of a link to the same page share.
+
+    The scheme is https, mobile hosts are the desktop host, the fragment is dropped, and the title
+    is escaped like the hrefs of a rendered page, with underscores for spaces and its first letter
+    uppercased. title_url builds urls in this form already.
+
+    Usage:
+        canonical_url("http://en.m.wikipedia.org/wiki/solar%20System#Formation")
+        -> "https://en.wikipedia.org/wiki/Solar_System"
+
+    Args:
+        url (str): The url of a page.
+
+    Returns:
+        str: Its canonical form, urls which are not wikipedia pages are only stripped of their fragment.
+    """
+    parts = urllib.parse.urlsplit(url)
+    host = _MOBILE_HOST.sub(r'.\1', parts.netloc.lower())
+    if not host.endswith('wikipedia.org') or not parts.path.startswith('/wiki/'):
+        return urllib.parse.urlunsplit(parts._replace(fragment=''))
+
+    title = urllib.parse.unquote(parts.path[len('/wiki/'):])
+    title = re.sub(r'[ _]+', '_', title.strip(' _'))
+    title = title[:1].upper() + title[1:]
+
+    return urllib.parse.urlunsplit(('https', host, '/wiki/' + urllib.parse.quote(title, safe=URL_SAFE),
+                                    parts.query, ''))
+
+
+# Namespaces whose pages are not articles. Links into them are dropped and they are never fetched.
+EXCLUDED_NAMESPACES = ('Talk', 'User', 'User talk', 'Wikipedia', 'Wikipedia talk', 'WP', 'Project', 'File',
+                       'File talk', 'Image', 'Media', 'MediaWiki', 'MediaWiki talk', 'Template', 'Template talk',
+                       'Help', 'Help talk', 'Category', 'Category talk', 'Portal', 'Portal talk', 'Draft',
+                       'Draft talk', 'TimedText', 'TimedText talk', 'Module', 'Module talk', 'Special')
+
+
+class LinkFilter:
+    """ LinkFilter canonicalizes the links of pages and rejects pages outside the article namespace.
+
+    The excluded namespaces are compiled into a single pattern, matched against the canonical
+    form of a url, so escaped or mobile forms of a Help: link are rejected all the same. The
+    grabber applies it to the links of every page as it is extracted, and refuses to fetch the
+    urls it rejects.
+
+    Usage:
+        links = LinkFilter(namespaces=('Help', 'Talk'))
+        links.allowed("https://en.wikipedia.org/wiki/Help:Contents")  # False
+        links.filter({'sun': "https://en.m.wikipedia.org/wiki/sun"})  # {'sun': "https://en.wikipedia.org/wiki/Sun"}
+    """
+    def __init__(self, namespaces=EXCLUDED_NAMESPACES, canonicalize=True):
+        """ Initializes the LinkFilter class.
+
+        Args:
+            namespaces (list): The namespaces to reject, e.g. 'Help' or 'User talk'.
+            canonicalize (bool): Whether filter returns the canonical form of the links, see canonical_url.
+        """
+        self.canonicalize = canonicalize
+        self.excluded = None
+        if namespaces:
+            names = '|'.join(re.escape(ns.strip()).replace(r'\ ', '_') for ns in namespaces)
+            self.excluded = re.compile(r'^https://[^/]*wikipedia\.org/wiki/(?:%s):' % names, re.I)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['excluded_namespaces'], config['canonicalize_links'])
+
+    def allowed(self, url):
+        """ Whether url is not in an excluded namespace. """
+        return self.excluded is None or not self.excluded.match(canonical_url(url))
+
+    def filter(self, links):
+        """
+        Drops the links into excluded namespaces.
+
+        Args:
+            links (dict): Urls by link text.
+
+        Returns:
+            dict: The allowed links by link text, in their canonical form if self.canonicalize is set.
+        """
+        filtered = {}
+        for text, url in links.items():
+            canonical = canonical_url(url)
+            if self.excluded is None or not self.excluded.match(canonical):
+                filtered[text] = canonical if self.canonicalize else url
+
+        return filtered
@@ -0,0 +1,243 @@
+import html
+import logging
+import re
+import urllib.parse
+
+from .extractor import WIKI_BASE
+
+
+logger = logging.getLogger(__name__)
+
+
+# Characters MediaWiki leaves unescaped in the hrefs of its page links.
+URL_SAFE = ";@$!*(),/~:"
+
+# Interwiki prefixes whose links are shown as text but do not lead to a page of the wiki.
+INTERWIKI = {'wikt', 'wiktionary', 'commons', 'c', 'w', 'wikipedia', 's', 'wikisource', 'q', 'wikiquote',
+             'b', 'wikibooks', 'n', 'wikinews', 'v', 'wikiversity', 'voy', 'wikivoyage', 'species',
+             'wikispecies', 'd', 'wikidata', 'm', 'meta', 'mw', 'mediawiki', 'foundation', 'wmf', 'phab'}
+
+# Tags whose content is never part of the article's text.
+DROPPED_TAGS = ('gallery', 'timeline', 'score', 'imagemap', 'templatedata', 'graph', 'mapframe', 'includeonly',
+                'syntaxhighlight', 'source')
+
+_COMMENT = re.compile(r'<!--.*?(?:-->|$)', re.S)
+_DROPPED = re.compile(r'<(%s)\b[^>]*>.*?</\1\s*>' % '|'.join(DROPPED_TAGS), re.S | re.I)
+_REF = re.compile(r'<ref\b[^>/]*(?:/>|>(.*?)</ref\s*>)', re.S | re.I)
+_TAG = re.compile(r'</?[a-zA-Z][^<>]*>')
+_MAGIC = re.compile(r'__[A-Z]+__')
+
+_TEMPLATE_TOKENS = re.compile(r'(?P<open>\{\{)|(?P<close>\}\})')
+_TABLE_TOKENS = re.compile(r'(?m)^[ \t:]*(?P<open>\{\|)|^[ \t]*(?P<close>\|\})')
+_LINK_TOKENS = re.compile(r'(?P<open>\[\[)|(?P<close>\]\])')
+_FILE_LINK = re.compile(r'[ \t]*(?:file|image)[ \t]*:([^|\]]*)', re.I)
+
+_HEADING = re.compile(r'^(={2,6})(.+?)\1$')
+_LINK = re.compile(r"\[\[([^\[\]|]*)(?:\|([^\[\]]*))?\]\]([a-z]*)")
+_EXTERNAL = re.compile(r'\[((?:https?:)?//[^\s\]]+)(?:\s+([^\]]*))?\]')
+_BARE_URL = re.compile(r'https?://[^\s|}\]<]+')
+_CITE_URL = re.compile(r'\|\s*url\s*=\s*([^\s|}]+)')
+_CITE_TITLE = re.compile(r'\|\s*title\s*=\s*([^|}]*)')
+_FORMATTING = re.compile(r"'{2,}")
+_LANGUAGE = re.compile(r'[a-z]{2,3}(?:-[a-z]+)*')
+
+
+def title_url(title, fragment=None):
+    """ The url of a page from its title, escaped like the hrefs of a rendered page. """
+    title = re.sub(r'[ _]+', '_', title.strip())
+    title = title[:1].upper() + title[1:]
+
+    url = WIKI_BASE + '/wiki/' + urllib.parse.quote(title, safe=URL_SAFE)
+    if fragment:
+        url += '#' + urllib.parse.quote(fragment.strip().replace(' ', '_'), safe=URL_SAFE)
+
+    return url
+
+
+def extract_wikitext(page_url, title, wikitext):
+    """
+    Extracts the parts of a page from its wikitext, like PageExtractor does from its html.
+
+    Templates, tables and citation markers are not expanded, so the paragraphs are the
+    article's prose only. Links, see also, toc and references come from the markup.
+
+    Args:
+        page_url (str): The url of the page, toc links are relative to it.
+        title (str): The title of the page.
+        wikitext (str): The source of the page.
+
+    Returns:
+        dict: title, paragraphs, paragraph_links, see_also, toc_links, references and the hrefs
+              of the embedded files, see PageExtractor.result.
+    """
+    text = _COMMENT.sub('', wikitext)
+    text = _DROPPED.sub('', text)
+
+    references = {}
+    text = _REF.sub(lambda match: _reference(match.group(1), references), text)
+
+    text, _ = _strip_nested(text, _TEMPLATE_TOKENS)
+    text, _ = _strip_nested(text, _TABLE_TOKENS)
+    text, files = _strip_nested(text, _LINK_TOKENS, outermost=_FILE_LINK)
+
+    text = _MAGIC.sub('', text)
+    text = _TAG.sub('', text)
+
+    images = []
+    for span in files:
+        name = _FILE_LINK.match(span, 2).group(1).strip()
+        if name:
+            images.append({'href': '/wiki/' + urllib.parse.quote('File:' + name.replace(' ', '_'), safe=URL_SAFE)})
+
+    paragraphs = []
+    paragraph_links = []
+    see_also = {}
+    toc_links = {}
+
+    section = None
+    lines = []
+
+    def flush():
+        if lines:
+            links = {}
+            paragraph = _inline('\n'.join(lines), links).strip()
+            if paragraph:
+                paragraphs.append(paragraph + '\n')
+                paragraph_links.append(links)
+            lines.clear()
+
+    for line in text.split('\n'):
+        line = line.strip()
+
+        heading = _HEADING.match(line)
+        if heading is not None:
+            flush()
+            name = _inline(heading.group(2)).strip()
+            toc_links[name] = page_url + '#' + name.replace(' ', '_')
+            section = name.lower()
+        elif not line or line[0] in '*#:;' or line.startswith('----'):
+            flush()
+            if section == 'see also' and line[:1] in '*#':
+                targets = []
+                _inline(line, targets=targets)
+                see_also.update(targets)
+        else:
+            lines.append(line)
+    flush()
+
+    return {'title': title,
+            'paragraphs': paragraphs,
+            'paragraph_links': paragraph_links,
+            'see_also': see_also,
+            'toc_links': toc_links,
+            'references': references,
+            'images': images}
+
+
+def _strip_nested(text, tokens, outermost=None):
+    """
+    Removes the balanced spans between the open and close groups of tokens.
+
+    Args:
+        text (str): The text to strip.
+        tokens (re.Pattern): Matches an open or a close group.
+        outermost (re.Pattern): If given, only outermost spans whose open token is followed by a
+                                match are removed, e.g. [[File: but not [[.
+
+    Returns:
+        tuple: The stripped text and the removed spans. An unclosed span is kept.
+    """
+    kept = []
+    spans = []
+    depth = 0
+    start = 0
+    for match in tokens.finditer(text):
+        if match.group('open') is not None:
+            if depth == 0:
+                if outermost is not None and outermost.match(text, match.end()) is None:
+                    continue
+                kept.append(text[start:match.start('open')])
+                start = match.start('open')
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                spans.append(text[start:match.end()])
+                start = match.end()
+    kept.append(text[start:])
+
+    return ''.join(kept), spans
+
+
+def _reference(content, references):
+    """ Records the link of a <ref>, removing it from the text. """
+    if not content:
+        return ''
+
+    match = _EXTERNAL.search(content)
+    if match is not None:
+        references[_plain(match.group(2) or match.group(1))] = match.group(1)
+        return ''
+
+    url = _CITE_URL.search(content) or _BARE_URL.search(content)
+    if url is not None:
+        url = url.group(1) if url.re is _CITE_URL else url.group()
+        title = _CITE_TITLE.search(content)
+        references[_plain(title.group(1)) if title is not None else url] = url
+
+    return ''
+
+
+def _plain(text):
+    return html.unescape(_FORMATTING.sub('', _LINK.sub(lambda match: match.group(2) or match.group(1), text))).strip()
+
+
+def _inline(text, links=None, targets=None):
+    """
+    Renders the inline markup of a line or paragraph as text.
+
+    Args:
+        text (str): The markup.
+        links (dict): Collects the page links by their text.
+        targets (list): Collects the page links as (title, url), like the title attributes of see also links.
+    """
+    def link(match):
+        target, label, trail = match.group(1).strip(), match.group(2), match.group(3)
+
+        colon = target.startswith(':')
+        if colon:
+            target = target[1:].lstrip()
+
+        prefix, sep, _ = target.partition(':')
+        if sep and not colon:
+            if prefix.strip().lower() == 'category' or _LANGUAGE.fullmatch(prefix):
+                return ''
+
+        if label is None:
+            shown = target
+        elif label.strip() == '':
+            shown = re.sub(r'\s*\(.*\)$', '', target.partition(':')[2] if sep else target)
+        else:
+            shown = label
+        shown = html.unescape(_FORMATTING.sub('', shown)) + trail
+
+        title, _, fragment = target.partition('#')
+        if title.strip() and not (sep and prefix.strip().lower() in INTERWIKI):
+            url = title_url(title, fragment)
+            if links is not None:
+                links[shown] = url
+            if targets is not None:
+                targets.append((_title(title), url))
+
+        return shown
+
+    text = _LINK.sub(link, text)
+    text = _EXTERNAL.sub(lambda match: match.group(2) or '', text)
+    text = _FORMATTING.sub('', text)
+
+    return html.unescape(text)
+
+
+def _title(title):
+    title = re.sub(r'[ _]+', ' ', title.strip())
+    return title[:1].upper() + title[1:]
@@ -0,0 +1,214 @@
+import collections
+import logging
+import time
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+from .api_grabber import ApiWikiGrabber
+from .db.graph import page_links
+from .net.api import BATCH_SIZE
+from .parse.urls import canonical_url
+
+
+logger = logging.getLogger(__name__)
+
+
+class PathFinder:
+    """ PathFinder finds a shortest chain of links from one page to another by bidirectional breadth first search.
+
+    One tree of pages grows forward from the start along their links and one backward from the
+    goal along the pages linking to them, a level at a time, on the side with the smaller frontier.
+    The search stops at the first page found by both trees, which lies on a shortest path: while
+    the trees are apart every path is longer than their depths together.
+
+    Links are read from the cache's LinkGraph first. Pages which are not cached are retrieved
+    BATCH_SIZE at a time, concurrently, and cached, so each batch is checked for a meeting
+    before the next one is fetched. Backwards, the pages linking to a page are the cached pages
+    which do, and up to `backlinks` more listed by the api, `workers` pages at a time. Without
+    them the backward tree only holds cached pages, and the forward one grows until it reaches it.
+
+    With bidirectional False only the forward tree grows, until it finds the goal, which is
+    the plain breadth first search to compare against.
+
+    Usage:
+        finder = PathFinder(crawler)
+        path = finder.find(WIKI + 'Sun', WIKI + 'Bread')
+        print(finder.stats())
+    """
+    def __init__(self, crawler, max_depth=6, max_pages=1000, backlinks=500, workers=4):
+        """ Initializes the PathFinder class.
+
+        Args:
+            crawler (WikiGrabber): The grabber used to retrieve and cache pages.
+            max_depth (int): The most links on a path.
+            max_pages (int): The most pages retrieved or asked for their backlinks during a search.
+            backlinks (int): The most pages linking to a page asked from the api, 0 to only use the cache.
+            workers (int): The number of backlinks requests made concurrently.
+        """
+        self.crawler = crawler
+        self.graph = crawler.cacher.graph if crawler.cacher is not None else None
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.backlinks = backlinks
+        self.workers = max(1, workers)
+
+        self.api = None
+        if backlinks:
+            self.api = crawler.api or ApiWikiGrabber(crawler, mode='query')
+
+        self.counts = collections.Counter()
+        self.seconds = 0.0
+        # The url of the page each redirect retrieved during a search led to.
+        self.redirects = {}
+
+    def find(self, start, goal, bidirectional=True):
+        """
+        Finds a shortest path of links from start to goal.
+
+        Args:
+            start (str): The url of the page to start from.
+            goal (str): The url of the page to reach.
+            bidirectional (bool): Whether to search from both ends, see PathFinder.
+
+        Returns:
+            list: The urls of the pages on the path, start and goal included, None if there is
+                  none within max_depth links and max_pages pages.
+
+        Raises:
+            ValueError: If start or goal could not be retrieved.
+        """
+        began = time.perf_counter()
+        self.counts = collections.Counter()
+        self.redirects = {}
+        try:
+            return self.__search(self.__page_url(start), self.__page_url(goal), bidirectional)
+        finally:
+            self.seconds = time.perf_counter() - began
+
+    def stats(self):
+        """ Returns what the last search took: the pages expanded, retrieved and asked for their backlinks, and its time. """
+        return {'expanded': self.counts['expanded'], 'forward': self.counts['forward'],
+                'backward': self.counts['backward'], 'retrieved': self.counts['retrieved'],
+                'backlinks': self.counts['backlinks'], 'seconds': self.seconds}
+
+    def __page_url(self, url):
+        """ The canonical url of the page a url leads to, retrieving it if it is not cached. """
+        if self.crawler.cacher is not None and url in self.crawler.cacher:
+            return canonical_url(self.crawler.cacher.resolve(url))
+
+        page = self.crawler.retrieve_many([url])[0]
+        if page is None:
+            raise ValueError(f"Could not retrieve {url}.")
+
+        return canonical_url(page['url'])
+
+    def __search(self, start, goal, bidirectional):
+        # Each tree maps its pages to the next page towards its root.
+        parents = {start: None}
+        children = {goal: None}
+        forward = [start]
+        backward = [goal]
+        meeting = start if start == goal else None
+
+        depth = 0
+        while meeting is None and forward and depth < self.max_depth and not self.__exhausted():
+            depth += 1
+            if bidirectional and backward and len(backward) < len(forward):
+                backward, meeting = self.__level(backward, children, parents, self.__in_links, 'backward')
+            else:
+                forward, meeting = self.__level(forward, parents, children, self.__out_links, 'forward')
+
+        if meeting is None:
+            return None
+
+        path = []
+        url = meeting
+        while url is not None:
+            path.append(url)
+            url = parents[url]
+        path.reverse()
+
+        url = children[meeting]
+        while url is not None:
+            path.append(url)
+            url = children[url]
+
+        return path
+
+    def __level(self, frontier, tree, other, neighbours, side):
+        """ Grows a tree by a level, returns the next frontier and the first page in the other tree, if any. """
+        found = []
+        expanded = set()
+        try:
+            for url, links in neighbours(frontier):
+                expanded.add(url)
+
+                # A redirect stands for the page it led to, which may be in the other tree already.
+                page = self.redirects.get(url)
+                if page is not None and page not in tree:
+                    tree[page] = tree[url]
+                    if page in other:
+                        return found, page
+                    url = page
+
+                for link in links:
+                    if link not in tree and self.crawler.links.allowed(link):
+                        tree[link] = url
+                        found.append(link)
+                        if link in other:
+                            return found, link
+        finally:
+            self.counts['expanded'] += len(expanded)
+            self.counts[side] += len(expanded)
+
+        return found, None
+
+    def __exhausted(self):
+        return self.counts['retrieved'] + self.counts['backlinks'] >= self.max_pages
+
+    def __out_links(self, frontier):
+        """ Yields the (url, links) of the pages of a frontier, the cached ones first. """
+        missing = []
+        for url in frontier:
+            links = self.graph.out_links(url) if self.graph is not None else []
+            if links:
+                yield url, links
+            else:
+                missing.append(url)
+
+        for i in range(0, len(missing), BATCH_SIZE):
+            if self.__exhausted():
+                return
+
+            batch = missing[i:i + BATCH_SIZE]
+            self.counts['retrieved'] += len(batch)
+            for url, page in zip(batch, self.crawler.retrieve_many(batch)):
+                if page is not None:
+                    if canonical_url(page['url']) != url:
+                        self.redirects[url] = canonical_url(page['url'])
+                    yield url, page_links(page)
+
+    def __in_links(self, frontier):
+        """ Yields the (url, links) of the pages linking to those of a frontier, the cached ones first. """
+        if self.graph is not None:
+            for url in frontier:
+                yield url, self.graph.in_links(url)
+
+        if self.api is None:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='path') as executor:
+            for i in range(0, len(frontier), self.workers):
+                if self.__exhausted():
+                    return
+
+                batch = frontier[i:i + self.workers]
+                self.counts['backlinks'] += len(batch)
+                yield from zip(batch, executor.map(self.__backlinks, batch))
+
+    def __backlinks(self, url):
+        try:
+            return [canonical_url(link) for link in self.api.backlinks(url, self.backlinks)]
+        except (ValueError, urllib.error.URLError) as e:
+            logger.debug(f"Failed to list the backlinks of {url}.", exc_info=e)
+            return []
@@ -0,0 +1,209 @@
+import collections
+import itertools
+import logging
+import queue
+import threading
+from concurrent.futures import CancelledError, Future
+
+
+logger = logging.getLogger(__name__)
+
+
+class PageFuture(Future):
+    """ A page being prefetched. Calling it returns the page, waiting for it if it is not fetched yet,
+    so it can stand in for the partials WikiSeeker.search returns otherwise.
+    """
+    def __init__(self, prefetcher, url):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.url = url
+        self.html = None
+
+    def __call__(self):
+        return self.prefetcher.get(self)
+
+
+class Prefetcher:
+    """ Prefetcher retrieves pages in the background on a pool of worker threads.
+
+    Pages are returned as PageFutures straight away and fetched in order of priority:
+    the first `priority` pages of each submission before the rest, and a page someone
+    is waiting for before any other. cancel() drops the pages which have not started,
+    e.g. when a new search makes them moot.
+
+    Workers only fetch and extract pages. They are cached from the thread which owns
+    the cacher, by get() and poll().
+
+    Usage:
+        prefetcher = Prefetcher(grabber, workers=4, priority=3)
+        futures = prefetcher.submit(urls)
+        page = futures[0]()
+    """
+    def __init__(self, grabber, workers=4, priority=3):
+        """ Initializes the Prefetcher class.
+
+        Args:
+            grabber (WikiGrabber): The grabber used to fetch, extract and cache pages.
+            workers (int): The number of worker threads, started on the first submission.
+            priority (int): The number of pages at the start of each submission fetched first.
+        """
+        self.grabber = grabber
+        self.workers = max(1, workers)
+        self.priority = priority
+
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.threads = []
+
+        self.lock = threading.Lock()
+        # url -> PageFuture, for pages which are not cached yet.
+        self.futures = {}
+        self.fetched = []
+        self.counts = collections.Counter()
+
+    def start(self):
+        if self.threads:
+            return
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.__work, name=f"prefetch-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def close(self):
+        """ Cancels the pages which have not started and stops the workers. """
+        self.cancel()
+        for _ in self.threads:
+            self.queue.put((-2, next(self.order), None))
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def submit(self, urls):
+        """
+        Queues pages to be prefetched.
+
+        Args:
+            urls (list): The urls of the pages, the first self.priority of them are fetched first.
+
+        Returns:
+            list: A PageFuture for each url. The result of a future for a page which was already
+                  cached is None, calling it retrieves the page from the cache.
+        """
+        self.start()
+
+        futures = []
+        for i, url in enumerate(urls):
+            with self.lock:
+                future = self.futures.get(url)
+                if future is not None and not future.cancelled():
+                    futures.append(future)
+                    continue
+
+            future = PageFuture(self, url)
+            if self.grabber.cacher is not None and url in self.grabber.cacher:
+                future.set_result(None)
+            else:
+                with self.lock:
+                    self.futures[url] = future
+                    self.counts['submitted'] += 1
+                self.queue.put((0 if i < self.priority else 1, next(self.order), future))
+            futures.append(future)
+
+        return futures
+
+    def cancel(self):
+        """ Cancels the pages which have not started, pages being fetched are still cached. Returns how many. """
+        with self.lock:
+            futures = list(self.futures.values())
+
+        cancelled = [future for future in futures if future.cancel()]
+
+        with self.lock:
+            for future in cancelled:
+                if self.futures.get(future.url) is future:
+                    del self.futures[future.url]
+            self.counts['cancelled'] += len(cancelled)
+
+        return len(cancelled)
+
+    def pending(self, url):
+        """ Returns the PageFuture of a page which is being prefetched and not cached yet, or None. """
+        with self.lock:
+            future = self.futures.get(url)
+
+        if future is None or future.cancelled():
+            return None
+        return future
+
+    def get(self, future):
+        """
+        Returns the page of a PageFuture, waiting for it if needed, and caches what has been fetched.
+
+        Pages which were cancelled, or already cached, are retrieved through the grabber instead.
+
+        Raises:
+            ValueError: If the url is not a wikipedia url.
+            AttributeError: If the page could not be fetched or is not a wiki page.
+        """
+        with self.lock:
+            self.counts['ready' if future.done() else 'waited'] += 1
+        if not future.done():
+            # Jump the queue, unless it has started already.
+            self.queue.put((-1, next(self.order), future))
+
+        try:
+            wiki = future.result()
+        except CancelledError:
+            wiki = None
+        finally:
+            self.poll()
+
+        if wiki is None:
+            return self.grabber.retrieve(future.url)
+        return wiki
+
+    def poll(self):
+        """ Caches the pages fetched since the last poll, call it from the cacher's thread. """
+        with self.lock:
+            fetched, self.fetched = self.fetched, []
+
+        for future in fetched:
+            self.grabber.cache(future.result(), future.html)
+            future.html = None
+
+            with self.lock:
+                if self.futures.get(future.url) is future:
+                    del self.futures[future.url]
+
+    def __work(self):
+        while True:
+            _, _, future = self.queue.get()
+            if future is None:
+                break
+
+            with self.lock:
+                # A page moved up the queue is in it twice.
+                if future.running() or future.done() or not future.set_running_or_notify_cancel():
+                    continue
+
+            try:
+                wiki, future.html = self.grabber.fetch_extract(future.url)
+            except Exception as e:
+                logger.debug(f"Failed to prefetch {future.url}.", exc_info=e)
+                with self.lock:
+                    self.counts['failed'] += 1
+                    if self.futures.get(future.url) is future:
+                        del self.futures[future.url]
+                future.set_exception(e)
+                continue
+
+            with self.lock:
+                self.counts['fetched'] += 1
+                self.fetched.append(future)
+            future.set_result(wiki)
+
+    def stats(self):
+        """ Returns the pages submitted, fetched, failed and cancelled, and how many were ready when asked for. """
+        with self.lock:
+            return {key: self.counts[key] for key in ('submitted', 'fetched', 'failed', 'cancelled', 'ready', 'waited')}
@@ -0,0 +1,157 @@
+import collections
+import logging
+import time
+
+import numpy as np
+import scipy.sparse
+
+
+logger = logging.getLogger(__name__)
+
+
+def transition(offsets, in_offsets, in_sources):
+    """
+    The transpose of the link matrix of a graph, each page's links weighted by one over their number.
+
+    Args:
+        offsets (np.ndarray): The offsets of the out-links of the pages, see LinkGraph.csr.
+        in_offsets (np.ndarray): The offsets of the in-links of the pages, see LinkGraph.in_csr.
+        in_sources (np.ndarray): The pages each page is linked from.
+
+    Returns:
+        tuple: The matrix in CSR form, so a step of the walk is matrix @ ranks, and a mask of the pages without links.
+    """
+    n = len(offsets) - 1
+    degrees = np.diff(offsets)
+    weights = (1.0 / np.maximum(degrees, 1))[in_sources]
+
+    return scipy.sparse.csr_matrix((weights, in_sources, in_offsets), shape=(n, n)), degrees == 0
+
+
+def pagerank(matrix, dangling, damping=0.85, personalization=None, start=None, tol=1e-6, max_iter=100):
+    """
+    PageRank by power iteration, the share of a random walk's time spent on each page.
+
+    The walk follows a random link of its page with probability damping, otherwise, and from
+    pages without links, it jumps to a page drawn from personalization.
+
+    Args:
+        matrix (scipy.sparse.csr_matrix): The transposed link matrix, see transition.
+        dangling (np.ndarray): The mask of the pages without links.
+        damping (float): The probability of following a link.
+        personalization (np.ndarray): The weights of the pages jumped to, all pages alike if None.
+        start (np.ndarray): The ranks to start from, e.g. those of the graph before pages were added.
+        tol (float): The L1 change of the ranks under which they have converged.
+        max_iter (int): The most iterations.
+
+    Returns:
+        tuple: The ranks of the pages, summing to one, and the number of iterations.
+    """
+    n = matrix.shape[0]
+    if personalization is None:
+        jump = np.full(n, 1.0 / n)
+    else:
+        jump = personalization / personalization.sum()
+
+    ranks = jump.copy() if start is None else start / start.sum()
+    for iteration in range(1, max_iter + 1):
+        previous = ranks
+        ranks = damping * (matrix @ previous)
+        ranks += (damping * previous[dangling].sum() + 1.0 - damping) * jump
+        if np.abs(ranks - previous).sum() < tol:
+            break
+    else:
+        logger.warning(f"PageRank did not converge to {tol} in {max_iter} iterations.")
+
+    return ranks, iteration
+
+
+class PageRanker:
+    """ PageRanker ranks the pages of a LinkGraph by PageRank, and by personalized PageRank around some pages.
+
+    Ranks are computed again only once the graph changed, starting from the ranks it had
+    before, so adding a few pages takes a few iterations rather than a full computation.
+    The ranks of the last few personalizations are kept.
+
+    Usage:
+        ranker = PageRanker(cacher.graph)
+        ranks = ranker.ranks()
+        near = ranker.ranks(around=[graph.id(url)])
+        ranker.top(near, graph.out_ids(graph.id(url)), n=10)
+    """
+    def __init__(self, graph, damping=0.85, tol=1e-6, keep=8):
+        """ Initializes the PageRanker class.
+
+        Args:
+            graph (LinkGraph): The graph to rank.
+            damping (float): The probability of following a link, see pagerank.
+            tol (float): The L1 change of the ranks under which they have converged.
+            keep (int): The number of personalizations whose ranks are kept.
+        """
+        self.graph = graph
+        self.damping = damping
+        self.tol = tol
+        self.keep = keep
+
+        self.version = None
+        self.matrix = None
+        self.dangling = None
+        # (graph version, ranks) by the sorted ids of a personalization, () for plain PageRank.
+        self.cache = collections.OrderedDict()
+        self.last = {}
+
+    def __update(self):
+        if self.version == self.graph.version and self.matrix is not None:
+            return
+
+        offsets, _ = self.graph.csr()
+        in_offsets, in_sources = self.graph.in_csr()
+        self.matrix, self.dangling = transition(offsets, in_offsets, in_sources)
+        self.version = self.graph.version
+
+    def ranks(self, around=None):
+        """
+        Returns the ranks of every page of the graph, by their id.
+
+        Args:
+            around (list): Ids of pages to personalize the ranks around, the walk jumps back to them.
+        """
+        self.__update()
+        key = tuple(sorted({self.graph.resolve(i) for i in around})) if around else ()
+        version, ranks = self.cache.get(key, (None, None))
+        if version == self.version:
+            self.cache.move_to_end(key)
+            return ranks
+
+        n = self.matrix.shape[0]
+        start = None
+        if ranks is not None:
+            # The pages added since start from the rank of a page no one links to.
+            start = np.concatenate([ranks, np.full(n - len(ranks), (1.0 - self.damping) / n)])
+
+        personalization = None
+        if key:
+            personalization = np.zeros(n)
+            personalization[list(key)] = 1.0
+
+        begin = time.perf_counter()
+        ranks, iterations = pagerank(self.matrix, self.dangling, self.damping, personalization, start, self.tol)
+        self.last = {'nodes': n, 'edges': self.matrix.nnz, 'iterations': iterations, 'warm': start is not None,
+                     'seconds': time.perf_counter() - begin}
+
+        self.cache[key] = (self.version, ranks)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.keep:
+            self.cache.popitem(last=False)
+
+        return ranks
+
+    @staticmethod
+    def top(ranks, ids, n=10, exclude=()):
+        """ Returns the n (id, rank) of ids with the highest ranks, without the ids in exclude. """
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(exclude):
+            ids = ids[~np.isin(ids, np.fromiter(exclude, dtype=np.int64))]
+
+        best = ids[np.argsort(-ranks[ids], kind='stable')[:n]]
+        return [(int(i), float(ranks[i])) for i in best]
@@ -1,5 +1,8 @@
+import collections
+import logging
 import os
 import re
+import time
 
 from functools import partial
 import urllib.request
@@ -8,14 +11,55 @@ import bs4
 from bs4 import BeautifulSoup as bs
 
 from .grabber import WikiGrabber
+from .prefetch import Prefetcher
 from .db.cacher import WikiCacher
 
 
+logger = logging.getLogger(__name__)
+
+
 lang_code = "en"
 base_url = f"https://{lang_code}.wikipedia.org"
 
 
+def normalize_phrase(phrase):
+    """ Normalizes a search phrase for the search cache, with its whitespace collapsed and its first
+    letter upper cased, the only case wikipedia ignores: "us" and "US" lead to different pages.
+    """
+    phrase = ' '.join(phrase.split())
+    return phrase[:1].upper() + phrase[1:]
+
+
 class WikiSeeker(WikiGrabber):
+    def __init__(self, config, cacher=None):
+        super().__init__(config, cacher=cacher)
+
+        self.search_prefetch = config['search_prefetch']
+        self.search_cache_ttl = config['search_cache_ttl']
+        self.search_counts = collections.Counter()
+        self.prefetcher = Prefetcher(self, workers=config['prefetch_workers'], priority=config['prefetch_priority'])
+
+    def close(self):
+        self.prefetcher.close()
+        super().close()
+
+    def stats(self):
+        stats = super().stats()
+        stats['prefetch'] = self.prefetcher.stats()
+        stats['search_cache'] = {key: self.search_counts[key] for key in ('hits', 'misses', 'expired')}
+
+        return stats
+
+    def retrieve(self, url, page=None):
+        """ Retrieves a page, see WikiGrabber.retrieve. A page which is being prefetched is waited for instead. """
+        if page is None:
+            future = self.prefetcher.pending(url)
+            if future is not None:
+                return future()
+
+        self.prefetcher.poll()
+        return super().retrieve(url, page=page)
+
     def __catlinks(self, page):
         """ Finds the categories of a general page.
         
@@ -67,41 +111,111 @@ class WikiSeeker(WikiGrabber):
 
         return links
 
-    def search(self, phrase, precache=False):
+    def __results(self, results, precache, prefetch):
+        """ Pairs search result hrefs with their pages, or with partials to retrieve them later.
+
+        With precache, all of the result pages are retrieved concurrently up front. With prefetch,
+        they are paired with PageFutures instead, which are filled in the background.
         """
-        Searches wikipedia for a phrase and yields a generator of results.
+        results = [result for result in results if self.links.allowed(base_url + result)]
+        urls = [base_url + result for result in results]
+
+        if precache:
+            return list(zip(results, self.retrieve_many(urls)))
+        if prefetch:
+            return list(zip(results, self.prefetcher.submit(urls)))
+
+        return [(result, partial(self.retrieve, url)) for result, url in zip(results, urls)]
+
+    def __cached_search(self, phrase):
+        """ Returns the cached results of a normalized search phrase, unless they are missing or stale. """
+        if self.cacher is None or not self.search_cache_ttl:
+            return None
+
+        cached = self.cacher.search_results(phrase)
+        if cached is None:
+            self.search_counts['misses'] += 1
+            return None
+        if time.time() - cached['created'] > self.search_cache_ttl:
+            self.search_counts['expired'] += 1
+            return None
+
+        self.search_counts['hits'] += 1
+        return cached
+
+    def __store_search(self, phrase, url, search_links, disambiguation_links):
+        if self.cacher is None or not self.search_cache_ttl:
+            return
+
+        self.cacher.store_search_results(phrase, url, search_links, disambiguation_links)
+
+    def search(self, phrase, precache=False, prefetch=None):
+        """
+        Searches wikipedia for a phrase and returns a generator of results.
+
+        Prefetches still queued from the previous search are cancelled straight away, before the
+        results are iterated over. What a phrase resolved to,
+        a page, the search page or a disambiguation page, is cached for config['search_cache_ttl']
+        seconds under the normalized phrase, see normalize_phrase, so repeating a search does not
+        fetch the search page again.
 
         Args: 
             phrase (str): The phrase to search for.
-            precache (bool): Whether or not to precache the results. (Very slow. TODO: Async fix)
+            precache (bool): Whether or not to precache the results. They are retrieved concurrently.
+            prefetch (bool): Whether to prefetch the results in the background, see Prefetcher.
+                             Defaults to config['search_prefetch'].
 
         Returns:
             generator: A generator of result pairs, which are a tuple of the title and the retrieved page,
                         or a partial function to retrieve the page at a later date if precache is False.
+                        With prefetch, the partial is a PageFuture, which is called the same way.
         """
+        if prefetch is None:
+            prefetch = self.search_prefetch
+
+        cancelled = self.prefetcher.cancel()
+        if cancelled:
+            logger.debug(f"Cancelled {cancelled} prefetches from the last search.")
+
+        return self.__search(phrase, precache, prefetch)
+
+    def __search(self, phrase, precache, prefetch):
+        key = normalize_phrase(phrase)
+        cached = self.__cached_search(key)
+        if cached is not None:
+            if cached['search_links'] is not None:
+                yield from self.__results(cached['search_links'], precache, prefetch)
+            if cached['disambiguation_links'] is not None:
+                yield from self.__results(cached['disambiguation_links'], precache, prefetch)
+            elif cached['search_links'] is None:
+                # Only an article is retrieved, the search page itself is not cached.
+                yield (None, self.retrieve(cached['url']))
+            return
+
         search_url = f"{base_url}/wiki/Special:Search?search={urllib.parse.quote(phrase, safe='')}&"
 
         # retrieve search page results - may be disambig, wikipage, or other?
         results = self.fetch(search_url)
         if results is None:
             return (None, None)
-            
-        # handle special search
+
+        search_links, disambiguation_links = None, None
         if results.url.startswith(f"{base_url}/wiki/Special:Search?"):
-            for result in self.__speciallinks(results).values():
-                if not precache:
-                    yield (result, partial(self.retrieve, base_url + result))
-                else:
-                    yield (result, self.retrieve(base_url + result))
+            search_links = list(self.__speciallinks(results).values())
 
-        # handle disambiguation
         categories = self.__catlinks(results)
         if any(["Disambiguation" in cat for cat in categories]):
-            for result in self.__disambiglinks(results).values():
-                if not precache:
-                    yield (result, partial(self.retrieve, base_url + result))
-                else:
-                    yield (result, self.retrieve(base_url + result))
+            disambiguation_links = list(self.__disambiglinks(results).values())
+
+        self.__store_search(key, results.url, search_links, disambiguation_links)
+
+        # handle special search
+        if search_links is not None:
+            yield from self.__results(search_links, precache, prefetch)
+
+        # handle disambiguation
+        if disambiguation_links is not None:
+            yield from self.__results(disambiguation_links, precache, prefetch)
         else:
             yield (None, self.retrieve(results.url, page=results))
 
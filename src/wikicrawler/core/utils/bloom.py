@@ -0,0 +1,218 @@
+import hashlib
+import math
+import os
+import struct
+
+import numpy as np
+
+
+MAGIC = b'WCBF'
+HEADER = struct.Struct('<4sIdQQ')
+LAYER = struct.Struct('<QIQQ')
+
+
+class BloomFilter:
+    """ BloomFilter is a set of strings which answers membership approximately, in a few bits per string.
+
+    It never answers that a string it holds is missing, but answers that a string it does not
+    hold is present with a probability of about error_rate. Once it holds capacity strings it
+    grows by a layer twice as large with half the error rate, so the error rate of the whole
+    stays under 2 * error_rate however many strings are added.
+
+    Strings are hashed once with blake2b, the bits of each layer are derived from the two
+    halves of the 64 bit digest, h1 + i * h2 for i < k. contains_many and add_many test and
+    set the bits of a batch of strings at once with numpy, e.g. the links of a page.
+
+    Usage:
+        seen = BloomFilter(capacity=100_000, error_rate=1e-5)
+        seen.add(url)
+        url in seen
+        seen.save(path)
+        seen = BloomFilter.load(path)
+    """
+    def __init__(self, capacity=100_000, error_rate=1e-5):
+        """ Initializes the BloomFilter class.
+
+        Args:
+            capacity (int): The number of strings the first layer is sized for.
+            error_rate (float): The probability of answering that a string is present when it is not.
+        """
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError(f"Invalid capacity {capacity} or error rate {error_rate} of a bloom filter.")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = 0
+        # [bits, number of bits, number of hashes, capacity, count] of each layer, the last one is added to.
+        self.layers = []
+        self.__grow()
+
+    def __grow(self):
+        n = len(self.layers)
+        capacity = self.capacity * 2 ** n
+        error_rate = self.error_rate / 2 ** (n + 1)
+
+        m = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        k = max(1, round(m / capacity * math.log(2)))
+        self.layers.append([bytearray((m + 7) // 8), m, k, capacity, 0])
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, item):
+        h1, h2 = _hashes(item)
+        return any(_test(layer, h1, h2) for layer in self.layers)
+
+    def add(self, item):
+        """ Adds a string, returns whether it was new, i.e. the filter did not hold it already. """
+        h1, h2 = _hashes(item)
+        if any(_test(layer, h1, h2) for layer in self.layers):
+            return False
+
+        layer = self.layers[-1]
+        if layer[4] >= layer[3]:
+            self.__grow()
+            layer = self.layers[-1]
+
+        bits, m, k = layer[0], layer[1], layer[2]
+        position, step = h1 % m, h2 % m
+        for _ in range(k):
+            bits[position >> 3] |= 1 << (position & 7)
+            position += step
+            if position >= m:
+                position -= m
+
+        layer[4] += 1
+        self.count += 1
+        return True
+
+    def update(self, items):
+        self.add_many(items)
+
+    def contains_many(self, items):
+        """ Returns a boolean array of whether each string is present, see __contains__. """
+        h1, h2 = _hashes_many(items)
+        present = np.zeros(len(h1), dtype=bool)
+        for layer in self.layers:
+            present |= _test_many(layer, h1, h2)
+
+        return present
+
+    def add_many(self, items):
+        """ Adds strings, returns those which were new in the order they came, each once. """
+        items = list(dict.fromkeys(items))
+        if not items:
+            return []
+
+        h1, h2 = _hashes_many(items)
+        present = np.zeros(len(h1), dtype=bool)
+        for layer in self.layers:
+            present |= _test_many(layer, h1, h2)
+
+        new = np.flatnonzero(~present)
+        start = 0
+        while start < len(new):
+            layer = self.layers[-1]
+            if layer[4] >= layer[3]:
+                self.__grow()
+                layer = self.layers[-1]
+
+            chunk = new[start:start + layer[3] - layer[4]]
+            _set_many(layer, h1[chunk], h2[chunk])
+            layer[4] += len(chunk)
+            start += len(chunk)
+
+        self.count += len(new)
+        return [items[i] for i in new]
+
+    def nbytes(self):
+        """ The bytes the filter's bits take up. """
+        return sum(len(layer[0]) for layer in self.layers)
+
+    def save(self, path):
+        """ Writes the filter to a file, replacing it at once so a crash never leaves half a filter. """
+        with open(path + '.tmp', 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(self.layers), self.error_rate, self.capacity, self.count))
+            for bits, m, k, capacity, count in self.layers:
+                f.write(LAYER.pack(m, k, capacity, count))
+                f.write(bits)
+
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        """ Reads a filter written by save. """
+        with open(path, 'rb') as f:
+            magic, layers, error_rate, capacity, count = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a bloom filter.")
+
+            bloom = cls.__new__(cls)
+            bloom.capacity = capacity
+            bloom.error_rate = error_rate
+            bloom.count = count
+            bloom.layers = []
+            for _ in range(layers):
+                m, k, layer_capacity, layer_count = LAYER.unpack(f.read(LAYER.size))
+                bloom.layers.append([bytearray(f.read((m + 7) // 8)), m, k, layer_capacity, layer_count])
+
+        return bloom
+
+
+def _hashes(item):
+    digest = int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), 'little')
+    return digest & 0xffffffff, digest >> 32 | 1
+
+
+def _hashes_many(items):
+    digests = b''.join(hashlib.blake2b(item.encode(), digest_size=8).digest() for item in items)
+    digests = np.frombuffer(digests, dtype='<u8')
+    return digests & np.uint64(0xffffffff), digests >> np.uint64(32) | np.uint64(1)
+
+
+def _positions(layer, h1, h2):
+    m, k = np.uint64(layer[1]), layer[2]
+    return (h1[:, None] % m + np.arange(k, dtype=np.uint64) * (h2[:, None] % m)) % m
+
+
+def _test_many(layer, h1, h2):
+    bits = np.frombuffer(layer[0], dtype=np.uint8)
+    positions = _positions(layer, h1, h2)
+    return ((bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+
+
+def _set_many(layer, h1, h2):
+    bits = np.frombuffer(layer[0], dtype=np.uint8)
+    positions = _positions(layer, h1, h2).ravel()
+    np.bitwise_or.at(bits, positions >> np.uint64(3), np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+
+
+def _test(layer, h1, h2):
+    bits, m, k = layer[0], layer[1], layer[2]
+    position, step = h1 % m, h2 % m
+    for _ in range(k):
+        if not bits[position >> 3] >> (position & 7) & 1:
+            return False
+        position += step
+        if position >= m:
+            position -= m
+
+    return True
+
+
+class ExactSet(set):
+    """ A set with the add, add_many and contains_many of a BloomFilter, for when answers have to be exact. """
+    def add(self, item):
+        if item in self:
+            return False
+
+        super().add(item)
+        return True
+
+    def add_many(self, items):
+        new = [item for item in dict.fromkeys(items) if item not in self]
+        self.update(new)
+        return new
+
+    def contains_many(self, items):
+        return np.array([item in self for item in items], dtype=bool)
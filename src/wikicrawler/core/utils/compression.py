@@ -0,0 +1,102 @@
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Markup repeated on every rendered wikipedia article. Both codecs prime their window with it,
+# so even the first kilobytes of a page compress well. Never edit a dictionary in place: stored
+# pages name the codec they were written with, add a new version instead.
+WIKI_DICTIONARY_V1 = (
+    b'<!DOCTYPE html>\n<html class="client-nojs vector-feature-language-in-header-enabled '
+    b'vector-feature-page-tools-pinned-enabled vector-feature-toc-pinned-clientpref-1" lang="en" dir="ltr">\n'
+    b'<head>\n<meta charset="UTF-8">\n<title> - Wikipedia</title>\n<script>(RLQ=window.RLQ||[]).push(function(){'
+    b'mw.config.set({"wgBreakFrames":false,"wgSeparatorTransformTable":["",""],"wgDigitTransformTable":["",""],'
+    b'"wgDefaultDateFormat":"dmy","wgMonthNames":["","January","February","March","April","May","June","July",'
+    b'"August","September","October","November","December"],"wgRequestId":"","wgCanonicalNamespace":"",'
+    b'"wgCanonicalSpecialPageName":false,"wgNamespaceNumber":0,"wgPageName":"","wgTitle":"","wgCurRevisionId":'
+    b'<link rel="stylesheet" href="/w/load.php?lang=en&amp;modules=ext.cite.styles%7Cext.uls.interlanguage&amp;only=styles&amp;skin=vector-2022">\n'
+    b'<meta name="generator" content="MediaWiki 1.41.0-wmf">\n<link rel="canonical" href="https://en.wikipedia.org/wiki/">\n'
+    b'<body class="skin-vector skin-vector-search-vue mediawiki ltr sitedir-ltr mw-hide-empty-elt ns-0 ns-subject '
+    b'mw-editable page- rootpage- skin-vector-2022 action-view">'
+    b'<div class="mw-page-container"><div class="mw-page-container-inner"><div class="vector-main-menu-container">'
+    b'<h1 id="firstHeading" class="firstHeading mw-first-heading"><span class="mw-page-title-main">'
+    b'<div id="bodyContent" class="vector-body" aria-labelledby="firstHeading" data-mw-ve-target-container>'
+    b'<div id="siteSub" class="noprint">From Wikipedia, the free encyclopedia</div>'
+    b'<div id="mw-content-text" class="mw-body-content mw-content-ltr" lang="en" dir="ltr">'
+    b'<div class="mw-parser-output"><div class="shortdescription nomobile noexcerpt noprint searchaux" style="display:none">'
+    b'<table class="infobox"><tbody><tr><th scope="row" class="infobox-label"></th><td class="infobox-data">'
+    b'<p><b></b> is a <a href="/wiki/" title=""></a>, <a href="/wiki/" class="mw-redirect" title=""></a> and '
+    b'<sup id="cite_ref-" class="reference"><a href="#cite_note-">&#91;1&#93;</a></sup>'
+    b'<div class="thumb tright"><div class="thumbinner"><a href="/wiki/File:" class="image">'
+    b'<img alt="" src="//upload.wikimedia.org/wikipedia/commons/thumb/" decoding="async" width="220" height="" '
+    b'class="thumbimage" srcset="" data-file-width="" data-file-height="" /></a><div class="thumbcaption">'
+    b'<figure class="mw-default-size" typeof="mw:File/Thumb"><figcaption></figcaption></figure>'
+    b'<h2><span class="mw-headline" id=""></span><span class="mw-editsection"><span class="mw-editsection-bracket">[</span>'
+    b'<a href="/w/index.php?title=&amp;action=edit&amp;section=" title="Edit section: "><span>edit</span></a>'
+    b'<span class="mw-editsection-bracket">]</span></span></h2>'
+    b'<div role="note" class="hatnote navigation-not-searchable">Main article: '
+    b'<h2><span class="mw-headline" id="See_also">See also</span></h2><div class="div-col" style="column-width: 30em;"><ul><li>'
+    b'<h2><span class="mw-headline" id="References">References</span></h2>'
+    b'<div class="reflist"><div class="mw-references-wrap mw-references-columns"><ol class="references">'
+    b'<li id="cite_note-"><span class="mw-cite-backlink"><b><a href="#cite_ref-">^</a></b></span> '
+    b'<span class="reference-text"><cite id="" class="citation journal cs1"><a rel="nofollow" class="external text" href="https://'
+    b'</a></cite><span title="ctx_ver=Z39.88-2004&amp;rft_val_fmt=info%3Aofi%2Ffmt%3Akev%3Amtx%3Ajournal&amp;rft.genre=article'
+    b'<a href="/wiki/Doi_(identifier)" class="mw-redirect" title="Doi (identifier)">doi</a>:<a rel="nofollow" '
+    b'class="external text" href="https://doi.org/10.'
+    b'<a href="/wiki/ISBN_(identifier)" class="mw-redirect" title="ISBN (identifier)">ISBN</a>'
+    b'<a href="/wiki/Special:BookSources/" title="Special:BookSources/"><bdi></bdi></a>'
+    b'<div class="navbox-styles"><style data-mw-deduplicate="TemplateStyles:r"></style></div>'
+    b'<div role="navigation" class="navbox" aria-labelledby="" style="padding:3px"><table class="nowraplinks hlist '
+    b'mw-collapsible autocollapse navbox-inner" style="border-spacing:0;background:transparent;color:inherit">'
+    b'<div id="catlinks" class="catlinks" data-mw="interface"><div id="mw-normal-catlinks" class="mw-normal-catlinks">'
+    b'<a href="/wiki/Help:Category" title="Help:Category">Categories</a>: <ul><li><a href="/wiki/Category:" title="Category:">'
+    b'<footer id="footer" class="mw-footer" role="contentinfo" ><ul id="footer-info">'
+    b'<li id="footer-info-lastmod"> This page was last edited on , at <span class="anonymous-show">&#160;(UTC)</span>.</li>'
+    b'Text is available under the <a rel="license" href="//en.wikipedia.org/wiki/Wikipedia:Text_of_the_Creative_Commons_'
+    b'Attribution-ShareAlike_4.0_International_License">Creative Commons Attribution-ShareAlike License 4.0</a>'
+    b'</div></div></div></div></body>\n</html>'
+)
+
+
+class RawCodec:
+    """ A named compression codec for stored page html.
+
+    The name is stored next to every compressed page, so pages written with one codec
+    can still be read after the preferred codec changes.
+    """
+    def __init__(self, name, compress, decompress):
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+
+
+def _zlib_compress(data):
+    compressor = zlib.compressobj(9, zdict=WIKI_DICTIONARY_V1)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _zlib_decompress(data):
+    decompressor = zlib.decompressobj(zdict=WIKI_DICTIONARY_V1)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+CODECS = {'zlib-d1': RawCodec('zlib-d1', _zlib_compress, _zlib_decompress)}
+
+if zstandard is not None:
+    _zstd_dictionary = zstandard.ZstdCompressionDict(WIKI_DICTIONARY_V1, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+
+    def _zstd_compress(data):
+        return zstandard.ZstdCompressor(level=12, dict_data=_zstd_dictionary).compress(data)
+
+    def _zstd_decompress(data):
+        return zstandard.ZstdDecompressor(dict_data=_zstd_dictionary).decompress(data)
+
+    CODECS['zstd-d1'] = RawCodec('zstd-d1', _zstd_compress, _zstd_decompress)
+
+
+def preferred_codec():
+    """ The best codec available, zstd if installed, zlib otherwise. """
+    return CODECS.get('zstd-d1', CODECS['zlib-d1'])
@@ -3,6 +3,66 @@ import json
 
 from pathlib import Path
 
+from ..parse.urls import EXCLUDED_NAMESPACES
+
+
+def default_config(data_root):
+    """ The default configuration, keys missing from a user's config.json fall back to these. """
+    return {'data_root': str(data_root),
+            'media_folder': '/images',
+            'db_file': '/arbiter.db',
+            'search_precaching': False,
+            'search_prefetch': False,
+            # Seconds a search is answered from the search cache, 0 to not cache searches.
+            'search_cache_ttl': 7 * 24 * 3600,
+            'prefetch_workers': 4,
+            'prefetch_priority': 3,
+            'crawl_workers': 4,
+            # Seconds a crawl worker process may hold a page before the others may claim it.
+            'crawl_lease': 60.0,
+            # Pages a crawl visits between checkpoints, None to not checkpoint crawls. Checkpoints are put
+            # off while they take more than crawl_checkpoint_overhead of the crawl's time, None for no bound.
+            'crawl_checkpoint_every': 50,
+            'crawl_checkpoint_overhead': 0.05,
+            # The false positive rate of the bloom filter of the urls a crawl has seen, None for an exact set.
+            # A false positive skips a link, the filter takes about 1.44 * log2(1 / rate) bits per url.
+            'crawl_seen_error': 1e-5,
+            'crawl_seen_capacity': 100_000,
+            # The longest path of links and the most pages retrieved searching for one, see PathFinder. The
+            # search backwards asks the api for up to path_backlinks pages linking to a page, 0 to only use the cache.
+            'path_max_depth': 6,
+            'path_max_pages': 1000,
+            'path_backlinks': 500,
+            # Keep the graph of the links between cached pages next to the cache, see LinkGraph.
+            'link_graph': True,
+            'latex': True,
+            'save_media': False,
+            'media_workers': 4,
+            'media_max_retries': 5,
+            'media_backoff': 1.0,
+            'media_max_backoff': 60.0,
+            'media_budget': 2 * 1024 ** 3,
+            'process_media_links': False,
+            'api_url': 'https://en.wikipedia.org/w/api.php',
+            'backend': 'html',
+            # Links into these namespaces are dropped from pages and never fetched, see LinkFilter.
+            'excluded_namespaces': list(EXCLUDED_NAMESPACES),
+            'canonicalize_links': True,
+            'store_raw_html': False,
+            'extractor': 'single_pass',
+            'extractor_tokenizer': 'html.parser',
+            'stream_chunk_size': 16384,
+            'parse_workers': 0,
+            'max_in_flight': 8,
+            'rate_limit': {'token': {'rate': 1.38, 'burst': 10},
+                           'anonymous': {'rate': 0.5, 'burst': 3}},
+            'pool_size': 4,
+            'pool_idle_timeout': 30,
+            'prompt_state': None,
+            'pointer_state': None,
+            'functions_cache': None,
+            'wiki_api_token': None}
+
 
 def init_config():
     env_root = os.getenv('WIKICRAWLER_ROOT')
@@ -19,23 +79,11 @@ def init_config():
     if not os.path.exists(data_root):
         os.makedirs(data_root)
 
-    config = None
+    config = default_config(data_root)
     if os.path.exists(config_file):
         with open(config_file, "r") as f:
-            config = json.load(f)
+            config.update(json.load(f))
     else:
-        config = {  'data_root': str(data_root),
-                    'media_folder': '/images',
-                    'db_file': '/arbiter.db',
-                    'search_precaching': False,
-                    'latex': True,
-                    'save_media': False,
-                    'process_media_links': False,
-                    'prompt_state': None,
-                    'pointer_state': None,
-                    'functions_cache': None,
-                    'wiki_api_token': None}
-
         with open(config_file, "w") as f:
             json.dump(config, f, indent=2)
 
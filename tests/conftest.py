@@ -0,0 +1,163 @@
+import json
+import re
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class StandInWiki(ThreadingHTTPServer):
+    """ A local stand-in for a MediaWiki site, serving api.php from in-memory pages and files.
+
+    Attributes:
+        pages (dict): Wikitext by normalized title, e.g. 'Sun'.
+        redirects (dict): Redirect targets by normalized title.
+        files (dict): Download urls by normalized file title, e.g. 'File:Sun.jpg'.
+        requests (list): The query parameters of every api request.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.pages = {}
+        self.redirects = {}
+        self.files = {}
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    @property
+    def api_url(self):
+        return self.url + '/w/api.php'
+
+    def api(self, params):
+        self.requests.append(params)
+
+        if params.get('action') == 'query' and params.get('prop') == 'imageinfo':
+            return self.imageinfo(params['titles'].split('|'))
+        if params.get('action') == 'query' and params.get('prop') == 'revisions':
+            return self.revisions(params['titles'].split('|'))
+        if params.get('action') == 'query' and params.get('list') == 'backlinks':
+            return self.backlinks(params['bltitle'], int(params.get('bllimit', 10)), int(params.get('blcontinue', 0)))
+        if params.get('action') == 'parse':
+            return self.parse(params['page'])
+
+        return {'error': {'code': 'badvalue', 'info': f"Unsupported request {params}"}}
+
+    def imageinfo(self, titles):
+        normalized = []
+        pages = []
+        for title in titles:
+            canonical = title.replace('_', ' ')
+            if canonical != title:
+                normalized.append({'from': title, 'to': canonical})
+
+            if canonical in self.files:
+                url = self.files[canonical]
+                pages.append({'title': canonical, 'imageinfo': [{'url': url, 'sha1': f"sha1-{canonical}",
+                                                                 'size': len(url)}]})
+            else:
+                pages.append({'title': canonical, 'missing': True})
+
+        return {'batchcomplete': True, 'query': {'normalized': normalized, 'pages': pages}}
+
+    def revisions(self, titles):
+        normalized = []
+        redirects = []
+        pages = []
+        for title in titles:
+            canonical = title.replace('_', ' ')
+            if canonical != title:
+                normalized.append({'from': title, 'to': canonical})
+            if canonical in self.redirects:
+                redirects.append({'from': canonical, 'to': self.redirects[canonical]})
+                canonical = self.redirects[canonical]
+
+            if canonical in self.pages:
+                pages.append({'title': canonical, 'revisions': [{'slots': {'main': {
+                    'contentmodel': 'wikitext', 'content': self.pages[canonical]}}}]})
+            else:
+                pages.append({'title': canonical, 'missing': True})
+
+        return {'batchcomplete': True, 'query': {'normalized': normalized, 'redirects': redirects, 'pages': pages}}
+
+    def linking(self, title):
+        """ The titles of the pages with a [[link]] to title. """
+        def normalized(link):
+            link = link.strip().replace('_', ' ')
+            return link[:1].upper() + link[1:]
+
+        return [page for page, text in self.pages.items()
+                if title in {normalized(link) for link in re.findall(r'\[\[([^\]|#]+)', text)}]
+
+    def backlinks(self, title, limit, offset):
+        title = title.replace('_', ' ')
+        links = [{'ns': 0, 'title': page} for page in self.linking(title)]
+        links += [{'ns': 0, 'title': alias, 'redirect': True,
+                   'redirlinks': [{'ns': 0, 'title': page} for page in self.linking(alias)]}
+                  for alias, target in self.redirects.items() if target == title]
+
+        data = {'query': {'backlinks': links[offset:offset + limit]}}
+        if offset + limit < len(links):
+            data['continue'] = {'blcontinue': str(offset + limit), 'continue': '-||'}
+        else:
+            data['batchcomplete'] = True
+
+        return data
+
+    def parse(self, title):
+        title = self.redirects.get(title, title)
+        if title not in self.pages:
+            return {'error': {'code': 'missingtitle', 'info': "The page you specified doesn't exist."}}
+
+        # A crude rendering, enough for the extractors: one paragraph per line and a section per heading.
+        text = []
+        sections = []
+        for line in self.pages[title].split('\n'):
+            if line.startswith('=='):
+                name = line.strip('= ')
+                sections.append({'number': str(len(sections) + 1), 'line': name, 'anchor': name.replace(' ', '_')})
+                text.append(f"<h2>{name}</h2>")
+            elif line:
+                text.append(f"<p>{line}</p>")
+
+        return {'parse': {'title': title, 'pageid': 1, 'sections': sections,
+                          'text': '<div class="mw-parser-output">' + ''.join(text) + '</div>'}}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urllib.parse.urlsplit(self.path)
+        if parsed.path != '/w/api.php':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+        body = json.dumps(self.server.api(params)).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def wiki():
+    server = StandInWiki()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
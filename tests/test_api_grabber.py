@@ -0,0 +1,59 @@
+import pytest
+
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.grabber import WikiGrabber
+from wikicrawler.core.utils.config import default_config
+
+
+def api_config(wiki, tmp_path, backend):
+    config = default_config(str(tmp_path))
+    config.update(api_url=wiki.api_url, backend=backend, latex=False,
+                  rate_limit={'anonymous': {'rate': 1000, 'burst': 100}})
+
+    return config
+
+
+def test_query_backend_batches_pages(wiki, tmp_path):
+    wiki.pages = {f"Page {i}": f"Page {i} links to [[Page {i + 1}]].\n\n== History ==\nIt was made." for i in range(120)}
+    wiki.redirects = {'Alias': 'Page 0'}
+    urls = [f"https://en.wikipedia.org/wiki/Page_{i}" for i in range(120)]
+    urls += ["https://en.wikipedia.org/wiki/Alias", "https://en.wikipedia.org/wiki/Missing"]
+
+    with WikiCacher(api_config(wiki, tmp_path, 'query')) as cacher:
+        grabber = WikiGrabber(cacher.config, cacher)
+        try:
+            wikis = grabber.retrieve_many(urls)
+            assert len(wiki.requests) == 3
+
+            assert wikis[-1] is None
+            # The redirect is cached under the page it led to.
+            assert wikis[-2]['url'] == "https://en.wikipedia.org/wiki/Page_0"
+            assert "https://en.wikipedia.org/wiki/Alias" in cacher
+            assert wikis[-2]['paragraphs'] == wikis[0]['paragraphs'] == ["Page 0 links to Page 1.\n", "It was made.\n"]
+            assert wikis[7]['paragraph_links'] == [{'Page 8': "https://en.wikipedia.org/wiki/Page_8"}, {}]
+            assert wikis[7]['toc_links'] == {'History': "https://en.wikipedia.org/wiki/Page_7#History"}
+
+            assert grabber.retrieve(urls[3])['title'] == 'Page 3'
+            assert len(wiki.requests) == 3
+            assert grabber.stats()['api'] == {'mode': 'query', 'pages': 121, 'requests': 3}
+
+            with pytest.raises(AttributeError):
+                grabber.retrieve(urls[-1])
+        finally:
+            grabber.close()
+
+
+def test_parse_backend_uses_the_html_extractor(wiki, tmp_path):
+    wiki.pages = {'Sun': "The Sun is a star.\n== Structure ==\nIt has layers."}
+
+    with WikiCacher(api_config(wiki, tmp_path, 'parse')) as cacher:
+        grabber = WikiGrabber(cacher.config, cacher)
+        try:
+            sun = grabber.retrieve("https://en.wikipedia.org/wiki/Sun")
+        finally:
+            grabber.close()
+
+    assert wiki.requests[0]['action'] == 'parse'
+    assert sun['title'] == 'Sun'
+    assert sun['paragraphs'] == ["The Sun is a star.", "It has layers."]
+    assert sun['toc_links'] == {'Structure': "https://en.wikipedia.org/wiki/Sun#Structure"}
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+from wikicrawler.core.async_grabber import AsyncWikiGrabber
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.grabber import WikiGrabber
+from wikicrawler.core.utils.config import default_config
+
+
+WIKI = "https://en.wikipedia.org/wiki/"
+
+
+def article(title):
+    return (f'<html><body><h1 id="firstHeading">{title}</h1><div id="mw-content-text"><div class="mw-parser-output">'
+            f'<p>{title} is a page.</p></div></div></body></html>')
+
+
+class Grabber(WikiGrabber):
+    """ A WikiGrabber which serves canned pages slowly, counting how many are fetched at once. """
+    def __init__(self, config, cacher):
+        super().__init__(config, cacher=cacher)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    def fetch_html(self, url):
+        if 'wikipedia.org' not in url:
+            raise ValueError(url)
+
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            time.sleep(0.05)
+            title = url.rpartition('/')[2]
+            # Later pages answer first.
+            time.sleep(0.01 * (10 - int(title.rpartition('_')[2] or 0)))
+            return url, None if title == 'Missing_0' else article(title.replace('_', ' '))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def test_pages_are_fetched_concurrently_in_order(tmp_path):
+    config = default_config(str(tmp_path))
+    config.update(max_in_flight=4, latex=False)
+    urls = [f"{WIKI}Page_{i}" for i in range(8)] + [f"{WIKI}Missing_0", "https://example.com/Page_9"]
+
+    with WikiCacher(config) as cacher:
+        grabber = Grabber(config, cacher)
+        try:
+            with AsyncWikiGrabber(grabber) as agrabber:
+                soups = asyncio.run(agrabber.fetch_many(urls))
+                assert [soup.url for soup in soups[:8]] == urls[:8]
+                assert soups[8] is None and soups[9] is None
+                assert grabber.most_in_flight == 4
+
+                # Failures map to None, the other pages are cached.
+                grabber.most_in_flight = 0
+                wikis = asyncio.run(agrabber.retrieve_many(urls))
+                assert [wiki['title'] for wiki in wikis[:8]] == [f"Page {i}" for i in range(8)]
+                assert wikis[8] is None and wikis[9] is None
+                assert grabber.most_in_flight == 4
+                assert all(url in cacher for url in urls[:8]) and urls[8] not in cacher
+
+                # Cached pages are not fetched again.
+                grabber.most_in_flight = 0
+                assert asyncio.run(agrabber.retrieve(urls[3])) == wikis[3]
+                assert grabber.most_in_flight == 0
+        finally:
+            grabber.close()
@@ -0,0 +1,35 @@
+from wikicrawler.core.utils.bloom import BloomFilter, ExactSet
+
+
+WIKI = "https://en.wikipedia.org/wiki/"
+
+
+def test_bloom_filter(tmp_path):
+    urls = [f"{WIKI}Page_{i}" for i in range(5000)]
+    others = [f"{WIKI}Other_{i}" for i in range(20000)]
+
+    bloom = BloomFilter(capacity=1000, error_rate=1e-3)
+    assert bloom.add(urls[0]) and not bloom.add(urls[0])
+    assert bloom.add_many(urls[:10] + urls[:10] + urls[10:2000]) == urls[1:2000]
+    bloom.update(urls[2000:])
+
+    # It grew past its capacity without losing a url, and the error rate stays under twice the one asked for.
+    # Urls which were false positives when they were added are not counted.
+    assert 4990 <= len(bloom) <= 5000 and len(bloom.layers) == 3
+    assert all(url in bloom for url in urls) and bloom.contains_many(urls).all()
+    assert sum(url in bloom for url in others) < 2 * 1e-3 * len(others)
+    assert bloom.contains_many(others).sum() == sum(url in bloom for url in others)
+    assert bloom.nbytes() < 5000 * 4
+
+    path = str(tmp_path / 'seen.bloom')
+    bloom.save(path)
+    loaded = BloomFilter.load(path)
+    assert len(loaded) == len(bloom) and loaded.layers == bloom.layers
+    assert loaded.contains_many(urls).all()
+
+
+def test_exact_set():
+    seen = ExactSet()
+    assert seen.add('a') and not seen.add('a')
+    assert seen.add_many(['b', 'a', 'b', 'c']) == ['b', 'c']
+    assert list(seen.contains_many(['a', 'd'])) == [True, False]
@@ -0,0 +1,114 @@
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.grabber import WikiGrabber
+from wikicrawler.core.utils.config import default_config
+
+
+ARTICLE = """<html><body><h1 id="firstHeading">Sun</h1><div id="mw-content-text"><div class="mw-parser-output">
+<p>The <a href="/wiki/Star" title="Star">star</a> at the center of the Solar System.</p></div></div></body></html>"""
+
+
+class Grabber(WikiGrabber):
+    """ A WikiGrabber whose fetches are redirected to a canned page instead of wikipedia. """
+    def __init__(self, config, cacher):
+        super().__init__(config, cacher=cacher)
+        self.fetched = []
+
+    def fetch_html(self, url):
+        self.fetched.append(url)
+        return "https://en.wikipedia.org/wiki/Sun", ARTICLE
+
+
+def test_aliases_save_fetches(tmp_path):
+    config = default_config(str(tmp_path))
+    with WikiCacher(config) as cacher:
+        grabber = Grabber(config, cacher)
+        try:
+            page = grabber.retrieve("https://en.wikipedia.org/wiki/Sol_(star)")
+            assert page['title'] == 'Sun'
+
+            for url in ("https://en.wikipedia.org/wiki/Sun", "https://en.m.wikipedia.org/wiki/sun#Structure",
+                        "https://en.wikipedia.org/wiki/Sol_%28star%29", "https://en.wikipedia.org/wiki/Sol_(star)"):
+                assert url in cacher
+                assert grabber.retrieve(url)['title'] == 'Sun'
+
+            assert "https://en.wikipedia.org/wiki/Moon" not in cacher
+            assert grabber.fetched == ["https://en.wikipedia.org/wiki/Sol_(star)"]
+            assert grabber.stats()['aliases'] == {'aliases': 1, 'hits': 3}
+        finally:
+            grabber.close()
+
+
+def test_retrieve_without_a_cacher(tmp_path):
+    grabber = Grabber(default_config(str(tmp_path)), None)
+    try:
+        assert grabber.retrieve("https://en.wikipedia.org/wiki/Sol_(star)")['title'] == 'Sun'
+        assert grabber.retrieve("https://en.wikipedia.org/wiki/Sol_(star)")['title'] == 'Sun'
+        assert len(grabber.fetched) == 2
+    finally:
+        grabber.close()
+
+
+def test_redirects_are_cached_under_their_page(tmp_path):
+    config = default_config(str(tmp_path))
+    with WikiCacher(config) as cacher:
+        grabber = Grabber(config, cacher)
+        try:
+            # The page keeps the url the redirect led to, the one its links and the crawls know it by,
+            # and the url it was asked for becomes an alias of it.
+            page = grabber.retrieve("https://en.wikipedia.org/wiki/Sol_(star)")
+            assert page['url'] == "https://en.wikipedia.org/wiki/Sun"
+            assert cacher.resolve("https://en.wikipedia.org/wiki/Sol_(star)") == "https://en.wikipedia.org/wiki/Sun"
+
+            # Retrieving it under its own url is a hit on the same row, not a second copy of it.
+            assert grabber.retrieve("https://en.wikipedia.org/wiki/Sun") == page
+            assert cacher.manager.session.query(cacher.manager.Node).count() == 1
+            assert grabber.fetched == ["https://en.wikipedia.org/wiki/Sol_(star)"]
+        finally:
+            grabber.close()
+
+
+def test_raw_html_is_reextracted(tmp_path):
+    config = dict(default_config(str(tmp_path)), store_raw_html=True)
+    with WikiCacher(config) as cacher:
+        grabber = Grabber(config, cacher)
+        try:
+            page = grabber.retrieve("https://en.wikipedia.org/wiki/Sol_(star)")
+            assert cacher.get_raw("https://en.wikipedia.org/wiki/Sun") == ARTICLE
+            assert cacher.get_raw("https://en.wikipedia.org/wiki/Moon") is None
+            assert cacher.raw_urls() == ["https://en.wikipedia.org/wiki/Sun"]
+
+            stats = cacher.raw_stats()
+            assert stats['pages'] == 1 and stats['html_bytes'] == len(ARTICLE.encode())
+            assert 0 < stats['stored_bytes'] < stats['html_bytes'] and stats['disk_savings'] > 0
+
+            # Re-extracting reads the stored html under any url of the page, without fetching it.
+            assert grabber.reextract("https://en.wikipedia.org/wiki/Sol_(star)") == page
+            assert grabber.reextract("https://en.wikipedia.org/wiki/Moon") is None
+            assert grabber.fetched == ["https://en.wikipedia.org/wiki/Sol_(star)"]
+            assert cacher.manager.session.query(cacher.manager.Node).count() == 1
+        finally:
+            grabber.close()
+
+
+def test_get_many_matches_get(tmp_path):
+    def page(title):
+        return {'url': "https://en.wikipedia.org/wiki/" + title, 'title': title, 'paragraphs': [f"{title}."],
+                'toc_links': {}, 'references': [], 'paragraph_links': [{}], 'see_also': None, 'media': None}
+
+    config = default_config(str(tmp_path))
+    with WikiCacher(config) as cacher:
+        # Pages merged and not flushed yet are found too.
+        cacher.cache(page('Sun'))
+        cacher.cache_many([page(f"Page_{i}") for i in range(1000)])
+        cacher.alias("https://en.wikipedia.org/wiki/Sol", "https://en.wikipedia.org/wiki/Sun")
+
+        urls = ["https://en.wikipedia.org/wiki/Sun", "https://en.m.wikipedia.org/wiki/sol#Name",
+                "https://en.wikipedia.org/wiki/Moon"] + [f"https://en.wikipedia.org/wiki/Page_{i}" for i in range(1000)]
+        pages = cacher.get_many(urls)
+
+        assert "https://en.wikipedia.org/wiki/Moon" not in pages and len(pages) == 1002
+        assert pages["https://en.m.wikipedia.org/wiki/sol#Name"] == page('Sun')
+        assert pages["https://en.wikipedia.org/wiki/Page_999"] == page('Page_999')
+        assert cacher.get_or_none("https://en.wikipedia.org/wiki/sun") == page('Sun')
+        assert cacher.get_or_none("https://en.wikipedia.org/wiki/Moon") is None
+        assert cacher.alias_stats()['hits'] == 2
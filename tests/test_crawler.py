@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from wikicrawler.core.crawler import WikiCrawler, tag_score
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.db.graph import page_links
+from wikicrawler.core.utils.config import default_config
+
+
+WIKI = "https://en.wikipedia.org/wiki/"
+
+# Page -> (link text, page) of its paragraph links.
+GRAPH = {'Root': [('alpha', 'A'), ('black hole', 'B'), ('help', 'Help:Contents')],
+         'A': [('one', 'A1'), ('two', 'A2')],
+         'B': [('event horizon', 'B1')],
+         'A1': [('back', 'Root')],
+         'A2': [],
+         'B1': [('deeper', 'C')],
+         'C': []}
+
+
+def render(title):
+    links = ' '.join(f'<a href="/wiki/{page}">{text}</a>' for text, page in GRAPH[title])
+    return (f'<html><body><h1 id="firstHeading">{title}</h1><div id="mw-content-text">'
+            f'<div class="mw-parser-output"><p>{title} links to {links}.</p></div></div></body></html>')
+
+
+class Crawler(WikiCrawler):
+    """ A WikiCrawler fetching from GRAPH instead of wikipedia. """
+    def __init__(self, config, cacher):
+        super().__init__(config, cacher=cacher)
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def fetch_html(self, url):
+        title = url[len(WIKI):]
+        with self.lock:
+            self.fetched.append(title)
+        return url, render(title)
+
+
+def crawl(crawler, **kwargs):
+    return [(depth, page['title']) for depth, page in crawler.traverse(WIKI + 'Root', **kwargs)]
+
+
+def test_traverse(tmp_path):
+    config = dict(default_config(str(tmp_path)), latex=False)
+    with WikiCacher(config) as cacher:
+        crawler = Crawler(config, cacher)
+        try:
+            assert crawl(crawler, workers=1) == [(0, 'Root'), (1, 'A'), (1, 'B'), (2, 'A1'), (2, 'A2'), (2, 'B1')]
+            assert crawl(crawler, strategy='dfs', workers=1, max_depth=None) == [
+                (0, 'Root'), (1, 'B'), (2, 'B1'), (3, 'C'), (1, 'A'), (2, 'A2'), (2, 'A1')]
+            assert crawl(crawler, tags=[('event', 'horizon'), ('black', 'hole')], workers=1, max_pages=3) == [
+                (0, 'Root'), (1, 'B'), (2, 'B1')]
+
+            # Every page was fetched once, the later crawls read them from the cache.
+            assert sorted(crawler.fetched) == ['A', 'A1', 'A2', 'B', 'B1', 'C', 'Root']
+        finally:
+            crawler.close()
+
+
+def test_traverse_continues_after_stopping(tmp_path):
+    config = dict(default_config(str(tmp_path)), latex=False)
+    with WikiCacher(config) as cacher:
+        crawler = Crawler(config, cacher)
+        try:
+            crawl = crawler.traverse(WIKI + 'Root', workers=3)
+            pages = []
+            for depth, page in crawl:
+                pages.append(page['title'])
+                if len(pages) == 2:
+                    break
+
+            pages += [page['title'] for depth, page in crawl]
+            stats = crawl.stats()
+
+            assert sorted(pages) == ['A', 'A1', 'A2', 'B', 'B1', 'Root']
+            assert sorted(crawler.fetched) == sorted(pages)
+            assert (stats['pages'], stats['fetched'], stats['frontier']) == (6, 6, 0)
+            assert stats['pages_per_second'] > 0
+        finally:
+            crawler.close()
+
+
+def crawl_until_killed(config, pages):
+    with WikiCacher(config) as cacher:
+        crawler = Crawler(config, cacher)
+        for n, _ in enumerate(crawler.traverse(WIKI + 'Root', workers=1), 1):
+            if n == pages:
+                # Dies without closing the crawl or the cacher, nothing after the last checkpoint is committed.
+                os._exit(0)
+
+
+@pytest.mark.parametrize('lose_filter', [False, True])
+def test_resume_after_interruption(tmp_path, lose_filter):
+    config = dict(default_config(str(tmp_path)), latex=False, crawl_checkpoint_every=1, crawl_checkpoint_overhead=None)
+    process = multiprocessing.Process(target=crawl_until_killed, args=(config, 3))
+    process.start()
+    process.join()
+
+    with WikiCacher(config) as cacher:
+        crawler = Crawler(config, cacher)
+        try:
+            [entry] = crawler.crawls()
+            assert entry['counts']['pages'] == 3
+
+            # The filter of seen urls is saved with each checkpoint, and rebuilt from it if it is lost.
+            path = tmp_path / 'databases' / f"crawl-{entry['crawl_id']}.seen"
+            assert path.exists()
+            if lose_filter:
+                path.unlink()
+
+            crawl = crawler.resume(entry['crawl_id'])
+            pages = [(depth, page['title']) for depth, page in crawl]
+
+            # The crawl goes on where it stopped, only the page in flight when it died is fetched again.
+            assert pages == [(2, 'A1'), (2, 'A2'), (2, 'B1')]
+            assert sorted(crawler.fetched) == ['A1', 'A2', 'B1']
+            assert (crawl.stats()['pages'], crawl.stats()['frontier']) == (6, 0)
+            # The crawl finished, its filter is deleted.
+            assert not path.exists()
+            assert crawler.resume('missing') is None
+        finally:
+            crawler.close()
+
+
+def test_checkpoints_flush_the_link_graph(tmp_path):
+    config = dict(default_config(str(tmp_path)), latex=False, crawl_checkpoint_every=1, crawl_checkpoint_overhead=None)
+    with WikiCacher(config) as cacher:
+        cacher.cache({'url': WIKI + 'Island', 'title': 'Island', 'paragraphs': [], 'toc_links': {}, 'references': [],
+                      'paragraph_links': [{'A': WIKI + 'A'}], 'see_also': None, 'media': None})
+        cacher.commit()
+
+    process = multiprocessing.Process(target=crawl_until_killed, args=(config, 3))
+    process.start()
+    process.join()
+
+    # The graph holds the pages the checkpoints committed, though the crawl died without closing the cache.
+    with WikiCacher(config) as cacher:
+        pages = {page.url: page for page in cacher.manager.session.query(cacher.manager.Node)}
+        assert len(pages) == 4 and len(cacher.graph) >= len(pages)
+        for url, page in pages.items():
+            links = page_links({'paragraph_links': page.paragraph_links, 'see_also': page.see_also})
+            assert sorted(cacher.graph.out_links(url)) == sorted(set(links))
+        assert cacher.graph.out_links(WIKI + 'Root') == [WIKI + 'A', WIKI + 'B']
+
+
+def test_tag_score():
+    score = tag_score([('black', 'hole'), 'star'])
+
+    assert score("black hole", WIKI + "Black_hole") == 3
+    assert score("stars", WIKI + "Star") == 2
+    assert score("alpha", WIKI + "A") == 0
@@ -0,0 +1,73 @@
+import bz2
+from xml.sax.saxutils import escape
+
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.dump import DumpIngester, index_path, read_streams
+from wikicrawler.core.grabber import WikiGrabber
+from wikicrawler.core.utils.config import default_config
+
+
+def page_xml(title, text, ns=0, redirect=None):
+    redirect = '' if redirect is None else f'<redirect title="{escape(redirect)}" />'
+    return (f"<page><title>{escape(title)}</title><ns>{ns}</ns><id>1</id>{redirect}"
+            f"<revision><id>1</id><text bytes=\"{len(text)}\" xml:space=\"preserve\">{escape(text)}</text></revision></page>")
+
+
+def write_dump(path, pages, per_stream=100):
+    """ Writes a multistream dump of (title, text, ns, redirect) pages and its index, like the wikimedia dumps. """
+    streams = [b'<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/"><siteinfo></siteinfo>']
+    index = []
+    offset = len(bz2.compress(streams[0]))
+    for i in range(0, len(pages), per_stream):
+        chunk = pages[i:i + per_stream]
+        index += [f"{offset}:{i + j}:{page[0]}" for j, page in enumerate(chunk)]
+        streams.append(''.join(page_xml(*page) for page in chunk).encode())
+        offset += len(bz2.compress(streams[-1]))
+    streams.append(b'</mediawiki>')
+
+    with open(path, 'wb') as f:
+        for stream in streams:
+            f.write(bz2.compress(stream))
+    with bz2.open(index_path(path), 'wt', encoding='utf-8') as f:
+        f.write('\n'.join(index) + '\n')
+
+
+def test_ingests_articles(tmp_path):
+    dump = tmp_path / 'enwiki-pages-articles-multistream.xml.bz2'
+    pages = [(f"Page {i}", f"Page {i} links to [[Page {i + 1}|the next page]] and more.") for i in range(250)]
+    pages += [('Alias', '#REDIRECT [[Page 0]]', 0, 'Page 0'), ('Talk:Page 0', 'Hello.', 1, None)]
+    write_dump(dump, pages)
+
+    assert len(read_streams(index_path(dump))) == 3
+
+    config = default_config(str(tmp_path))
+    with WikiCacher(config) as cacher:
+        stats = DumpIngester(cacher, dump, processes=2, window=2, commit_every=1).ingest()
+
+    assert {key: stats[key] for key in ('streams', 'pages', 'redirects', 'skipped')} == {
+        'streams': 3, 'pages': 250, 'redirects': 1, 'skipped': 1}
+
+    with WikiCacher(config) as cacher:
+        grabber = WikiGrabber(config, cacher)
+        try:
+            page = grabber.retrieve("https://en.wikipedia.org/wiki/Page_7")
+            assert grabber.retrieve("https://en.wikipedia.org/wiki/Alias")['title'] == 'Page 0'
+            assert grabber.stats()['pool']['requests'] == 0
+        finally:
+            grabber.close()
+
+    assert page['title'] == 'Page 7'
+    assert page['paragraphs'] == ["Page 7 links to the next page and more.\n"]
+    assert page['paragraph_links'] == [{'the next page': "https://en.wikipedia.org/wiki/Page_8"}]
+
+
+def test_ingests_in_process(tmp_path):
+    dump = tmp_path / 'dump.xml.bz2'
+    write_dump(dump, [(f"Page {i}", "Text.") for i in range(30)], per_stream=10)
+
+    with WikiCacher(default_config(str(tmp_path))) as cacher:
+        stats = DumpIngester(cacher, dump, processes=0, latex=False).ingest(limit=2)
+
+        assert (stats['streams'], stats['pages']) == (2, 20)
+        assert "https://en.wikipedia.org/wiki/Page_19" in cacher
+        assert "https://en.wikipedia.org/wiki/Page_20" not in cacher
@@ -0,0 +1,60 @@
+import gzip
+import zlib
+
+import pytest
+
+from wikicrawler.core.net.encoding import accept_encoding, decoder
+from wikicrawler.core.utils.compression import CODECS, preferred_codec
+
+
+HTML = ("<p>The <a href=\"/wiki/Star\" title=\"Star\">star</a> at the center of the Solar System.</p>\n" * 200).encode()
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def decode(encoding, chunks):
+    body = decoder(encoding)
+    return b''.join(body.decompress(chunk) for chunk in chunks) + body.flush()
+
+
+def raw_deflate(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+@pytest.mark.parametrize('name', sorted(CODECS))
+def test_codecs_round_trip(name):
+    codec = CODECS[name]
+    stored = codec.compress(HTML)
+    assert len(stored) < len(HTML) / 10
+    assert codec.decompress(stored) == HTML
+    assert codec.decompress(codec.compress(b'')) == b''
+
+
+def test_preferred_codec_is_available():
+    assert preferred_codec() is CODECS.get('zstd-d1', CODECS['zlib-d1'])
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 1 << 16])
+def test_chunked_bodies_decode(size):
+    assert decode('gzip', chunked(gzip.compress(HTML), size)) == HTML
+    assert decode('x-gzip', chunked(gzip.compress(HTML), size)) == HTML
+    # Servers send deflate both zlib wrapped and raw.
+    assert decode('deflate', chunked(zlib.compress(HTML), size)) == HTML
+    assert decode('deflate', chunked(raw_deflate(HTML), size)) == HTML
+    assert decode(None, chunked(HTML, size)) == HTML
+
+
+def test_short_deflate_bodies_decode():
+    body = raw_deflate(HTML)
+    assert decode('deflate', [body[:1], b'', body[1:]]) == HTML
+    assert decode('deflate', [raw_deflate(b'')]) == b''
+    assert decode('deflate', []) == b''
+
+
+def test_unsupported_encodings_raise():
+    assert accept_encoding().startswith('gzip, deflate')
+    with pytest.raises(ValueError):
+        decoder('compress')
@@ -0,0 +1,85 @@
+import io
+
+import pytest
+
+from wikicrawler.core.grabber import WikiGrabber
+from wikicrawler.core.parse.extractor import PageExtractor, extract
+from wikicrawler.core.parse.streaming import stream_extract
+from wikicrawler.core.utils.config import default_config
+
+
+URL = "https://en.wikipedia.org/wiki/Star"
+
+PAGE = """<!DOCTYPE html><html><head><title>Star</title><script>var p = "<p>not text</p>";</script></head>
+<body><h1 id="firstHeading">Star <i>(astronomy)</i></h1>
+<div id="toc"><ul><li><a href="#Etymology"><span>1</span> <span>Etymology</span></a>
+<ul><li><a href="#Use">1.1 Use</a></li></ul></li><li><a href="#History">2 History</a></li></ul></div>
+<div id="mw-content-text"><div class="mw-parser-output">
+<p>A <b>star</b> is a <a href="/wiki/Plasma_(physics)" title="Plasma">plasma</a> &amp; &#8212; &nbsp;
+<a href="https://example.org">external</a><!-- comment --> held by <a href="/wiki/Gravity">gravity</a>.<br>
+<a href="/wiki/File:Sun.jpg" class="image"><img src="sun.jpg"></a></p>
+<p>
+</p><p>Unclosed <b>bold <i>italic</p><p>next</b> para</p>
+<p><style>.a{}</style>Styled <sup class="reference"><a href="#cite_note-1">[1]</a></sup></p>
+<div class="div-col"><ul><li><a href="/wiki/Sun" title="Sun">Sun</a></li>
+<li><a href="/wiki/Nova">no title</a></li><li><a href="https://example.org/x" title="X">x</a></li></ul></div>
+<ol class="references"><li id="cite_note-1"><cite><a class="external text" href="https://example.org/a">Ref A</a>
+<a class="external" href="https://example.org/b">Ref B</a></cite></li>
+<li id="cite_note-2">No link</li></ol>
+</div></div></body></html>"""
+
+
+@pytest.fixture
+def grabbers(tmp_path):
+    config = default_config(tmp_path)
+    return {extractor: WikiGrabber(dict(config, extractor=extractor)) for extractor in ('soup', 'single_pass')}
+
+
+def test_single_pass_matches_soup(grabbers):
+    soup_wiki = grabbers['soup'].extract_html(URL, PAGE)
+
+    assert grabbers['single_pass'].extract_html(URL, PAGE) == soup_wiki
+    assert soup_wiki['toc_links'] == {'Etymology': URL + '#Etymology', 'Use': URL + '#Use', 'History': URL + '#History'}
+    assert soup_wiki['see_also'] == {'Sun': 'https://en.wikipedia.org/wiki/Sun'}
+    assert soup_wiki['references'] == {'Ref A': 'https://example.org/a'}
+
+
+def test_references_decode_like_soup(grabbers):
+    references = "&#128; &#x9D; &#0; &#x110000; &#xD800; &#x1F600; &#65 &amp &unknown; &lt;p&gt; &NotGreaterFullEqual;"
+    page = PAGE.replace("&amp; &#8212; &nbsp;", references)
+    wiki = grabbers['single_pass'].extract_html(URL, page)
+
+    assert wiki == grabbers['soup'].extract_html(URL, page)
+    assert wiki['paragraphs'][0].startswith("A star is a plasma € \x9d \ufffd \ufffd \ufffd 😀 A ")
+    assert "<p> ≧̸" in wiki['paragraphs'][0]
+
+
+def test_single_pass_matches_soup_when_fed_in_chunks(grabbers):
+    wiki = grabbers['soup'].extract_html(URL, PAGE)
+    parts = extract(URL, PAGE)
+
+    for size in (1, 7, 64):
+        extractor = PageExtractor(URL)
+        for i in range(0, len(PAGE), size):
+            extractor.feed(PAGE[i:i + size])
+
+        assert extractor.close() == parts
+
+    assert parts['title'] == wiki['title']
+    # The grabber drops the link to the File: page, see LinkFilter.
+    assert [grabbers['soup'].links.filter(links) for links in parts['paragraph_links']] == wiki['paragraph_links']
+
+
+def test_stream_extract_splits_multibyte_characters():
+    page = PAGE.replace("Star <i>", "Étoile ☆ <i>")
+    parts, html = stream_extract(io.BytesIO(page.encode('utf-8')), URL, chunk_size=3, keep_html=True)
+
+    assert parts == extract(URL, page)
+    assert html == page
+    assert stream_extract(io.BytesIO(page.encode('utf-8')), URL)[1] is None
+
+
+def test_not_a_wiki_page(grabbers):
+    for grabber in grabbers.values():
+        with pytest.raises(AttributeError):
+            grabber.extract_html(URL, "<html><body><p>Nothing here.</p></body></html>")
@@ -0,0 +1,82 @@
+import os
+import shutil
+
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.db.graph import LinkGraph
+from wikicrawler.core.utils.config import default_config
+
+
+WIKI = "https://en.wikipedia.org/wiki/"
+
+
+def titles(urls):
+    return sorted(url[len(WIKI):] for url in urls)
+
+
+def test_link_graph(tmp_path):
+    path = str(tmp_path / 'links.graph')
+    with LinkGraph(path, min_compact=4) as graph:
+        graph.add(WIKI + 'A', [WIKI + 'B', WIKI + 'C', WIKI + 'A', "https://en.m.wikipedia.org/wiki/b#History"])
+        graph.add(WIKI + 'B', [WIKI + 'C'])
+        assert titles(graph.out_links(WIKI + 'A')) == ['B', 'C']
+        assert titles(graph.in_links(WIKI + 'C')) == ['A', 'B']
+
+        # The delta outgrows min_compact, the arrays are built with it.
+        graph.add(WIKI + 'C', [WIKI + 'A', WIKI + 'Sol'])
+        assert graph.stats()['delta'] == 0 and graph.stats()['edges'] == 5
+
+        # They are only saved by a flush, a crash before it leaves the files as they were.
+        assert not os.path.exists(path + '/csr.npz') and len(LinkGraph(path)) == 0
+        graph.flush()
+        assert LinkGraph(path).stats()['edges'] == 5
+
+        # Links replace those a page had, and links to a redirect are links to its page.
+        graph.add(WIKI + 'B', [WIKI + 'A'])
+        graph.redirect(WIKI + 'Sol', WIKI + 'A')
+        assert titles(graph.in_links(WIKI + 'A')) == ['B', 'C']
+        assert titles(graph.in_links(WIKI + 'C')) == ['A']
+        assert titles(graph.out_links(WIKI + 'C')) == ['A']
+
+    # The changes since the arrays were built are replayed from the log.
+    with LinkGraph(path, min_compact=4) as graph:
+        assert graph.stats()['delta'] == 1
+        assert titles(graph.in_links(WIKI + 'A')) == ['B', 'C']
+        assert titles(graph.in_links(WIKI + 'Sol')) == ['B', 'C']
+
+        offsets, targets = graph.csr()
+        assert len(offsets) == len(graph) + 1 and len(targets) == graph.stats()['edges'] == 4
+        assert [graph.url(i)[len(WIKI):] for i in targets[offsets[graph.id(WIKI + 'A')]:offsets[graph.id(WIKI + 'A') + 1]]] == ['B', 'C']
+
+        # A record cut short by a crash is ignored.
+        graph.add(WIKI + 'D', [WIKI + 'A'])
+        graph.flush()
+    with open(path + '/log.bin', 'r+b') as f:
+        f.truncate(f.seek(0, 2) - 2)
+    with LinkGraph(path) as graph:
+        assert graph.out_links(WIKI + 'D') == []
+        assert graph.stats()['edges'] == 4
+
+
+def test_cacher_keeps_the_link_graph(tmp_path):
+    def page(title, *targets):
+        return {'url': WIKI + title, 'title': title, 'paragraphs': [], 'toc_links': {}, 'references': [],
+                'paragraph_links': [{target: WIKI + target for target in targets}],
+                'see_also': {'External': "https://example.org/", 'Help': WIKI + 'B'}}
+
+    config = default_config(str(tmp_path))
+    with WikiCacher(config) as cacher:
+        cacher.cache(page('A', 'B', 'C'))
+        cacher.cache_many([page('B', 'Moon'), page('C', 'A')])
+        cacher.alias(WIKI + 'Moon', WIKI + 'C')
+
+        assert titles(cacher.graph.out_links(WIKI + 'A')) == ['B', 'C']
+        assert titles(cacher.graph.in_links(WIKI + 'C')) == ['A', 'B']
+
+    # A cache whose graph is missing has it built again from its pages and aliases.
+    shutil.rmtree(tmp_path / 'databases' / 'arbiter.graph')
+    with WikiCacher(config) as cacher:
+        assert titles(cacher.graph.in_links(WIKI + 'C')) == ['A', 'B']
+        assert cacher.graph.stats()['redirects'] == 1
+
+    with WikiCacher(dict(config, link_graph=False)) as cacher:
+        assert cacher.graph is None
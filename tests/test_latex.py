@@ -0,0 +1,37 @@
+from wikicrawler.core.parse.latex import LatexConverter, latex_key, may_contain_latex
+
+
+PARAGRAPHS = ["A star is a luminous spheroid of plasma, it's held together by its gravity.\n",
+              "Mass–luminosity: $L \\propto M^{3.5}$ for stars 2--20 times the Sun's mass.\n",
+              "Spanish ?`Qué? and ``quoted'' text, 50% of it & more~here {grouped}.\n",
+              "\n"]
+
+
+def test_pre_filter_only_skips_what_conversion_keeps():
+    plain = LatexConverter(skip_prose=False, memoize=False)
+
+    for paragraph in PARAGRAPHS:
+        if not may_contain_latex(paragraph):
+            assert plain.convert([paragraph]) == [paragraph]
+
+    assert [may_contain_latex(paragraph) for paragraph in PARAGRAPHS] == [False, True, True, False]
+
+
+def test_memo_matches_conversion_and_round_trips():
+    expected = LatexConverter(skip_prose=False, memoize=False).convert(PARAGRAPHS)
+
+    converter = LatexConverter()
+    assert converter.convert(PARAGRAPHS) == expected
+    assert converter.convert(PARAGRAPHS) == expected
+
+    stats = converter.stats()
+    assert (stats['skipped'], stats['converted'], stats['memo_hits']) == (4, 2, 2)
+
+    entries, counts = converter.drain()
+    assert set(entries) == {latex_key(PARAGRAPHS[1]), latex_key(PARAGRAPHS[2])}
+    assert counts['paragraphs'] == 8
+    assert converter.drain() == ({}, dict.fromkeys(counts, 0))
+
+    restored = LatexConverter(memo=entries)
+    assert restored.convert(PARAGRAPHS) == expected
+    assert restored.stats()['converted'] == 0
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from wikicrawler.core.net.limiter import RateLimiter, TokenBucket
+
+
+def test_burst_is_free():
+    bucket = TokenBucket(rate=1, burst=5)
+
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+
+
+def test_waiters_are_spaced_by_rate():
+    bucket = TokenBucket(rate=100, burst=1)
+    bucket.reserve()
+
+    waits = [bucket.reserve() for _ in range(3)]
+
+    assert waits == pytest.approx([0.01, 0.02, 0.03], abs=0.005)
+
+
+def test_shared_across_threads():
+    limiter = RateLimiter(rate=50, burst=5)
+    start = time.monotonic()
+
+    threads = [threading.Thread(target=limiter.acquire, args=("en.wikipedia.org",)) for _ in range(15)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 5 burst tokens, the other 10 arrive at 50/s.
+    assert time.monotonic() - start == pytest.approx(0.2, abs=0.1)
+
+
+def test_hosts_are_independent():
+    limiter = RateLimiter(rate=1, burst=1)
+
+    assert limiter.acquire("en.wikipedia.org") == 0.0
+    assert limiter.acquire("de.wikipedia.org") == 0.0
+
+
+def test_async_acquire():
+    limiter = RateLimiter(rate=100, burst=2)
+
+    async def run():
+        return await asyncio.gather(*[limiter.acquire_async("en.wikipedia.org") for _ in range(4)])
+
+    waits = asyncio.run(run())
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[3] == pytest.approx(0.02, abs=0.005)
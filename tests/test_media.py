@@ -0,0 +1,168 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.media.downloader import MediaDownloader
+from wikicrawler.core.media.store import MediaStore
+from wikicrawler.core.net.limiter import RateLimiter
+from wikicrawler.core.net.pool import ConnectionPool
+from wikicrawler.core.utils.config import default_config
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    hits = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        hits = self.hits[self.path] = self.hits.get(self.path, 0) + 1
+
+        if self.path == '/missing.png' or (self.path == '/flaky.png' and hits <= 2):
+            self.send_response(404 if self.path == '/missing.png' else 503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = b'same' * 1000 if self.path.startswith('/same') else self.path.encode() * 1000
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    MediaHandler.hits = {}
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), MediaHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    yield f"http://127.0.0.1:{httpd.server_port}"
+
+    httpd.shutdown()
+
+
+def downloader(cacher=None, store=None):
+    return MediaDownloader(ConnectionPool(), RateLimiter(rate=1000, burst=100), cacher, workers=2,
+                           max_retries=3, backoff=0.01, store=store)
+
+
+def wait(downloader, count, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        progress = downloader.progress()
+        if progress['done'] + progress['failed'] >= count:
+            return progress
+        time.sleep(0.01)
+
+    raise TimeoutError(progress)
+
+
+def test_downloads_retries_and_fails(server, tmp_path):
+    with downloader() as media:
+        urls = [f"{server}/{name}.png" for name in ('a', 'b', 'flaky', 'missing')]
+        assert media.enqueue((url, tmp_path / url.rsplit('/', 1)[1]) for url in urls) == 4
+        assert media.enqueue([(urls[0], tmp_path / 'a.png')]) == 0
+
+        progress = wait(media, 4)
+
+    assert (progress['done'], progress['failed'], progress['pending']) == (3, 1, 0)
+    assert (tmp_path / 'flaky.png').read_bytes() == b'/flaky.png' * 1000
+    assert media.status(urls[2])['attempts'] == 3
+    assert media.failed() == {urls[3]: 'HTTP 404'}
+    assert MediaHandler.hits['/missing.png'] == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['a.png', 'b.png', 'flaky.png']
+
+
+def test_queue_survives_restarts(server, tmp_path):
+    config = default_config(str(tmp_path))
+    url = f"{server}/a.png"
+
+    with WikiCacher(config) as cacher:
+        media = downloader(cacher)
+        media.start = lambda: False
+        media.enqueue([(url, tmp_path / 'a.png')])
+        media.poll()
+
+    with WikiCacher(config) as cacher:
+        assert cacher.media_pending() == [(url, str(tmp_path / 'a.png'), 0)]
+
+        with downloader(cacher) as media:
+            media.resume()
+            assert wait(media, 1)['done'] == 1
+
+        assert cacher.media_pending() == []
+        assert (tmp_path / 'a.png').read_bytes() == b'/a.png' * 1000
+
+
+def test_store_deduplicates_and_evicts(server, tmp_path):
+    config = default_config(str(tmp_path))
+
+    with WikiCacher(config) as cacher:
+        store = MediaStore(tmp_path / 'media', cacher, budget=12000)
+        with downloader(cacher, store) as media:
+            media.enqueue([(f"{server}/same-1.png", 'File:One.png'), (f"{server}/same-2.png", 'File:Two.png')])
+            wait(media, 2)
+            media.enqueue([(f"{server}/same-1.png", 'File:One.png'), (f"{server}/other.png", 'File:One.png')])
+            assert media.progress()['pending'] == 0
+
+            assert store.path('File:One.png') == store.path('File:Two.png')
+            assert store.stats()['blobs'] == 1
+
+            media.enqueue([(f"{server}/c.png", 'File:C.png')])
+            wait(media, 3)
+            media.enqueue([(f"{server}/d.png", 'File:D.png')])
+            wait(media, 4)
+
+        assert store.stats() == {'titles': 2, 'blobs': 2, 'bytes': 12000, 'budget': 12000, 'evictions': 1}
+        assert not store.has('File:One.png') and not store.has('File:Two.png')
+        assert store.path('File:C.png').read_bytes() == b'/c.png' * 1000
+
+    with WikiCacher(config) as cacher:
+        restored = MediaStore(tmp_path / 'media', cacher, budget=12000)
+        restored.load()
+
+        assert restored.stats() == dict(store.stats(), evictions=0)
+        assert restored.path('File:D.png') == store.path('File:D.png')
+        assert len([path for path in (tmp_path / 'media').rglob('*') if path.is_file()]) == 2
+
+
+def test_store_keeps_blobs_ingested_before_an_eviction(tmp_path):
+    store = MediaStore(tmp_path / 'media', budget=2000)
+
+    def ingest(name, content):
+        tmp = store.incoming / name
+        tmp.write_bytes(content)
+        store.ingest(tmp, name)
+
+    ingest('a' * 64, b'a' * 1000)
+    store.add('File:A.png', 'a' * 64, 1000)
+
+    # A second download of A is ingested, then another blob is added and evicts the least recently used.
+    ingest('a' * 64, b'a' * 1000)
+    ingest('b' * 64, b'b' * 1000)
+    ingest('c' * 64, b'c' * 1000)
+    store.add('File:B.png', 'b' * 64, 1000)
+    store.add('File:C.png', 'c' * 64, 1000)
+    store.add('File:Again.png', 'a' * 64, 1000)
+
+    assert store.path('File:Again.png').read_bytes() == b'a' * 1000
+    assert store.stats()['evictions'] == 1 and not store.has('File:B.png')
+    assert not store.blob_path('b' * 64).exists()
+
+
+def test_has_marks_media_used(tmp_path):
+    store = MediaStore(tmp_path / 'media', budget=2000)
+    for name in ('a', 'b', 'c'):
+        tmp = store.incoming / name
+        tmp.write_bytes(b'x' * 1000 + name.encode())
+        store.ingest(tmp, name * 64)
+        store.add(f"File:{name}.png", name * 64, 1000)
+        # A is held for every page, so it stays the most recently used.
+        assert store.has('File:a.png')
+
+    assert store.has('File:c.png') and not store.has('File:b.png')
@@ -0,0 +1,113 @@
+import os
+import time
+
+from wikicrawler.core.crawler import WikiCrawler
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.db.frontier import SqliteFrontier
+from wikicrawler.core.utils.config import default_config
+
+
+WIKI = "https://en.wikipedia.org/wiki/"
+
+
+def test_leases_are_reclaimed(tmp_path):
+    path = tmp_path / 'frontier.db'
+    with SqliteFrontier(path, lease=0.2) as frontier, SqliteFrontier(path, lease=0.2) as other:
+        assert frontier.push([(WIKI + 'A', 0, 0.0), (WIKI + 'B', 1, 1.0), (WIKI + 'A', 0, 0.0)]) == 2
+
+        assert frontier.claim('dead') == [(WIKI + 'A', 0)]
+        assert other.claim('alive', n=2) == [(WIKI + 'B', 1)]
+        assert other.claim('alive') == []
+
+        # The lease of the worker which died runs out, and the url is claimed again.
+        time.sleep(0.3)
+        other.done(WIKI + 'B')
+        assert other.claim('alive') == [(WIKI + 'A', 0)]
+        other.done(WIKI + 'A', failed=True)
+
+        assert frontier.pending() == 0
+        assert frontier.counts() == {'queued': 0, 'leased': 0, 'done': 1, 'failed': 1}
+
+
+def test_dfs_claims_the_most_recent_first(tmp_path):
+    path = tmp_path / 'frontier.db'
+    with SqliteFrontier(path, lifo=True) as frontier, SqliteFrontier(path) as fifo:
+        # Like a 'dfs' Frontier, the deepest first, then the most recently queued.
+        frontier.push([(WIKI + 'A', 1, -1.0), (WIKI + 'B', 1, -1.0), (WIKI + 'C', 0, 0.0)])
+        frontier.push([(WIKI + 'D', 1, -1.0)])
+        assert frontier.claim('worker', n=4) == [(WIKI + 'D', 1), (WIKI + 'B', 1), (WIKI + 'A', 1), (WIKI + 'C', 0)]
+
+        frontier.release()
+        assert fifo.claim('worker', n=4) == [(WIKI + 'A', 1), (WIKI + 'B', 1), (WIKI + 'D', 1), (WIKI + 'C', 0)]
+
+
+def test_multiprocess_crawl(tmp_path, wiki):
+    for i in range(20):
+        links = ' '.join(f"[[Page {j}]]" for j in (2 * i + 1, 2 * i + 2) if j < 20)
+        wiki.pages[f"Page {i}"] = f"Page {i} links to {links} and [[Help:Contents|help]]."
+    wiki.redirects['Alias'] = 'Page 3'
+    wiki.pages['Page 1'] += " See [[Alias]]."
+
+    config = default_config(str(tmp_path))
+    config.update(api_url=wiki.api_url, backend='query', latex=False,
+                  rate_limit={'anonymous': {'rate': 1000, 'burst': 100}})
+    with WikiCacher(config) as cacher:
+        crawler = WikiCrawler(config, cacher=cacher)
+        try:
+            crawl = crawler.traverse(WIKI + 'Page_0', processes=2, max_depth=None, max_pages=None)
+            pages = [(depth, page['title']) for depth, page in crawl]
+            stats = crawl.stats()
+            crawl.close()
+
+            assert sorted(title for _, title in pages) == sorted(f"Page {i}" for i in range(20))
+            assert dict((title, depth) for depth, title in pages)['Page 19'] == 4
+            assert (stats['pages'], stats['fetched'], stats['failed'], stats['frontier']) == (20, 21, 0, 0)
+            assert stats['duplicates'] == 1
+            assert sum(worker['fetched'] for worker in stats['workers'].values()) == 21
+            # The crawl finished, only its checkpoint is kept.
+            assert not any(path.suffix == '.seen' or path.name.startswith('frontier-')
+                           for path in (tmp_path / 'databases').iterdir())
+
+            # Every page is in the cache, a second crawl reads them all from it.
+            crawl = crawler.traverse(WIKI + 'Page_0', processes=2, max_depth=None, max_pages=None)
+            assert len(list(crawl)) == 20
+            assert (crawl.stats()['fetched'], crawl.stats()['cached']) == (0, 20)
+            crawl.close()
+        finally:
+            crawler.close()
+
+
+def test_resume_multiprocess_crawl(tmp_path, wiki):
+    for i in range(10):
+        wiki.pages[f"Page {i}"] = f"Page {i} links to [[Page {i + 1}]]." if i < 9 else "The last page."
+
+    config = default_config(str(tmp_path))
+    config.update(api_url=wiki.api_url, backend='query', latex=False, crawl_checkpoint_every=1,
+                  rate_limit={'anonymous': {'rate': 1000, 'burst': 100}})
+    with WikiCacher(config) as cacher:
+        crawler = WikiCrawler(config, cacher=cacher)
+        try:
+            crawl = crawler.traverse(WIKI + 'Page_0', processes=2, max_depth=None, max_pages=4)
+            first = [page['title'] for _, page in crawl]
+            crawl.close()
+            assert os.path.exists(crawl.path)
+        finally:
+            crawler.close()
+
+    with WikiCacher(config) as cacher:
+        crawler = WikiCrawler(config, cacher=cacher)
+        try:
+            crawl = crawler.resume(crawler.crawls()[0]['crawl_id'])
+            crawl.max_pages = None
+            rest = [page['title'] for _, page in crawl]
+            stats = crawl.stats()
+            crawl.close()
+
+            assert first + rest == [f"Page {i}" for i in range(10)]
+            # Every page was fetched once, by one crawl or the other.
+            titles = [title for request in wiki.requests for title in request['titles'].split('|')]
+            assert sorted(titles) == sorted(f"Page {i}" for i in range(10))
+            assert (stats['pages'], stats['frontier']) == (10, 0)
+            assert not os.path.exists(crawl.path)
+        finally:
+            crawler.close()
@@ -0,0 +1,61 @@
+from wikicrawler.core.crawler import WikiCrawler
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.parse.wikitext import title_url
+from wikicrawler.core.utils.config import default_config
+
+
+def links(*titles):
+    return ' '.join(f"[[{title}]]" for title in titles) + '.'
+
+
+def tree_wiki(wiki):
+    """ Start links to 5 pages, which link to 5 more each, which link to pages which do not exist.
+    One of them links to Middle, which links to Goal. """
+    wiki.pages = {'Start': links(*[f"T {i}" for i in range(5)]), 'Middle': links('Goal'), 'Goal': "The end.",
+                  'Island': "Nothing links here."}
+    for i in range(5):
+        wiki.pages[f"T {i}"] = links(*[f"T {i} {j}" for j in range(5)])
+        for j in range(5):
+            wiki.pages[f"T {i} {j}"] = links(*[f"U {i} {j} {k}" for k in range(5)])
+    wiki.pages['T 0 0'] = links(*[f"U 0 0 {k}" for k in range(5)], 'Mid')
+    wiki.redirects = {'Mid': 'Middle'}
+
+
+def test_path(wiki, tmp_path):
+    tree_wiki(wiki)
+    config = default_config(str(tmp_path))
+    config.update(api_url=wiki.api_url, backend='query', latex=False,
+                  rate_limit={'anonymous': {'rate': 1000, 'burst': 100}})
+    expected = [title_url(title) for title in ('Start', 'T 0', 'T 0 0', 'Middle', 'Goal')]
+
+    with WikiCacher(config) as cacher:
+        crawler = WikiCrawler(config, cacher=cacher)
+        try:
+            # From both ends, the backward search follows the backlinks of Goal, through the redirect to Middle.
+            # Start was retrieved looking it up, its links are in the link graph.
+            path, stats = crawler.path(title_url('Start'), title_url('Goal'))
+            assert path == expected
+            assert stats['retrieved'] == 0 and stats['backlinks'] == 3
+            assert stats['forward'] == 1 and stats['backward'] == 3
+
+            # Forward only, every page up to the middle is retrieved.
+            path, naive = crawler.path(title_url('Start'), title_url('Goal'), bidirectional=False)
+            assert path == expected
+            assert naive['retrieved'] > 25 and naive['expanded'] > 5 * stats['expanded']
+
+            path, _ = crawler.path(title_url('Goal'), title_url('Island'))
+            assert path is None
+        finally:
+            crawler.close()
+
+    # Once the pages are cached, the path is found from the link graph without a request.
+    requests = len(wiki.requests)
+    with WikiCacher(dict(config, path_backlinks=0)) as cacher:
+        crawler = WikiCrawler(cacher.config, cacher=cacher)
+        try:
+            path, stats = crawler.path(title_url('Start'), title_url('Goal'))
+            assert path == expected
+            assert stats['retrieved'] == stats['backlinks'] == 0
+            assert len(wiki.requests) == requests
+        finally:
+            crawler.close()
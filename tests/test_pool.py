@@ -0,0 +1,122 @@
+import gzip
+import threading
+import time
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from wikicrawler.core.net.pool import ConnectionPool
+
+
+BODY = b"<p>The Sun is a star.</p>" * 100
+
+
+class PoolHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # The client address of every request, one per connection opened.
+    clients = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.clients.append(self.client_address)
+
+        if self.path.startswith('/loop'):
+            return self.redirect(f"/loop{len(self.path)}")
+        if self.path == '/moved':
+            return self.redirect('/page')
+
+        body = gzip.compress(BODY) if self.path == '/gzip' else BODY
+        self.send_response(200)
+        if self.path == '/gzip':
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        # Drops the connection without saying so, like a server timing out a kept-alive socket.
+        if self.path == '/drop':
+            self.close_connection = True
+
+    def redirect(self, location):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@pytest.fixture
+def server():
+    PoolHandler.clients = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), PoolHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    yield f"http://127.0.0.1:{httpd.server_port}"
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def connections():
+    return len(set(PoolHandler.clients))
+
+
+def test_connections_are_reused(server):
+    with ConnectionPool() as pool:
+        for _ in range(3):
+            with pool.request(server + '/page') as response:
+                assert response.read() == BODY
+
+        with pool.request(server + '/gzip') as response:
+            assert response.read() == BODY
+
+        stats = pool.stats()
+        assert connections() == 1
+        assert (stats['requests'], stats['reused'], stats['opened']) == (4, 3, 1)
+        assert stats['idle_connections'] == stats['open_connections'] == 1
+        assert stats['bytes_decoded'] == 4 * len(BODY) and stats['wire_savings'] > 0
+
+
+def test_redirects_are_followed(server):
+    with ConnectionPool() as pool:
+        with pool.request(server + '/moved') as response:
+            assert response.geturl() == server + '/page'
+            assert response.read() == BODY
+        assert connections() == 1
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            pool.request(server + '/loop', max_redirects=3)
+        assert error.value.code == 302 and error.value.reason == "Too many redirects"
+        # The first request and three redirects.
+        assert len(PoolHandler.clients) == 2 + 4
+
+
+def test_dropped_connections_are_retried(server):
+    with ConnectionPool() as pool:
+        with pool.request(server + '/drop') as response:
+            assert response.read() == BODY
+
+        # The pooled connection was closed by the server, the request is sent again on a new one.
+        with pool.request(server + '/page') as response:
+            assert response.read() == BODY
+
+        stats = pool.stats()
+        assert connections() == 2
+        assert (stats['requests'], stats['reused'], stats['opened']) == (2, 0, 2)
+        assert stats['open_connections'] == 1
+
+
+def test_idle_connections_expire(server):
+    with ConnectionPool(idle_timeout=0.1) as pool:
+        with pool.request(server + '/page') as response:
+            response.read()
+        time.sleep(0.2)
+        with pool.request(server + '/page') as response:
+            response.read()
+
+        stats = pool.stats()
+        assert connections() == 2
+        assert (stats['reused'], stats['opened'], stats['open_connections']) == (0, 2, 1)
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from wikicrawler.core.prefetch import Prefetcher
+
+
+class Grabber:
+    """ Stands in for a WikiGrabber, fetching pages once it is released. """
+    def __init__(self):
+        self.cacher = None
+        self.release = threading.Event()
+        self.fetched = []
+        self.cached = []
+        self.retrieved = []
+        self.main = threading.current_thread()
+
+    def fetch_extract(self, url):
+        self.release.wait(5)
+        if url.endswith('missing'):
+            raise AttributeError(url)
+
+        self.fetched.append(url)
+        return {'url': url}, f"<html>{url}</html>"
+
+    def cache(self, wiki, html=None):
+        assert threading.current_thread() is self.main
+        self.cached.append(wiki['url'])
+
+    def retrieve(self, url):
+        self.retrieved.append(url)
+        return {'url': url, 'retrieved': True}
+
+
+def test_prefetches_by_priority():
+    grabber = Grabber()
+    prefetcher = Prefetcher(grabber, workers=1, priority=2)
+    try:
+        prefetcher.submit(['blocker'])
+        time.sleep(0.05)
+        futures = prefetcher.submit([f"page{i}" for i in range(6)])
+
+        # The fourth page is asked for while the first ones are still queued.
+        threading.Timer(0.05, grabber.release.set).start()
+        assert futures[3]() == {'url': 'page3'}
+        assert grabber.fetched[:2] == ['blocker', 'page3']
+
+        for future in futures:
+            future.result(5)
+        assert grabber.fetched[2:] == ['page0', 'page1', 'page2', 'page4', 'page5']
+
+        prefetcher.poll()
+        assert sorted(grabber.cached) == sorted(['blocker'] + [f"page{i}" for i in range(6)])
+        assert prefetcher.pending('page5') is None
+        assert prefetcher.stats()['waited'] == 1
+    finally:
+        prefetcher.close()
+
+
+def test_new_search_cancels_queued_pages():
+    grabber = Grabber()
+    prefetcher = Prefetcher(grabber, workers=1, priority=1)
+    try:
+        old = prefetcher.submit(['a', 'b', 'c'])
+        time.sleep(0.05)
+
+        assert prefetcher.cancel() == 2
+        new = prefetcher.submit(['d', 'missing'])
+        grabber.release.set()
+
+        assert new[0]() == {'url': 'd'}
+        assert old[0]() == {'url': 'a'}
+        assert old[2]() == {'url': 'c', 'retrieved': True}
+        with pytest.raises(AttributeError):
+            new[1]()
+
+        assert grabber.fetched == ['a', 'd']
+        stats = prefetcher.stats()
+        assert (stats['submitted'], stats['fetched'], stats['failed'], stats['cancelled']) == (5, 2, 1, 2)
+    finally:
+        prefetcher.close()
@@ -0,0 +1,72 @@
+import networkx as nx
+import numpy as np
+
+from wikicrawler.core.db.graph import LinkGraph
+from wikicrawler.core.rank import PageRanker
+
+
+WIKI = "https://en.wikipedia.org/wiki/"
+
+
+def random_links(pages, seed=0):
+    rng = np.random.default_rng(seed)
+    # The last pages link nowhere.
+    return {i: sorted(set(rng.integers(0, pages, rng.integers(1, 6)).tolist()) - {i}) if i < pages - 3 else []
+            for i in range(pages)}
+
+
+def as_graph(path, links):
+    graph = LinkGraph(path)
+    for i in links:
+        graph.id(f"{WIKI}{i}", create=True)
+    for i, targets in links.items():
+        graph.add(f"{WIKI}{i}", [f"{WIKI}{j}" for j in targets], canonical=True)
+    return graph
+
+
+def as_networkx(links):
+    graph = nx.DiGraph()
+    graph.add_nodes_from(links)
+    graph.add_edges_from((i, j) for i, targets in links.items() for j in targets)
+    return graph
+
+
+def test_pagerank_matches_networkx(tmp_path):
+    links = random_links(200)
+    graph = as_graph(str(tmp_path / 'links.graph'), links)
+    ranker = PageRanker(graph, tol=1e-10)
+
+    ranks = ranker.ranks()
+    expected = nx.pagerank(as_networkx(links), tol=1e-12)
+    assert abs(ranks.sum() - 1) < 1e-9
+    assert max(abs(ranks[i] - expected[i]) for i in links) < 1e-8
+
+    around = ranker.ranks(around=[5, 7])
+    expected = nx.pagerank(as_networkx(links), personalization={5: 1, 7: 1}, tol=1e-12)
+    assert max(abs(around[i] - expected[i]) for i in links) < 1e-8
+
+    # Ranks are kept until the graph changes.
+    assert ranker.ranks() is ranks and ranker.ranks(around=[7, 5]) is around
+
+    # Then they start from the previous ones, and take fewer iterations.
+    cold = PageRanker(graph, tol=1e-10)
+    graph.add(f"{WIKI}200", [f"{WIKI}0", f"{WIKI}1"], canonical=True)
+    links[200] = [0, 1]
+    ranks = ranker.ranks()
+    assert ranker.last['warm'] and ranker.last['nodes'] == 201
+    cold.ranks()
+    assert ranker.last['iterations'] < cold.last['iterations']
+
+    expected = nx.pagerank(as_networkx(links), tol=1e-12)
+    assert max(abs(ranks[i] - expected[i]) for i in links) < 1e-8
+
+
+def test_top(tmp_path):
+    graph = as_graph(str(tmp_path / 'links.graph'), {0: [1, 2, 3], 1: [2], 2: [3], 3: [2]})
+    ranker = PageRanker(graph)
+    ranks = ranker.ranks(around=[0])
+
+    top = ranker.top(ranks, graph.out_ids(0), n=2)
+    assert [i for i, _ in top] == [2, 3]
+    assert top[0][1] >= top[1][1]
+    assert [i for i, _ in ranker.top(ranks, graph.out_ids(0), exclude={2})] == [3, 1]
@@ -0,0 +1,51 @@
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.media.resolver import MediaResolver, file_title
+from wikicrawler.core.net.limiter import RateLimiter
+from wikicrawler.core.net.pool import ConnectionPool
+from wikicrawler.core.utils.config import default_config
+
+
+def resolver(wiki, cacher=None):
+    return MediaResolver(ConnectionPool(), RateLimiter(rate=1000, burst=100), wiki.api_url, cacher)
+
+
+def test_file_title():
+    assert file_title('/wiki/File:Sun_(star).jpg') == 'File:Sun (star).jpg'
+    assert file_title('/wiki/File:%C3%89toile.png') == 'File:Étoile.png'
+
+
+def test_resolves_in_batches(wiki):
+    wiki.files = {f"File:Image {i}.png": f"https://upload.example.org/{i}.png" for i in range(120)}
+    titles = [f"File:Image_{i}.png" for i in range(120)] + ['File:Missing.png', 'File:Image_0.png']
+
+    media = resolver(wiki)
+    infos = media.resolve(titles)
+
+    assert len(wiki.requests) == 3
+    assert max(len(request['titles'].split('|')) for request in wiki.requests) == 50
+    assert infos['File:Image_7.png']['url'] == "https://upload.example.org/7.png"
+    assert infos['File:Missing.png'] is None
+    assert len(infos) == 121
+
+    assert media.resolve(['File:Image_3.png', 'File:Missing.png']) == {
+        'File:Image_3.png': infos['File:Image_3.png'], 'File:Missing.png': None}
+    assert media.stats() == {'titles': 121, 'requests': 3, 'cache_hits': 3}
+
+
+def test_resolved_titles_are_cached(wiki, tmp_path):
+    config = default_config(str(tmp_path))
+    wiki.files = {'File:Sun.jpg': "https://upload.example.org/sun.jpg"}
+
+    with WikiCacher(config) as cacher:
+        media = resolver(wiki, cacher)
+        media.resolve(['File:Sun.jpg', 'File:Moon.jpg'])
+        media.flush()
+
+    with WikiCacher(config) as cacher:
+        media = resolver(wiki, cacher)
+        media.load()
+
+        assert media.resolve(['File:Sun.jpg', 'File:Moon.jpg']) == {
+            'File:Sun.jpg': {'url': "https://upload.example.org/sun.jpg", 'sha1': 'sha1-File:Sun.jpg', 'size': 34},
+            'File:Moon.jpg': None}
+        assert len(wiki.requests) == 1
@@ -0,0 +1,98 @@
+from wikicrawler.core.db.cacher import WikiCacher
+from wikicrawler.core.seeker import WikiSeeker, normalize_phrase
+from wikicrawler.core.utils.config import default_config
+
+
+ARTICLE = """<html><body><h1 id="firstHeading">Sun</h1><div id="mw-content-text"><div class="mw-parser-output">
+<p>The <a href="/wiki/Star" title="Star">star</a> at the center of the Solar System.</p></div></div></body></html>"""
+
+DISAMBIGUATION = """<html><body><h1 id="firstHeading">Mercury</h1><div id="mw-content-text"><div class="mw-parser-output">
+<p>Mercury may refer to:</p><ul><li><a href="/wiki/Mercury_(planet)" title="Mercury (planet)">the planet</a></li>
+<li><a href="/wiki/Mercury_(element)" title="Mercury (element)">the element</a></li></ul></div></div>
+<div id="catlinks" class="catlinks"><a href="/wiki/Category:Disambiguation_pages" title="Category:Disambiguation pages">
+Disambiguation pages</a></div></body></html>"""
+
+SEARCH = """<html><body><h1 id="firstHeading">Search results</h1><div id="mw-content-text"><div class="mw-parser-output">
+<ul class="mw-search-results"><li><a href="/wiki/Sol_(star)" title="Sol (star)">Sol</a></li>
+<li><a href="/wiki/Sol_(currency)" title="Sol (currency)">Sol</a></li></ul></div></div></body></html>"""
+
+
+class Seeker(WikiSeeker):
+    """ A WikiSeeker whose searches land on canned pages instead of wikipedia. """
+    landing = {'sun': ("https://en.wikipedia.org/wiki/Sun", ARTICLE),
+               'mercury': ("https://en.wikipedia.org/wiki/Mercury", DISAMBIGUATION),
+               'sol': ("https://en.wikipedia.org/wiki/Special:Search?search=sol&fulltext=1", SEARCH)}
+
+    def __init__(self, config, cacher):
+        super().__init__(config, cacher=cacher)
+        self.fetched = []
+
+    def fetch_html(self, url):
+        self.fetched.append(url)
+        phrase = url.split('search=')[1].rstrip('&').lower()
+        return self.landing[phrase]
+
+
+def test_normalize_phrase():
+    assert normalize_phrase("  the\tSun  king ") == "The Sun king"
+    assert normalize_phrase("us") == normalize_phrase("Us") != normalize_phrase("US")
+
+
+def test_search_cache(tmp_path):
+    config = default_config(str(tmp_path))
+    with WikiCacher(config) as cacher:
+        seeker = Seeker(config, cacher)
+        try:
+            [(_, page)] = list(seeker.search("Sun"))
+            assert page['title'] == 'Sun'
+            assert [title for title, _ in seeker.search("mercury")] == [
+                "/wiki/Mercury_(planet)", "/wiki/Mercury_(element)"]
+            assert len(seeker.fetched) == 2
+
+            [(_, page)] = list(seeker.search("  sun "))
+            assert page['title'] == 'Sun'
+            assert [title for title, _ in seeker.search("Mercury")] == [
+                "/wiki/Mercury_(planet)", "/wiki/Mercury_(element)"]
+            assert len(seeker.fetched) == 2
+            assert cacher.search_results("Mercury")['kind'] == 'disambiguation'
+            assert cacher.search_results("Sun")['kind'] == 'page'
+
+            seeker.search_cache_ttl = -1
+            list(seeker.search("Sun"))
+            assert len(seeker.fetched) == 3
+            assert seeker.stats()['search_cache'] == {'hits': 2, 'misses': 2, 'expired': 1}
+        finally:
+            seeker.close()
+
+
+def test_search_cancels_prefetches_before_iterating(tmp_path):
+    config = default_config(str(tmp_path))
+    with WikiCacher(config) as cacher:
+        seeker = Seeker(config, cacher)
+        try:
+            cancelled = []
+            seeker.prefetcher.cancel = lambda: cancelled.append(True) or 0
+
+            results = seeker.search("Sun")
+            assert cancelled == [True] and seeker.fetched == []
+
+            [(_, page)] = list(results)
+            assert page['title'] == 'Sun' and cancelled == [True]
+        finally:
+            seeker.close()
+
+
+def test_search_results_are_served_from_the_cache(tmp_path):
+    config = default_config(str(tmp_path))
+    with WikiCacher(config) as cacher:
+        seeker = Seeker(config, cacher)
+        try:
+            first = [title for title, _ in seeker.search("sol", prefetch=False)]
+            assert first[:2] == ["/wiki/Sol_(star)", "/wiki/Sol_(currency)"]
+            assert cacher.search_results("Sol")['kind'] == 'search'
+
+            # The results come from the cache, the search page is neither fetched again nor retrieved.
+            assert [title for title, _ in seeker.search("Sol", prefetch=False)] == first[:2]
+            assert len(seeker.fetched) == 1
+        finally:
+            seeker.close()
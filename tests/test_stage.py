@@ -0,0 +1,34 @@
+import pytest
+
+from wikicrawler.core.parse.stage import ParseStage
+
+
+WIKI = "https://en.wikipedia.org/wiki/"
+
+
+def article(i):
+    return (f'<html><body><h1 id="firstHeading">Star {i}</h1><div id="mw-content-text"><div class="mw-parser-output">'
+            f'<p>A <a href="/wiki/Star_{i + 1}" title="Star {i + 1}">star</a> of mass $M_{i}$ shines like $L \\propto M^{{3.5}}$.</p>'
+            f'<p>It is a luminous spheroid of plasma.</p></div></div></body></html>')
+
+
+def test_workers_match_the_calling_thread():
+    pages = [(f"{WIKI}Star_{i}", article(i)) for i in range(6)]
+
+    with ParseStage(0, media=True) as stage:
+        expected = list(stage.map(pages))
+        entries, _ = stage.latex.drain()
+
+    with ParseStage(2, media=True) as stage:
+        assert list(stage.map(pages)) == expected
+        assert expected[0][0]['title'] == 'Star 0' and expected[0][1] == []
+
+        # The workers' conversions come back to the stage, to be persisted.
+        merged, counts = stage.latex.drain()
+        assert set(merged) == set(entries) and len(merged) == 6
+        assert counts['converted'] == 6
+
+        # A page which fails to parse fails its future, not the stage.
+        with pytest.raises(TypeError):
+            stage.submit(f"{WIKI}Broken", None).result()
+        assert stage.submit(*pages[0]).result() == expected[0]
@@ -0,0 +1,54 @@
+import pytest
+
+from wikicrawler.core.grabber import WikiGrabber
+from wikicrawler.core.parse.urls import LinkFilter, canonical_url
+from wikicrawler.core.utils.config import default_config
+
+
+PAGE = """<html><body><h1 id="firstHeading">Sun</h1><div id="mw-content-text"><div class="mw-parser-output">
+<p>The <a href="/wiki/star">star</a> of the <a href="/wiki/Solar%20System#Formation">system</a>,
+see <a href="/wiki/Help:IPA/English">help</a> and <a href="/wiki/Talk:Sun">talk</a>.</p>
+<div class="div-col"><ul><li><a href="/wiki/Moon" title="Moon">Moon</a></li>
+<li><a href="/wiki/Special:BookSources" title="Special:BookSources">Books</a></li></ul></div>
+</div></div></body></html>"""
+
+
+def test_canonical_url():
+    assert canonical_url("http://en.m.wikipedia.org/wiki/solar%20System#Formation") == \
+        "https://en.wikipedia.org/wiki/Solar_System"
+    assert canonical_url("https://en.wikipedia.org/wiki/Plasma_(physics)") == \
+        "https://en.wikipedia.org/wiki/Plasma_(physics)"
+    assert canonical_url("https://en.wikipedia.org/wiki/C%2B%2B") == "https://en.wikipedia.org/wiki/C%2B%2B"
+    assert canonical_url("https://example.org/a b#c") == "https://example.org/a b"
+
+
+def test_link_filter():
+    links = LinkFilter(namespaces=('Help', 'User talk'))
+
+    assert not links.allowed("https://en.wikipedia.org/wiki/Help:Contents")
+    assert not links.allowed("https://en.m.wikipedia.org/wiki/help%3AContents")
+    assert not links.allowed("https://en.wikipedia.org/wiki/User_talk:Someone")
+    assert links.allowed("https://en.wikipedia.org/wiki/User:Someone")
+    assert links.allowed("https://en.wikipedia.org/wiki/Helper:_a_film")
+    assert LinkFilter(namespaces=()).allowed("https://en.wikipedia.org/wiki/Help:Contents")
+
+    assert links.filter({'a': "https://en.wikipedia.org/wiki/sun", 'b': "https://en.wikipedia.org/wiki/Help:IPA"}) == \
+        {'a': "https://en.wikipedia.org/wiki/Sun"}
+    assert LinkFilter(canonicalize=False).filter({'a': "https://en.wikipedia.org/wiki/sun"}) == \
+        {'a': "https://en.wikipedia.org/wiki/sun"}
+
+
+@pytest.mark.parametrize('extractor', ['soup', 'single_pass'])
+def test_grabber_filters_links(tmp_path, extractor):
+    grabber = WikiGrabber(dict(default_config(str(tmp_path)), extractor=extractor, latex=False))
+    try:
+        wiki = grabber.extract_html("https://en.wikipedia.org/wiki/Sun", PAGE)
+        assert wiki['paragraph_links'] == [{'star': "https://en.wikipedia.org/wiki/Star",
+                                            'system': "https://en.wikipedia.org/wiki/Solar_System"}]
+        assert wiki['see_also'] == {'Moon': "https://en.wikipedia.org/wiki/Moon"}
+
+        with pytest.raises(ValueError):
+            grabber.fetch_extract("https://en.wikipedia.org/wiki/Help:Contents")
+        assert grabber.stats()['pool']['requests'] == 0
+    finally:
+        grabber.close()
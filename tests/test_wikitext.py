@@ -0,0 +1,48 @@
+from wikicrawler.core.parse.wikitext import extract_wikitext, title_url
+
+
+SUN = """{{Short description|Star at the centre of the Solar System}}
+{{Infobox star
+| name = Sun {{nowrap|(Sol)}}
+}}
+[[File:The Sun in white light.jpg|thumb|The [[Sun]] in [[visible light|white light]]]]
+The '''Sun''' is the [[star]] at the centre of the [[Solar System]].<ref>{{cite web |url=https://nasa.gov/sun |title=The ''Sun''}}</ref>
+It is a ball of hot [[Plasma (physics)|plasma]]s.<ref name="p">[https://example.org/plasma Plasma facts]</ref><ref name="p"/>
+
+{| class="wikitable"
+| a || b
+|}
+== Etymology ==
+The word comes from [[Old English]]<!-- a comment -->. See also [[wikt:sun|sun]].
+* [[Listed]]
+== See also ==
+* [[Solar eclipse]]
+* [[List of brightest stars#Sun|Brightest stars]]
+[[Category:Sun]]
+[[fr:Soleil]]
+"""
+
+
+def test_extract_wikitext():
+    parts = extract_wikitext(title_url('Sun'), 'Sun', SUN)
+
+    assert parts['title'] == 'Sun'
+    assert parts['paragraphs'] == [
+        "The Sun is the star at the centre of the Solar System.\nIt is a ball of hot plasmas.\n",
+        "The word comes from Old English. See also sun.\n"]
+    assert parts['paragraph_links'] == [
+        {'star': "https://en.wikipedia.org/wiki/Star",
+         'Solar System': "https://en.wikipedia.org/wiki/Solar_System",
+         'plasmas': "https://en.wikipedia.org/wiki/Plasma_(physics)"},
+        {'Old English': "https://en.wikipedia.org/wiki/Old_English"}]
+    assert parts['see_also'] == {'Solar eclipse': "https://en.wikipedia.org/wiki/Solar_eclipse",
+                                 'List of brightest stars': "https://en.wikipedia.org/wiki/List_of_brightest_stars#Sun"}
+    assert parts['toc_links'] == {'Etymology': "https://en.wikipedia.org/wiki/Sun#Etymology",
+                                  'See also': "https://en.wikipedia.org/wiki/Sun#See_also"}
+    assert parts['references'] == {'The Sun': "https://nasa.gov/sun", 'Plasma facts': "https://example.org/plasma"}
+    assert parts['images'] == [{'href': "/wiki/File:The_Sun_in_white_light.jpg"}]
+
+
+def test_title_url():
+    assert title_url('sun (star)') == "https://en.wikipedia.org/wiki/Sun_(star)"
+    assert title_url('AT&T', 'History of it') == "https://en.wikipedia.org/wiki/AT%26T#History_of_it"